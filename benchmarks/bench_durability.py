@@ -0,0 +1,55 @@
+"""Latency and throughput of Storage.save for each durability mode.
+
+Usage: python benchmarks/bench_durability.py [items] [transactions] [saves]
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from models import Item, Transaction, TransactionType  # noqa: E402
+from storage import Storage  # noqa: E402
+from utils import DURABILITY_MODES, group_fsync  # noqa: E402
+
+
+def percentile(samples, p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def main() -> None:
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    n_tx = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    n_saves = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    root = tempfile.mkdtemp(prefix="cafestock_bench_")
+    try:
+        storage = Storage(root, logging.getLogger("bench"))
+        storage.ensure_initial_files()
+        data = storage.load()
+        for i in range(n_items):
+            data.items.append(Item(id=f"SKU-{i + 1:04d}", name=f"Ürün {i}", category="Malzeme", unit="adet", stock_qty=10))
+        for i in range(n_tx):
+            data.transactions.append(Transaction(f"TX-{i + 1:06d}", TransactionType.OUT, f"SKU-{i % n_items + 1:04d}", 1, "2025-01-01T08:00:00+00:00", "Satış"))
+        print(f"{n_items} items, {n_tx} transactions, {n_saves} saves per mode")
+        print(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'saves/s':>8}")
+        for mode in DURABILITY_MODES:
+            data.settings.durability = mode
+            samples = []
+            t_start = time.perf_counter()
+            for _ in range(n_saves):
+                t0 = time.perf_counter()
+                storage.save(data)
+                samples.append((time.perf_counter() - t0) * 1000)
+            group_fsync.flush()  # group mode owes its directory fsyncs to the run
+            elapsed = time.perf_counter() - t_start
+            print(f"{mode:<10} {percentile(samples, 50):8.2f} {percentile(samples, 95):8.2f} {max(samples):8.2f} {n_saves / elapsed:8.1f}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Throughput and latency of the inventory server under concurrent POS traffic.
+
+Starts the server on an ephemeral localhost port and drives it with keep-alive
+clients; every fifth request is an item lookup, the rest are sales.
+
+Usage: python benchmarks/bench_server.py [clients] [requests_per_client] [items] [transactions]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from models import Item, Transaction, TransactionType  # noqa: E402
+from storage import Storage  # noqa: E402
+from services import Services  # noqa: E402
+from server import InventoryServer  # noqa: E402
+
+
+def percentile(samples, p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+async def call(reader, writer, method: str, path: str, payload=None) -> int:
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def run(server: InventoryServer, n_clients: int, n_requests: int, n_items: int):
+    await server.start()
+    latencies = {"read": [], "write": []}
+    errors = 0
+
+    async def client(c: int) -> None:
+        nonlocal errors
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        for r in range(n_requests):
+            sku = f"SKU-{(c * n_requests + r) % n_items + 1:04d}"
+            kind = "read" if r % 5 == 0 else "write"
+            t0 = time.perf_counter()
+            if kind == "read":
+                status = await call(reader, writer, "GET", f"/items/{sku}")
+            else:
+                status = await call(reader, writer, "POST", "/stock/out", {"sku": sku, "qty": 1})
+            latencies[kind].append((time.perf_counter() - t0) * 1000)
+            errors += status != 200
+        writer.close()
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(n_clients)))
+    elapsed = time.perf_counter() - t_start
+    await server.stop()
+    return latencies, errors, elapsed
+
+
+def main() -> None:
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    n_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    n_items = int(sys.argv[3]) if len(sys.argv) > 3 else 300
+    n_tx = int(sys.argv[4]) if len(sys.argv) > 4 else 20_000
+    root = tempfile.mkdtemp(prefix="cafestock_bench_")
+    logger = logging.getLogger("bench")
+    try:
+        storage = Storage(root, logger)
+        storage.ensure_initial_files()
+        data = storage.load()
+        for i in range(n_items):
+            data.items.append(Item(id=f"SKU-{i + 1:04d}", name=f"Ürün {i}", category="Malzeme", unit="adet", stock_qty=1_000_000))
+        for i in range(n_tx):
+            data.transactions.append(Transaction(f"TX-{i + 1:06d}", TransactionType.OUT, f"SKU-{i % n_items + 1:04d}", 1, "2025-01-01T08:00:00+00:00", "Satış"))
+        storage.save(data)
+        server = InventoryServer(Services(storage, logger), logger, port=0)
+        latencies, errors, elapsed = asyncio.run(run(server, n_clients, n_requests, n_items))
+        total = n_clients * n_requests
+        stats = server.stats
+        print(f"{n_clients} clients x {n_requests} requests, {n_items} items, {n_tx} transactions")
+        print(f"{total / elapsed:.0f} req/s, {errors} errors, {stats['commits']} saves for {stats['mutations']} sales "
+              f"({stats['mutations'] / max(1, stats['commits']):.1f} per save)")
+        print(f"{'kind':<6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for kind, samples in latencies.items():
+            print(f"{kind:<6} {percentile(samples, 50):8.2f} {percentile(samples, 95):8.2f} {percentile(samples, 99):8.2f}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Startup load time with and without the warm-start snapshot cache.
+
+Usage: python benchmarks/bench_snapshot.py [items] [transactions]
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from models import Item, Transaction, TransactionType  # noqa: E402
+from storage import Storage  # noqa: E402
+
+
+def build(root: str, n_items: int, n_tx: int) -> None:
+    storage = Storage(root, logging.getLogger("bench"))
+    storage.ensure_initial_files()
+    data = storage.load()
+    for i in range(n_items):
+        data.items.append(Item(id=f"SKU-{i + 1:04d}", name=f"Ürün {i}", category="Malzeme", unit="adet", stock_qty=10))
+    for i in range(n_tx):
+        data.transactions.append(Transaction(f"TX-{i + 1:06d}", TransactionType.OUT, f"SKU-{i % n_items + 1:04d}", 1, "2025-01-01T08:00:00+00:00", "Satış"))
+    storage.save(data)
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    n_tx = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    root = tempfile.mkdtemp(prefix="cafestock_bench_")
+    try:
+        build(root, n_items, n_tx)
+        logger = logging.getLogger("bench")
+        cold = Storage(root, logger)
+        warm = Storage(root, logger, snapshot_cache=True)
+        cold.write_snapshot(cold.load())
+        print(f"{n_items} items, {n_tx} transactions, {os.path.getsize(os.path.join(root, 'items.json')) / 1e6:.1f} MB")
+        print(f"json load       {timed(cold.load) * 1000:8.1f} ms")
+        print(f"snapshot load   {timed(warm.load) * 1000:8.1f} ms")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Desktop cold start: import time, first paint and time until data is ready.
+
+Each measurement runs in a fresh interpreter so module imports are cold.
+`first paint` needs customtkinter and a display; it is compared against the
+old order of work (load everything, then build the window) by handing the
+window an already-loaded Services.
+
+Usage: python benchmarks/bench_startup.py [--preset small|medium|large|xl] [--repeat 5]
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, os.pardir, "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, HERE)
+
+# datagen/suite import the data stack, so children (which time those
+# imports) never load them
+PRESETS = ("small", "medium", "large", "xl")
+
+
+def child(scenario: str, root: str) -> Dict[str, float]:
+    """Run one scenario in this (fresh) process; times are ms since entry."""
+    import time
+    t0 = time.perf_counter()
+
+    def since() -> float:
+        return round((time.perf_counter() - t0) * 1000, 2)
+
+    def load():
+        import logging
+        from storage import Storage
+        from services import Services
+        storage = Storage(root, logging.getLogger("bench"), lazy_transactions=True, snapshot_cache=True, verify_on_load=True)
+        storage.ensure_initial_files()
+        return Services(storage, logging.getLogger("bench"))
+
+    if scenario == "import_ui":
+        import ui  # noqa: F401
+        return {"imported": since()}
+    if scenario == "import_data_stack":
+        import services  # noqa: F401
+        return {"imported": since()}
+    if scenario == "data_ready":
+        load()
+        return {"ready": since()}
+
+    import logging
+    import ui
+    out: Dict[str, float] = {}
+    if scenario == "window_sync":
+        # The old order: everything loaded before the window exists
+        services = load()
+        app = ui.CafeStockTrackerApp(lambda: services, root, logging.getLogger("bench"))
+    else:
+        app = ui.CafeStockTrackerApp(load, root, logging.getLogger("bench"))
+    app.root.update()
+    out["first_paint"] = since()
+
+    def wait_ready():
+        if app.services is None:
+            app.root.after(5, wait_ready)
+            return
+        app.root.update()
+        out["ready"] = since()
+        app.root.destroy()
+    wait_ready()
+    app.root.mainloop()
+    return out
+
+
+def run_child(scenario: str, root: str, repeat: int) -> Optional[Dict[str, float]]:
+    samples: Dict[str, List[float]] = {}
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, __file__, "--child", scenario, root], capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"  {scenario}: skipped ({proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'})")
+            return None
+        for key, ms in json.loads(proc.stdout.strip().splitlines()[-1]).items():
+            samples.setdefault(key, []).append(ms)
+    return {key: round(statistics.median(values), 2) for key, values in samples.items()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preset", choices=PRESETS, default="large")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", nargs=2, metavar=("SCENARIO", "ROOT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        print(json.dumps(child(*args.child)))
+        return 0
+
+    from datagen import write_dataset
+    from suite import PRESETS as SIZES
+    n_items, n_tx = SIZES[args.preset]
+    root = tempfile.mkdtemp(prefix="cafestock_bench_")
+    try:
+        write_dataset(root, n_items, n_tx)
+        print(f"{args.preset}: {n_items} items, {n_tx} transactions, "
+              f"{os.path.getsize(os.path.join(root, 'items.json')) / 1e6:.1f} MB (median of {args.repeat} fresh processes, ms)")
+        for scenario in ("import_ui", "import_data_stack", "data_ready", "window_sync", "window_async"):
+            result = run_child(scenario, root, args.repeat)
+            if result is not None:
+                print(f"  {scenario:<18} " + "  ".join(f"{k} {v:9.1f}" for k, v in result.items()))
+            if scenario == "data_ready":
+                # Later runs start warm from the snapshot, like a second launch
+                import logging
+                from storage import Storage
+                storage = Storage(root, logging.getLogger("bench"))
+                storage.write_snapshot(storage.load())
+                result = run_child(scenario, root, args.repeat)
+                if result is not None:
+                    print(f"  {'data_ready (warm)':<18} " + "  ".join(f"{k} {v:9.1f}" for k, v in result.items()))
+    finally:
+        shutil.rmtree(root)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Deterministic synthetic café datasets for the benchmarks.
+
+The same (items, transactions, seed) always yields byte-identical data, so
+results from different commits are comparable. Sales follow a Zipf-like
+popularity curve (a few SKUs take most of the volume) and opening hours.
+
+Usage: python benchmarks/datagen.py <data_dir> [items] [transactions] [seed]
+"""
+import os
+import sys
+import random
+import logging
+import itertools
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from models import AppData, Item, Settings, Transaction, TransactionType  # noqa: E402
+from storage import Storage  # noqa: E402
+
+BASES = {
+    "İçecek": ["Türk Kahvesi", "Filtre Kahve", "Espresso Çekirdeği", "Çay", "Ihlamur", "Ada Çayı", "Sahlep", "Süt",
+               "Laktozsuz Süt", "Yulaf Sütü", "Maden Suyu", "Ayran", "Limonata", "Portakal Suyu", "Kakao", "Şalgam"],
+    "Malzeme": ["Şeker", "Esmer Şeker", "Un", "Tereyağı", "Yumurta", "Bal", "Reçel", "Kaymak", "Beyaz Peynir",
+                "Kaşar Peyniri", "Zeytin", "Domates", "Salatalık", "Simit", "Poğaça", "Açma", "Fındık", "Tahin",
+                "Pekmez", "Krema", "Çikolata Sosu", "Karamel Şurubu", "Vanilya Şurubu", "Tarçın"],
+    "Ambalaj": ["Karton Bardak", "Bardak Kapağı", "Pipet", "Peçete", "Kese Kağıdı", "Taşıma Kutusu", "Karıştırıcı",
+                "Streç Film", "Alüminyum Folyo"],
+    "Diğer": ["Bulaşık Deterjanı", "Yüzey Temizleyici", "Çöp Poşeti", "Eldiven", "Kağıt Havlu", "Sünger"],
+}
+VARIANTS = ["", "Organik", "Ekonomik", "Premium", "Yöresel", "Şekersiz", "Light", "Tam Yağlı", "Büyük Boy", "Küçük Boy"]
+UNITS = {"İçecek": ["litre", "kg", "paket"], "Malzeme": ["kg", "adet", "paket"], "Ambalaj": ["adet", "koli"], "Diğer": ["adet", "litre"]}
+SUPPLIERS = ["Anadolu Gıda", "Ege Tedarik", "Karadeniz Çay A.Ş.", "Marmara Ambalaj", "Boğaziçi Kahve", "Öztürk Toptan",
+             "Çağlayan Süt", "Güneş Temizlik", None]
+OUT_REASONS = ["Satış", "Satış", "Satış", "Satış", "Fire", "İkram", "Personel"]
+ADJUST_REASONS = ["Sayım düzeltme", "Hasarlı ürün", "Son kullanma tarihi"]
+
+
+def ean13(n: int) -> str:
+    body = f"869{n:09d}"
+    check = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(body)) % 10) % 10
+    return body + str(check)
+
+
+def generate_items(n_items: int, seed: int = 1) -> List[Item]:
+    rng = random.Random(seed)
+    names = (
+        (category, f"{base} {variant}".strip() if size == 1 else f"{base} {variant} {size}".replace("  ", " ").strip())
+        for size in itertools.count(1)
+        for variant in VARIANTS
+        for category, bases in BASES.items()
+        for base in bases
+    )
+    items = []
+    for n, (category, name) in enumerate(itertools.islice(names, n_items), 1):
+        cost = round(rng.uniform(2, 400), 2)
+        items.append(Item(
+            id=f"SKU-{n:04d}",
+            name=name,
+            category=category,
+            unit=rng.choice(UNITS[category]),
+            unit_cost=cost,
+            unit_price=round(cost * rng.uniform(1.4, 3.0), 2),
+            stock_qty=rng.randint(0, 500),
+            reorder_level=rng.choice([0, 5, 10, 20, 50]),
+            supplier=rng.choice(SUPPLIERS),
+            barcode=ean13(n),
+            notes=None,
+            last_updated="2025-01-01T08:00:00+00:00",
+        ))
+    return items
+
+
+def iter_transactions(items: List[Item], n_tx: int, seed: int = 1, days: int = 365) -> Iterator[Transaction]:
+    """Yield `n_tx` movements in time order over the `days` before 2025-06-01."""
+    rng = random.Random(seed + 1)
+    # Zipf-like weights over a shuffled catalog: rank r sells ~ 1/r
+    ranked = list(items)
+    rng.shuffle(ranked)
+    cum_weights = list(itertools.accumulate(1.0 / r for r in range(1, len(ranked) + 1)))
+    total = cum_weights[-1]
+    start = datetime(2025, 6, 1, tzinfo=timezone.utc) - timedelta(days=days)
+    span = days * 15 * 3600  # 07:00-22:00 every day
+    step = span / max(1, n_tx)
+    for n in range(n_tx):
+        offset = int(n * step)
+        day, second = divmod(offset, 15 * 3600)
+        ts = start + timedelta(days=day, seconds=7 * 3600 + second)
+        item = ranked[bisect_left(cum_weights, rng.random() * total)]
+        roll = rng.random()
+        if roll < 0.85:
+            tx_type, qty, reason, unit_cost = TransactionType.OUT, rng.choice([1, 1, 1, 2, 2, 3, 5]), rng.choice(OUT_REASONS), None
+        elif roll < 0.97:
+            tx_type, qty, reason = TransactionType.IN, rng.choice([10, 20, 24, 50, 100]), "Satın alma"
+            unit_cost = round(item.unit_cost * rng.uniform(0.9, 1.1), 2)
+        else:
+            tx_type, qty, reason, unit_cost = TransactionType.ADJUST, rng.randint(1, 5), rng.choice(ADJUST_REASONS), None
+        yield Transaction(
+            id=f"TX-{n + 1:06d}",
+            type=tx_type,
+            sku=item.id,
+            qty=qty,
+            timestamp=ts.isoformat(),
+            reason=reason,
+            unit_cost=unit_cost,
+            delta=-qty if tx_type == TransactionType.ADJUST else None,
+        )
+
+
+def generate(n_items: int, n_tx: int, seed: int = 1) -> AppData:
+    items = generate_items(n_items, seed)
+    return AppData(items=items, transactions=list(iter_transactions(items, n_tx, seed)), settings=Settings())
+
+
+def write_dataset(root: str, n_items: int, n_tx: int, seed: int = 1) -> None:
+    """Write items.json under `root` without holding the whole ledger in memory."""
+    storage = Storage(root, logging.getLogger("bench"))
+    storage.ensure_initial_files()
+    items = generate_items(n_items, seed)
+    data = AppData(items=items, settings=Settings(), revision=storage.read_revision())
+    data.transactions = iter_transactions(items, n_tx, seed)  # streamed by the writer
+    storage.save(data)
+
+
+def main() -> None:
+    root = sys.argv[1]
+    n_items = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000
+    n_tx = int(sys.argv[3]) if len(sys.argv) > 3 else 100_000
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+    os.makedirs(root, exist_ok=True)
+    write_dataset(root, n_items, n_tx, seed)
+    print(f"{n_items} items, {n_tx} transactions -> {os.path.join(root, 'items.json')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Timed storage/services/search scenarios on generated café data.
+
+Writes a JSON result file; with --compare it also diffs against an earlier
+result and exits with status 1 if any scenario got slower than --threshold.
+
+Usage:
+    python benchmarks/suite.py [--preset small|medium|large|xl] [--out results.json]
+                               [--compare baseline.json] [--threshold 0.2] [--only load,save]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import itertools
+import platform
+import tempfile
+import statistics
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from datagen import write_dataset, iter_transactions, ean13  # noqa: E402
+from storage import Storage, BACKUP_KEEP  # noqa: E402
+from services import Services  # noqa: E402
+
+PRESETS = {
+    "small": (1_000, 10_000),
+    "medium": (5_000, 200_000),
+    "large": (20_000, 1_000_000),
+    "xl": (100_000, 5_000_000),
+}
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(__file__))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def measure(fn: Callable[[], None], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"median_ms": round(statistics.median(samples), 3), "min_ms": round(min(samples), 3), "runs": repeat}
+
+
+class Suite:
+    def __init__(self, root: str, repeat: int):
+        self.root = root
+        self.repeat = repeat
+        self.logger = logging.getLogger("bench")
+        self.storage = Storage(root, self.logger)
+        self.data = self.storage.load()
+        self.services = Services(Storage(root, self.logger), self.logger)
+        self.hot_sku = self.data.transactions[-1].sku if self.data.transactions else self.data.items[0].id
+
+    def scenarios(self) -> Dict[str, Callable[[], Dict[str, float]]]:
+        return {
+            "load": self.load,
+            "load_lazy": self.load_lazy,
+            "save": self.save,
+            "backup_rotation": self.backup_rotation,
+            "next_tx_id_cold": self.next_tx_id_cold,
+            "stock_out": self.stock_out,
+            "stock_out_batch_50": self.stock_out_batch,
+            "search_keystroke": self.search_keystroke,
+            "csv_export": self.csv_export,
+            "csv_import": self.csv_import,
+            "undo": self.undo,
+            "sales_ingest_100k": self.sales_ingest,
+        }
+
+    def load(self):
+        return measure(self.storage.load, self.repeat)
+
+    def load_lazy(self):
+        return measure(lambda: self.storage.load(lazy_transactions=True), self.repeat)
+
+    def save(self):
+        def run():
+            self.data.revision = self.storage.read_revision()
+            self.storage.save(self.data)
+        return measure(run, self.repeat)
+
+    def backup_rotation(self):
+        # A full backups/ folder, so every rotation removes one file
+        while len(os.listdir(os.path.join(self.root, "backups"))) < BACKUP_KEEP:
+            self.storage._write_backup()
+            time.sleep(0.01)
+
+        def run():
+            self.storage._write_backup()
+            self.storage._rotate_backups()
+        return measure(run, self.repeat)
+
+    def next_tx_id_cold(self):
+        def reset():
+            self.services._last_tx_num = None
+        return measure(self.services.generate_next_tx_id, self.repeat, setup=reset)
+
+    def stock_out(self):
+        self.services.sync_if_changed()
+        return measure(lambda: self.services.stock_out(self.hot_sku, 1), self.repeat, setup=self._restock)
+
+    def stock_out_batch(self):
+        self.services.sync_if_changed()
+
+        def run():
+            with self.services.batch():
+                for _ in range(50):
+                    self.services.stock_out(self.hot_sku, 1)
+        return measure(run, self.repeat, setup=self._restock)
+
+    def _restock(self):
+        item = self.services.get_item(self.hot_sku)
+        if item.stock_qty < 100:
+            self.services.stock_in(self.hot_sku, 1000)
+
+    def search_keystroke(self):
+        # Typing a name one character at a time; reported per keystroke
+        word = self.data.items[len(self.data.items) // 2].name
+        prefixes = [word[:n] for n in range(1, len(word) + 1)]
+
+        def run():
+            for p in prefixes:
+                self.services.search_items(p)
+        result = measure(run, self.repeat)
+        return {**result, "per_keystroke_ms": round(result["median_ms"] / len(prefixes), 3)}
+
+    def csv_export(self):
+        path = os.path.join(self.root, "export.csv")
+        return measure(lambda: self.services.export_csv(path), self.repeat)
+
+    def csv_import(self):
+        path = os.path.join(self.root, "export.csv")
+        self.services.export_csv(path)
+        return measure(lambda: self.services.import_csv(path), self.repeat)
+
+    def sales_ingest(self):
+        # A day's POS export: 100k lines of barcodes, skewed like the ledger
+        path = os.path.join(self.root, "sales.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("timestamp,code,qty\n")
+            for tx in itertools.islice(iter_transactions(self.data.items, 100_000, seed=7, days=1), 100_000):
+                f.write(f"{tx.timestamp},{ean13(int(tx.sku[4:]))},1\n")
+        self.services.sync_if_changed()
+        return measure(lambda: self.services.ingest_sales_csv(path), self.repeat)
+
+    def undo(self):
+        return measure(self.services.undo_last_action, self.repeat, setup=lambda: self.services.stock_out(self.hot_sku, 1))
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Compare best-of-N times, which are far less noisy than medians on a busy machine."""
+    regressions = []
+    print(f"{'scenario':<22} {'base ms':>10} {'now ms':>10} {'change':>8}")
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        change = result["min_ms"] / before["min_ms"] - 1 if before["min_ms"] else 0.0
+        flag = " REGRESSION" if change > threshold else ""
+        print(f"{name:<22} {before['min_ms']:10.2f} {result['min_ms']:10.2f} {change:+7.0%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    parser.add_argument("--items", type=int, help="override the preset's item count")
+    parser.add_argument("--transactions", type=int, help="override the preset's transaction count")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", help="comma-separated scenario names")
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<preset>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown that counts as a regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    n_items, n_tx = PRESETS[args.preset]
+    n_items = args.items or n_items
+    n_tx = args.transactions if args.transactions is not None else n_tx
+    root = tempfile.mkdtemp(prefix="cafestock_bench_")
+    try:
+        t0 = time.perf_counter()
+        write_dataset(root, n_items, n_tx, args.seed)
+        print(f"{args.preset}: {n_items} items, {n_tx} transactions generated in {time.perf_counter() - t0:.1f}s")
+        suite = Suite(root, args.repeat)
+        scenarios = suite.scenarios()
+        selected = args.only.split(",") if args.only else list(scenarios)
+        results = {}
+        for name in selected:
+            results[name] = scenarios[name]()
+            print(f"  {name:<22} {results[name]['median_ms']:10.2f} ms")
+    finally:
+        shutil.rmtree(root)
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "preset": args.preset,
+            "items": n_items,
+            "transactions": n_tx,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{args.preset}-{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+from models import Recipe
+
+
+class BomMatrix:
+    """Recipes as a sparse product x ingredient matrix in CSR layout.
+
+    Row r holds the nonzero (ingredient column, qty per unit) pairs of one
+    product in `indices`/`data[indptr[r]:indptr[r + 1]]`. Exploding sales
+    first sums the sold quantity per product, so the cost is one pass over
+    the sales plus one pass over the nonzeros of the products that sold.
+    """
+
+    def __init__(self, recipes: Iterable[Recipe]):
+        self.products: Dict[str, int] = {}
+        self.ingredients: List[str] = []
+        self.indptr = array("l", [0])
+        self.indices = array("l")
+        self.data = array("l")
+        columns: Dict[str, int] = {}
+        for recipe in recipes:
+            self.products[recipe.product] = len(self.indptr) - 1
+            for sku, qty in recipe.components.items():
+                col = columns.get(sku)
+                if col is None:
+                    col = columns[sku] = len(self.ingredients)
+                    self.ingredients.append(sku)
+                self.indices.append(col)
+                self.data.append(qty)
+            self.indptr.append(len(self.indices))
+
+    def explode(self, sold: Iterable[Tuple[str, int]]) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Ingredient usage per SKU for (product code, qty sold) pairs.
+
+        Returns (usage, unknown), where `unknown` sums the quantities of
+        product codes without a recipe.
+        """
+        per_row: Dict[int, int] = {}
+        unknown: Dict[str, int] = {}
+        products = self.products
+        for product, qty in sold:
+            row = products.get(product)
+            if row is None:
+                unknown[product] = unknown.get(product, 0) + qty
+            else:
+                per_row[row] = per_row.get(row, 0) + qty
+        totals = [0] * len(self.ingredients)
+        indptr, indices, data = self.indptr, self.indices, self.data
+        for row, qty in per_row.items():
+            for k in range(indptr[row], indptr[row + 1]):
+                totals[indices[k]] += data[k] * qty
+        usage = {self.ingredients[col]: total for col, total in enumerate(totals) if total}
+        return usage, unknown
@@ -0,0 +1,309 @@
+"""Headless command line for scripted jobs (cron, POS exports).
+
+    python src/cli.py import prices.csv
+    python src/cli.py recipes recipes.csv         # product,name,sku,qty per ingredient
+    python src/cli.py export items items.csv
+    python src/cli.py export ledger - --from 2025-01-01 --to 2025-02-01 > jan.csv
+    python src/cli.py batch movements.csv          # or .jsonl, or - for stdin
+    python src/cli.py sales pos_2025-06-01.csv --bucket-minutes 60
+    python src/cli.py report valuation --method wac
+    python src/cli.py verify --full --restore
+    python src/cli.py compact --retention-days 90
+
+Loads no GUI modules. Results go to stdout (JSON for reports and
+summaries), diagnostics to stderr; the exit status is non-zero when
+something was rejected or failed.
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+from contextlib import contextmanager
+from dataclasses import asdict
+from itertools import chain, islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+from utils import get_app_root, get_data_lock_path, setup_logging, shutdown_logging, FileLock, InstanceLock, to_utc_iso
+from storage import Storage
+from services import Services, SALES_BUCKET_MINUTES
+from valuation import FIFO, WEIGHTED_AVERAGE
+
+BATCH_CHUNK_ROWS = 1000
+LEDGER_FIELDS = ["id", "type", "sku", "qty", "timestamp", "reason", "note", "unit_cost", "delta"]
+MOVEMENT_TYPES = ("in", "out", "adjust")
+
+
+@contextmanager
+def _open_out(path: str):
+    if path == "-":
+        yield sys.stdout
+        return
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        yield f
+
+
+@contextmanager
+def _open_in(path: str):
+    if path == "-":
+        yield sys.stdin
+        return
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        yield f
+
+
+def _print_json(value: Any) -> None:
+    json.dump(value, sys.stdout, ensure_ascii=False, indent=2, default=str)
+    sys.stdout.write("\n")
+
+
+# ---------- Movements file ----------
+def read_movements(f: TextIO, fmt: str, delimiter: str) -> Iterator[Tuple[int, Union[Dict[str, Any], ValueError]]]:
+    """Yield (row number, movement row) pairs one at a time.
+
+    A row is a dict (type, sku, qty[, reason, note, unit_cost, mode]), or a
+    ValueError for a JSON line that does not parse or is not an object, so
+    it is rejected like any other bad row. JSON rows are numbered by line.
+    """
+    if fmt == "jsonl":
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield n, ValueError(f"invalid JSON: {e}")
+                continue
+            yield n, row if isinstance(row, dict) else ValueError("movement must be a JSON object")
+        return
+    for n, row in enumerate(csv.DictReader(f, delimiter=delimiter), 1):
+        yield n, {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+
+
+def movement_mutation(row: Dict[str, Any]) -> Callable[[Services], Any]:
+    kind = (row.get("type") or "").lower()
+    if kind not in MOVEMENT_TYPES:
+        raise ValueError(f"type must be one of {', '.join(MOVEMENT_TYPES)}")
+    sku = row.get("sku") or ""
+    try:
+        qty = int(row.get("qty"))
+    except (TypeError, ValueError):
+        raise ValueError("qty must be an integer")
+    extra = {k: row[k] for k in ("reason", "note") if row.get(k)}
+    if kind == "in":
+        return lambda s: s.stock_in(sku, qty, unit_cost=row.get("unit_cost") or None, **extra)
+    if kind == "out":
+        return lambda s: s.stock_out(sku, qty, **extra)
+    return lambda s: s.stock_adjust(sku, qty, mode=row.get("mode") or "set", **extra)
+
+
+# ---------- Commands ----------
+def cmd_import(services: Services, args) -> int:
+    summary = services.import_csv(args.file)
+    _print_json(summary)
+    return 1 if summary.get("skipped") else 0
+
+
+def cmd_recipes(services: Services, args) -> int:
+    summary = services.import_recipes_csv(args.file)
+    _print_json(summary)
+    return 1 if summary["skipped"] else 0
+
+
+def cmd_export(services: Services, args) -> int:
+    if args.what == "items":
+        services.export_csv(args.file)
+        return 0
+    if args.what == "po":
+        count = services.export_purchase_orders_csv(args.file)
+        print(f"{count} order lines", file=sys.stderr)
+        return 0
+    start = to_utc_iso(args.start) if args.start else None
+    end = to_utc_iso(args.end) if args.end else None
+    rows = services.app_data.transactions
+    if args.include_archive:
+        archived = (tx for period in services.storage.list_archive_periods() for tx in services.archived_transactions(period))
+        rows = chain(archived, rows)
+    count = 0
+    with _open_out(args.file) as f:
+        writer = csv.writer(f, delimiter=services.app_data.settings.csv_delimiter)
+        writer.writerow(LEDGER_FIELDS)
+        for tx in rows:
+            if (start is not None and tx.timestamp < start) or (end is not None and tx.timestamp >= end):
+                continue
+            writer.writerow([
+                tx.id, tx.type.value, tx.sku, tx.qty, tx.timestamp, tx.reason,
+                tx.note or "", "" if tx.unit_cost is None else tx.unit_cost, "" if tx.delta is None else tx.delta,
+            ])
+            count += 1
+    print(f"{count} transactions", file=sys.stderr)
+    return 0
+
+
+def cmd_batch(services: Services, args) -> int:
+    fmt = args.format or ("jsonl" if args.file.endswith((".jsonl", ".ndjson")) else "csv")
+    delimiter = args.delimiter or services.app_data.settings.csv_delimiter
+    applied = rejected = 0
+    with _open_in(args.file) as f:
+        rows = read_movements(f, fmt, delimiter)
+        while True:
+            chunk = list(islice(rows, args.chunk))
+            if not chunk:
+                break
+            mutations: List[Callable[[Services], Any]] = []
+            line_of: List[int] = []
+            for n, row in chunk:
+                try:
+                    if isinstance(row, ValueError):
+                        raise row
+                    mutations.append(movement_mutation(row))
+                    line_of.append(n)
+                except ValueError as e:
+                    rejected += 1
+                    print(f"row {n}: {e}", file=sys.stderr)
+            # One save per chunk, so memory stays flat for any input size
+            for n, result in zip(line_of, services.run_batch(mutations)):
+                if isinstance(result, Exception):
+                    rejected += 1
+                    print(f"row {n}: {result}", file=sys.stderr)
+                else:
+                    applied += 1
+    _print_json({"applied": applied, "rejected": rejected})
+    return 1 if rejected else 0
+
+
+def cmd_sales(services: Services, args) -> int:
+    summary = services.ingest_sales_csv(args.file, bucket_minutes=args.bucket_minutes, strict=args.strict)
+    for code, qty in summary["unknown"].items():
+        print(f"unknown code {code}: {qty}", file=sys.stderr)
+    for r in summary["rejected"]:
+        print(f"{r['sku']} @ {r['timestamp']}: {r['error']} ({r['qty']})", file=sys.stderr)
+    for r in summary["skipped_rows"]:
+        print(f"row {r['row']}: {r['error']}", file=sys.stderr)
+    _print_json({k: v for k, v in summary.items() if k not in ("skipped_rows",)})
+    return 1 if summary["unknown"] or summary["rejected"] or summary["skipped"] else 0
+
+
+def cmd_report(services: Services, args) -> int:
+    if args.name == "valuation":
+        _print_json(asdict(services.inventory_valuation(args.method, args.start, args.end)))
+    elif args.name == "consumption":
+        _print_json(services.consumption_by_sku(args.start, args.end))
+    elif args.name == "categories":
+        _print_json(services.category_totals())
+    elif args.name == "low-stock":
+        _print_json(services.low_stock_by_supplier())
+    elif args.name == "orders":
+        _print_json({s: [asdict(line) for line in lines] for s, lines in services.purchase_order_drafts().items()})
+    return 0
+
+
+def cmd_verify(storage: Storage, args) -> int:
+    # Held so a save by a running terminal is not caught half-way
+    with FileLock(get_data_lock_path(storage.app_root)):
+        ok = storage.verify(full=args.full)
+        restored = None if ok or not args.restore else storage.restore_newest_valid_backup()
+    if ok:
+        print("items.json OK", file=sys.stderr)
+        return 0
+    print("items.json failed verification", file=sys.stderr)
+    if not args.restore:
+        return 1
+    if restored is None:
+        print("No valid backup found", file=sys.stderr)
+        return 2
+    print(f"Restored {restored}", file=sys.stderr)
+    return 0
+
+
+def cmd_compact(services: Services, args) -> int:
+    _print_json(services.compact_ledger(args.retention_days))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cafestock", description="Headless Kafe Stok Takip operations")
+    parser.add_argument("--data-dir", help="data folder (default: the app folder)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="also log to stderr")
+    parser.add_argument("--json-logs", action="store_true", help="write logs/app.jsonl instead of app.log")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import", help="import/merge items from CSV")
+    p.add_argument("file")
+
+    p = sub.add_parser("recipes", help="import/replace menu recipes from CSV (product, name, sku, qty)")
+    p.add_argument("file")
+
+    p = sub.add_parser("export", help="export items, the ledger or purchase orders as CSV")
+    p.add_argument("what", choices=["items", "ledger", "po"])
+    p.add_argument("file", help="output path (ledger: - for stdout)")
+    p.add_argument("--from", dest="start", help="ledger rows at or after this time")
+    p.add_argument("--to", dest="end", help="ledger rows before this time")
+    p.add_argument("--include-archive", action="store_true", help="prepend compacted months from archive/")
+
+    p = sub.add_parser("batch", help="apply stock movements from a CSV or JSON-lines file")
+    p.add_argument("file", help="input path, or - for stdin")
+    p.add_argument("--format", choices=["csv", "jsonl"])
+    p.add_argument("--delimiter")
+    p.add_argument("--chunk", type=int, default=BATCH_CHUNK_ROWS, help="movements per save")
+
+    p = sub.add_parser("sales", help="book a POS sales export (code, qty, timestamp) as bucketed stock-outs")
+    p.add_argument("file")
+    p.add_argument("--bucket-minutes", type=int, default=SALES_BUCKET_MINUTES)
+    p.add_argument("--strict", action="store_true", help="reject the whole file if any code is unknown")
+
+    p = sub.add_parser("report", help="print a report as JSON")
+    p.add_argument("name", choices=["valuation", "consumption", "categories", "low-stock", "orders"])
+    p.add_argument("--method", choices=[FIFO, WEIGHTED_AVERAGE], default=FIFO)
+    p.add_argument("--from", dest="start")
+    p.add_argument("--to", dest="end")
+
+    p = sub.add_parser("verify", help="check items.json against its checksums")
+    p.add_argument("--full", action="store_true", help="re-hash everything")
+    p.add_argument("--restore", action="store_true", help="restore the newest valid backup on failure")
+
+    p = sub.add_parser("compact", help="archive old ledger months")
+    p.add_argument("--retention-days", type=int, default=90)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    app_root = os.path.abspath(args.data_dir) if args.data_dir else get_app_root()
+    logger = setup_logging(app_root, json_lines=args.json_logs or None, console=args.verbose)
+    # Maintenance needs the folder to itself; everything else runs beside
+    # open terminals like another one would
+    exclusive = args.command == "compact" or (args.command == "verify" and args.restore)
+    lock = InstanceLock(app_root, exclusive=exclusive)
+    try:
+        lock.acquire()
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 3
+    try:
+        storage = Storage(app_root, logger, snapshot_cache=True)
+        storage.ensure_initial_files()
+        if args.command == "verify":
+            return cmd_verify(storage, args)
+        services = Services(storage, logger)
+        handler = {
+            "import": cmd_import,
+            "recipes": cmd_recipes,
+            "export": cmd_export,
+            "batch": cmd_batch,
+            "sales": cmd_sales,
+            "report": cmd_report,
+            "compact": cmd_compact,
+        }[args.command]
+        return handler(services, args)
+    except (ValueError, OSError) as e:
+        logger.error(f"{args.command} failed: {e}")
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        lock.release()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
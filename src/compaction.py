@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from models import PeriodSummary, Transaction, TransactionType
+
+
+def period_of(timestamp: str) -> str:
+    return timestamp[:7]
+
+
+def compaction_cutoff(retention_days: int, now: datetime = None) -> str:
+    """First instant of the month that contains `now - retention_days`.
+
+    Only whole months before it are compacted. A row back-dated into a month
+    that was already compacted is archived by a later run into the same
+    segment and gets a second summary for that SKU and month, so readers
+    add summaries up rather than expect one per (sku, period).
+    """
+    now = now or datetime.now(timezone.utc)
+    oldest_kept = datetime.fromtimestamp(now.timestamp() - retention_days * 86400, timezone.utc)
+    return oldest_kept.replace(day=1, hour=0, minute=0, second=0, microsecond=0).isoformat()
+
+
+def split_ledger(
+    transactions: Iterable[Transaction],
+    cutoff: str,
+    opening: Optional[Dict[str, int]] = None,
+) -> Tuple[List[Transaction], Dict[str, List[Transaction]], List[PeriodSummary]]:
+    """Split the ledger at `cutoff` (a `now_utc_iso`-formatted string).
+
+    `opening` is the stock per SKU before the first row (earlier summaries
+    and stock no row explains); legacy "Set to" adjustments are measured
+    from it. Returns the rows to keep, the rows to archive grouped by month
+    and one summary per SKU per archived month.
+    """
+    kept: List[Transaction] = []
+    archived: Dict[str, List[Transaction]] = {}
+    summaries: Dict[Tuple[str, str], PeriodSummary] = {}
+    on_hand: Dict[str, int] = dict(opening or {})
+    for tx in transactions:
+        delta = tx.signed_qty(on_hand.get(tx.sku, 0))
+        on_hand[tx.sku] = on_hand.get(tx.sku, 0) + delta
+        if tx.timestamp >= cutoff:
+            kept.append(tx)
+            continue
+        period = period_of(tx.timestamp)
+        archived.setdefault(period, []).append(tx)
+        summary = summaries.get((tx.sku, period))
+        if summary is None:
+            summary = PeriodSummary(sku=tx.sku, period=period, first_tx_id=tx.id)
+            summaries[(tx.sku, period)] = summary
+        summary.tx_count += 1
+        summary.last_tx_id = tx.id
+        summary.last_timestamp = tx.timestamp
+        if tx.type == TransactionType.IN:
+            summary.qty_in += tx.qty
+            if tx.unit_cost is not None:
+                summary.costed_qty_in += tx.qty
+                summary.cost_in += tx.qty * tx.unit_cost
+        elif tx.type == TransactionType.OUT:
+            summary.qty_out += tx.qty
+        else:
+            summary.net_adjust += delta
+    ordered = sorted(summaries.values(), key=lambda s: (s.period, s.sku))
+    return kept, archived, ordered
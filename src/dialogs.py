@@ -1,11 +1,11 @@
 import os
 import customtkinter as ctk
-from tkinter import messagebox
-from typing import Optional
+from tkinter import ttk, messagebox
+from typing import Dict, List, Optional
 
 from services import Services
 from models import Item
-from utils import open_folder
+from utils import open_folder, DURABILITY_MODES
 
 
 class ItemDialog:
@@ -107,7 +107,7 @@ class StockDialog:
         
         self.dialog = ctk.CTkToplevel(parent)
         self.dialog.title(f"Stok {'Girişi' if mode == 'in' else 'Çıkışı'}")
-        self.dialog.geometry("400x300")
+        self.dialog.geometry("400x340")
         self.dialog.transient(parent)
         self.dialog.grab_set()
         
@@ -135,8 +135,16 @@ class StockDialog:
         self.note_entry = ctk.CTkEntry(main_frame, width=200)
         self.note_entry.grid(row=4, column=1, padx=5, pady=5, sticky="w")
         
+        self.cost_entry = None
+        if mode == 'in':
+            ctk.CTkLabel(main_frame, text="Birim Maliyet:").grid(row=5, column=0, padx=5, pady=5, sticky="w")
+            self.cost_entry = ctk.CTkEntry(main_frame, width=100)
+            if item.unit_cost is not None:
+                self.cost_entry.insert(0, str(item.unit_cost))
+            self.cost_entry.grid(row=5, column=1, padx=5, pady=5, sticky="w")
+        
         button_frame = ctk.CTkFrame(main_frame)
-        button_frame.grid(row=5, column=0, columnspan=2, pady=20)
+        button_frame.grid(row=6, column=0, columnspan=2, pady=20)
         
         ctk.CTkButton(button_frame, text="Kaydet", command=self.save, width=100).pack(side="left", padx=5)
         ctk.CTkButton(button_frame, text="İptal", command=self.dialog.destroy, width=100).pack(side="left", padx=5)
@@ -148,7 +156,8 @@ class StockDialog:
             note = self.note_entry.get()
             
             if self.mode == 'in':
-                self.services.stock_in(self.item_id, qty, reason=reason, note=note)
+                unit_cost = self.cost_entry.get().strip().replace(",", ".") or None
+                self.services.stock_in(self.item_id, qty, reason=reason, note=note, unit_cost=unit_cost)
             else:
                 self.services.stock_out(self.item_id, qty, reason=reason, note=note)
             
@@ -222,6 +231,304 @@ class AdjustDialog:
             messagebox.showerror("Hata", str(e))
 
 
+class ScanDialog:
+    """Barcode scanning at the counter.
+
+    A keyboard-wedge scanner types the code followed by Enter. Each scan adds
+    one unit to a pending basket (a quantity per SKU). Looking a code up only
+    touches the in-memory index, so bursts of scans never wait on disk. The
+    basket is saved as one batch of movements by "Kaydet".
+    """
+    MODES = {"Çıkış": ("out", "Satış"), "Giriş": ("in", "Satın Alma")}
+
+    def __init__(self, parent, services: Services):
+        self.services = services
+        self.pending: Dict[str, int] = {}
+        self.scans: List[str] = []
+        
+        self.dialog = ctk.CTkToplevel(parent)
+        self.dialog.title("Barkod Tarama")
+        self.dialog.geometry("600x520")
+        self.dialog.transient(parent)
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+        
+        main_frame = ctk.CTkFrame(self.dialog)
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        top_frame = ctk.CTkFrame(main_frame)
+        top_frame.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(top_frame, text="İşlem:").pack(side="left", padx=5)
+        self.mode_var = ctk.StringVar(value="Çıkış")
+        ctk.CTkSegmentedButton(top_frame, values=list(self.MODES), variable=self.mode_var).pack(side="left", padx=5)
+        ctk.CTkLabel(top_frame, text="Barkod:").pack(side="left", padx=(20, 5))
+        self.code_entry = ctk.CTkEntry(top_frame, width=200)
+        self.code_entry.pack(side="left", padx=5)
+        self.code_entry.bind("<Return>", self.on_scan)
+        self.code_entry.bind("<KP_Enter>", self.on_scan)
+        
+        columns = ("SKU", "Ürün Adı", "Miktar")
+        self.tree = ttk.Treeview(main_frame, columns=columns, show="headings", height=12)
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=120 if col != "Ürün Adı" else 260, minwidth=60)
+        self.tree.pack(fill="both", expand=True)
+        
+        self.status_label = ctk.CTkLabel(main_frame, text="Barkod okutun.")
+        self.status_label.pack(fill="x", pady=5)
+        
+        button_frame = ctk.CTkFrame(main_frame)
+        button_frame.pack(pady=10)
+        
+        ctk.CTkButton(button_frame, text="Kaydet", command=self.commit, width=100).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Son Taramayı Sil", command=self.remove_last, width=130).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Temizle", command=self.clear, width=100).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Kapat", command=self.close, width=100).pack(side="left", padx=5)
+        
+        self.code_entry.focus_set()
+    
+    def on_scan(self, event=None):
+        code = self.code_entry.get().strip()
+        self.code_entry.delete(0, "end")
+        if not code:
+            return "break"
+        item = self.services.find_by_barcode(code)
+        if item is None:
+            self.dialog.bell()
+            self.status_label.configure(text=f"Bilinmeyen barkod: {code}", text_color="red")
+            return "break"
+        self.scans.append(item.id)
+        self.set_pending(item.id, self.pending.get(item.id, 0) + 1, item.name)
+        self.status_label.configure(text=f"{item.name} +1 ({len(self.scans)} tarama)", text_color=("gray10", "gray90"))
+        return "break"
+    
+    def set_pending(self, sku: str, qty: int, name: str = ""):
+        if qty <= 0:
+            self.pending.pop(sku, None)
+            if self.tree.exists(sku):
+                self.tree.delete(sku)
+            return
+        self.pending[sku] = qty
+        if self.tree.exists(sku):
+            self.tree.set(sku, "Miktar", qty)
+        else:
+            self.tree.insert("", "end", iid=sku, values=(sku, name, qty))
+    
+    def remove_last(self):
+        if self.scans:
+            sku = self.scans.pop()
+            self.set_pending(sku, self.pending[sku] - 1)
+        self.code_entry.focus_set()
+    
+    def clear(self):
+        for sku in list(self.pending):
+            self.set_pending(sku, 0)
+        self.scans = []
+        self.status_label.configure(text="Barkod okutun.", text_color=("gray10", "gray90"))
+        self.code_entry.focus_set()
+    
+    def commit(self):
+        if not self.pending:
+            return
+        direction, reason = self.MODES[self.mode_var.get()]
+        try:
+            results = self.services.stock_move_many(direction, self.pending, reason=reason, note="Barkod tarama")
+        except Exception as e:
+            messagebox.showerror("Hata", str(e))
+            return
+        rejected = {sku: r for sku, r in results.items() if isinstance(r, Exception)}
+        # Rejected lines stay in the basket so they can be corrected and saved again
+        for sku in list(self.pending):
+            if sku not in rejected:
+                self.set_pending(sku, 0)
+        self.scans = [sku for sku in self.scans if sku in rejected]
+        self.status_label.configure(text=f"{len(results) - len(rejected)} ürün kaydedildi.", text_color=("gray10", "gray90"))
+        if rejected:
+            messagebox.showwarning("Uyarı", "\n".join(f"{sku}: {e}" for sku, e in rejected.items()))
+        self.code_entry.focus_set()
+    
+    def close(self):
+        if self.pending and not messagebox.askyesno("Onay", "Kaydedilmemiş taramalar silinecek. Kapatılsın mı?"):
+            return
+        self.dialog.destroy()
+
+
+class MenuSaleDialog:
+    """Sell menu products; their recipes are exploded into ingredient stock-outs."""
+
+    def __init__(self, parent, services: Services):
+        self.services = services
+        self.products = {f"{r.name} ({r.product})": r.product for r in services.app_data.recipes}
+        
+        self.dialog = ctk.CTkToplevel(parent)
+        self.dialog.title("Menü Satışı")
+        self.dialog.geometry("460x420")
+        self.dialog.transient(parent)
+        
+        main_frame = ctk.CTkFrame(self.dialog)
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        ctk.CTkLabel(main_frame, text="Ürün:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.product_combo = ctk.CTkComboBox(main_frame, values=list(self.products), width=260, command=lambda _: self.preview())
+        self.product_combo.set(next(iter(self.products)))
+        self.product_combo.grid(row=0, column=1, padx=5, pady=5, sticky="w")
+        
+        ctk.CTkLabel(main_frame, text="Adet:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.qty_entry = ctk.CTkEntry(main_frame, width=100)
+        self.qty_entry.insert(0, "1")
+        self.qty_entry.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        self.qty_entry.bind("<KeyRelease>", lambda e: self.preview())
+        
+        self.usage_text = ctk.CTkTextbox(main_frame, width=380, height=180)
+        self.usage_text.grid(row=2, column=0, columnspan=2, padx=5, pady=10)
+        
+        button_frame = ctk.CTkFrame(main_frame)
+        button_frame.grid(row=3, column=0, columnspan=2, pady=10)
+        
+        ctk.CTkButton(button_frame, text="Sat", command=self.sell, width=100).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Kapat", command=self.dialog.destroy, width=100).pack(side="left", padx=5)
+        self.preview()
+    
+    def sold(self):
+        return [(self.products[self.product_combo.get()], int(self.qty_entry.get()))]
+    
+    def preview(self):
+        try:
+            usage, _ = self.services.explode_sales(self.sold())
+            names = {i.id: f"{i.name} ({i.unit})" for i in self.services.app_data.items if i.id in usage}
+            text = "\n".join(f"{names.get(sku, sku)}: -{qty}" for sku, qty in usage.items())
+        except (KeyError, ValueError):
+            text = ""
+        self.usage_text.configure(state="normal")
+        self.usage_text.delete("1.0", "end")
+        self.usage_text.insert("1.0", text)
+        self.usage_text.configure(state="disabled")
+    
+    def sell(self):
+        try:
+            result = self.services.sell_products(self.sold())
+        except Exception as e:
+            messagebox.showerror("Hata", str(e))
+            return
+        if result["rejected"]:
+            messagebox.showwarning("Uyarı", "\n".join(f"{product}: {e}" for product, e in result["rejected"].items()))
+        else:
+            messagebox.showinfo("Başarılı", "Satış kaydedildi.")
+
+
+class StockTakeDialog:
+    """Physical count: counts are staged (and kept in stocktake.json, so
+    closing the window or the app resumes later) and applied together."""
+
+    def __init__(self, parent, services: Services):
+        self.services = services
+        self.session = services.start_stock_take()
+        
+        self.dialog = ctk.CTkToplevel(parent)
+        self.dialog.title(f"Sayım (başlangıç: {self.session.started})")
+        self.dialog.geometry("800x600")
+        self.dialog.transient(parent)
+        
+        main_frame = ctk.CTkFrame(self.dialog)
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        entry_frame = ctk.CTkFrame(main_frame)
+        entry_frame.pack(fill="x", pady=(0, 10))
+        ctk.CTkLabel(entry_frame, text="Barkod / SKU:").pack(side="left", padx=5)
+        self.code_entry = ctk.CTkEntry(entry_frame, width=180)
+        self.code_entry.pack(side="left", padx=5)
+        self.code_entry.bind("<Return>", lambda e: self.qty_entry.focus_set())
+        ctk.CTkLabel(entry_frame, text="Sayılan:").pack(side="left", padx=(20, 5))
+        self.qty_entry = ctk.CTkEntry(entry_frame, width=80)
+        self.qty_entry.pack(side="left", padx=5)
+        self.qty_entry.bind("<Return>", lambda e: self.stage())
+        ctk.CTkButton(entry_frame, text="Ekle", command=self.stage, width=80).pack(side="left", padx=5)
+        
+        columns = ("SKU", "Ürün Adı", "Sistem", "Sayılan", "Fark")
+        self.tree = ttk.Treeview(main_frame, columns=columns, show="headings", height=15)
+        for col in columns:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=240 if col == "Ürün Adı" else 100, minwidth=60)
+        self.tree.pack(fill="both", expand=True)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        
+        self.summary_label = ctk.CTkLabel(main_frame, text="")
+        self.summary_label.pack(fill="x", pady=5)
+        
+        button_frame = ctk.CTkFrame(main_frame)
+        button_frame.pack(pady=10)
+        
+        ctk.CTkButton(button_frame, text="Sayımı Onayla", command=self.commit, width=120).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Sayımı İptal Et", command=self.discard, width=120).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Kapat", command=self.dialog.destroy, width=100).pack(side="left", padx=5)
+        
+        self.refresh()
+        self.code_entry.focus_set()
+    
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for item in self.services.app_data.items:
+            self.tree.insert("", "end", iid=item.id, values=(item.id, item.name, item.stock_qty, "", ""))
+        for line in self.services.stock_take_preview():
+            self.show_line(line)
+        self.update_summary()
+    
+    def show_line(self, line):
+        if self.tree.exists(line.sku):
+            self.tree.item(line.sku, values=(line.sku, line.name, line.expected, line.counted, f"{line.delta:+d}"))
+    
+    def on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection:
+            self.code_entry.delete(0, "end")
+            self.code_entry.insert(0, selection[0])
+            self.qty_entry.focus_set()
+    
+    def stage(self):
+        code = self.code_entry.get().strip()
+        item = self.services.find_by_barcode(code)
+        sku = item.id if item is not None else code
+        try:
+            line = self.services.stage_count(sku, int(self.qty_entry.get()))
+        except Exception as e:
+            messagebox.showerror("Hata", str(e))
+            return
+        self.show_line(line)
+        self.tree.see(line.sku)
+        self.code_entry.delete(0, "end")
+        self.qty_entry.delete(0, "end")
+        self.update_summary()
+        self.code_entry.focus_set()
+    
+    def update_summary(self):
+        lines = self.services.stock_take_preview()
+        variances = [line for line in lines if line.delta]
+        value = sum(line.value_delta or 0.0 for line in variances)
+        self.summary_label.configure(
+            text=f"Sayılan: {len(lines)} / {len(self.services.app_data.items)} | Farklı: {len(variances)} | Değer farkı: {value:+.2f}"
+        )
+    
+    def commit(self):
+        variances = [line for line in self.services.stock_take_preview() if line.delta]
+        if not messagebox.askyesno("Onay", f"{len(variances)} üründe stok düzeltilecek. Onaylıyor musunuz?"):
+            return
+        try:
+            summary = self.services.commit_stock_take()
+        except Exception as e:
+            messagebox.showerror("Hata", str(e))
+            return
+        if summary["rejected"]:
+            messagebox.showwarning("Uyarı", "\n".join(f"{sku}: {e}" for sku, e in summary["rejected"].items()))
+            self.refresh()
+            return
+        messagebox.showinfo("Başarılı", f"Sayım kaydedildi: {summary['adjusted']} düzeltme, {summary['unchanged']} değişmeyen.")
+        self.dialog.destroy()
+    
+    def discard(self):
+        if messagebox.askyesno("Onay", "Sayım silinecek. Emin misiniz?"):
+            self.services.discard_stock_take()
+            self.dialog.destroy()
+
+
 class SettingsDialog:
     def __init__(self, parent, services: Services):
         self.services = services
@@ -229,7 +536,7 @@ class SettingsDialog:
         
         self.dialog = ctk.CTkToplevel(parent)
         self.dialog.title("Ayarlar")
-        self.dialog.geometry("500x400")
+        self.dialog.geometry("500x480")
         self.dialog.transient(parent)
         self.dialog.grab_set()
         
@@ -254,6 +561,11 @@ class SettingsDialog:
         self.delim_entry.insert(0, services.app_data.settings.csv_delimiter)
         self.delim_entry.pack(pady=(0, 10))
         
+        ctk.CTkLabel(main_frame, text="Kayıt güvenliği (none / fsync / fsync_dir / group):").pack(pady=(10, 5))
+        self.durability_combo = ctk.CTkComboBox(main_frame, values=list(DURABILITY_MODES), width=150)
+        self.durability_combo.set(services.app_data.settings.durability)
+        self.durability_combo.pack(pady=(0, 10))
+        
         button_frame = ctk.CTkFrame(main_frame)
         button_frame.pack(pady=20)
         
@@ -265,8 +577,9 @@ class SettingsDialog:
             categories = [line.strip() for line in self.categories_text.get("1.0", "end-1c").splitlines() if line.strip()]
             inclusive = self.inclusive_var.get()
             delimiter = self.delim_entry.get() or ","
+            durability = self.durability_combo.get()
             
-            self.services.update_settings(categories, inclusive, delimiter)
+            self.services.update_settings(categories, inclusive, delimiter, durability=durability)
             
             self.result = True
             self.dialog.destroy()
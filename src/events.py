@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class ChangeKind(str, Enum):
+    ITEM_ADDED = "item_added"
+    ITEM_UPDATED = "item_updated"
+    ITEM_DELETED = "item_deleted"
+    STOCK_MOVED = "stock_moved"
+    SETTINGS_CHANGED = "settings_changed"
+    BULK_IMPORT = "bulk_import"
+    RECIPES_CHANGED = "recipes_changed"
+    # Anything may have changed (reload, undo/redo, compaction); consumers
+    # should rebuild. `skus` lists what is known to be affected, if anything.
+    RELOADED = "reloaded"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    kind: ChangeKind
+    skus: Tuple[str, ...] = ()
+
+
+Subscriber = Callable[[List[ChangeEvent]], None]
+
+
+def coalesce(events: Iterable[ChangeEvent]) -> List[ChangeEvent]:
+    """Merge events of the same kind, keeping first-seen order of kinds and SKUs."""
+    merged: Dict[ChangeKind, Dict[str, None]] = {}
+    for event in events:
+        skus = merged.setdefault(event.kind, {})
+        for sku in event.skus:
+            skus.setdefault(sku, None)
+    return [ChangeEvent(kind, tuple(skus)) for kind, skus in merged.items()]
+
+
+class EventBus:
+    """Delivers lists of change events to subscribers after they are saved.
+
+    Subscribers run synchronously on the thread that saved; an exception in
+    one is logged and does not affect the others or the caller.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self._subscribers: List[Tuple[Subscriber, Optional[frozenset]]] = []
+
+    def subscribe(self, callback: Subscriber, kinds: Optional[Iterable[ChangeKind]] = None) -> Callable[[], None]:
+        """Register `callback` for all events, or only `kinds`. Returns an unsubscribe function."""
+        entry = (callback, frozenset(kinds) if kinds is not None else None)
+        self._subscribers.append(entry)
+
+        def unsubscribe() -> None:
+            if entry in self._subscribers:
+                self._subscribers.remove(entry)
+        return unsubscribe
+
+    def publish(self, events: List[ChangeEvent]) -> None:
+        if not events:
+            return
+        for callback, kinds in list(self._subscribers):
+            selected = events if kinds is None else [e for e in events if e.kind in kinds]
+            if not selected:
+                continue
+            try:
+                callback(selected)
+            except Exception as e:
+                self.logger.error(f"Change subscriber {getattr(callback, '__name__', callback)} failed: {e}")
@@ -0,0 +1,183 @@
+import math
+import time
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Latency histograms use log-spaced buckets (4 per power of two, from 1 µs),
+# so recording is O(1) and percentiles are within ~19% of the true value.
+_BUCKETS_PER_OCTAVE = 4
+_MAX_BUCKET = 30 * _BUCKETS_PER_OCTAVE  # ~18 minutes
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * (_MAX_BUCKET + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms: float) -> None:
+        us = ms * 1000.0
+        bucket = 0 if us <= 1.0 else min(_MAX_BUCKET, int(math.log2(us) * _BUCKETS_PER_OCTAVE) + 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, p: float) -> float:
+        """Upper bound (ms) of the bucket holding the p-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.max_ms, 2 ** (bucket / _BUCKETS_PER_OCTAVE) / 1000.0)
+        return self.max_ms
+
+
+class _Frame:
+    __slots__ = ("name", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.children: Dict[str, float] = {}
+
+
+class Metrics:
+    """In-process latency and byte counters for named operations.
+
+    Spans nest: time spent in an inner span is also reported as a phase of
+    the outermost one, and outermost spans slower than `slow_ms` are logged
+    with that breakdown to the `cafestock` logger.
+    """
+
+    def __init__(self, slow_ms: float = 500.0, logger: Optional[logging.Logger] = None):
+        self.enabled = True
+        self.slow_ms = slow_ms
+        self.logger = logger or logging.getLogger("cafestock")
+        self._histograms: Dict[str, Histogram] = {}
+        self._bytes: Dict[str, int] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        stack, frame, t0 = self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit(stack, frame, t0)
+
+    def timed(self, name: str) -> Callable:
+        """Decorator form of span(), without the context-manager overhead."""
+        def decorate(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                stack, frame, t0 = self._enter(name)
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self._exit(stack, frame, t0)
+            return wrapper
+        return decorate
+
+    def _enter(self, name: str):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        frame = _Frame(name)
+        stack.append(frame)
+        return stack, frame, time.perf_counter()
+
+    def _exit(self, stack: List[_Frame], frame: _Frame, t0: float) -> None:
+        ms = (time.perf_counter() - t0) * 1000.0
+        stack.pop()
+        self._record(frame.name, ms)
+        if stack:
+            root = stack[0]
+            root.children[frame.name] = root.children.get(frame.name, 0.0) + ms
+        elif ms >= self.slow_ms:
+            self._log_slow(frame, ms)
+
+    def add_bytes(self, name: str, n: int) -> None:
+        if self.enabled:
+            with self._lock:
+                self._bytes[name] = self._bytes.get(name, 0) + n
+
+    def _record(self, name: str, ms: float) -> None:
+        # No lock on the hot path: under the GIL a concurrent record can at
+        # worst be lost, which is fine for statistics
+        hist = self._histograms.get(name)
+        if hist is None:
+            hist = self._histograms.setdefault(name, Histogram())
+        hist.record(ms)
+
+    def _log_slow(self, frame: _Frame, ms: float) -> None:
+        phases = sorted(frame.children.items(), key=lambda kv: -kv[1])
+        detail = ", ".join(f"{name} {t:.1f}" for name, t in phases[:6])
+        self.logger.warning(f"Slow operation {frame.name}: {ms:.1f} ms" + (f" ({detail})" if detail else ""))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._bytes.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            names = sorted(set(self._histograms) | set(self._bytes))
+            out = {}
+            for name in names:
+                hist = self._histograms.get(name)
+                row: Dict[str, Any] = {"bytes": self._bytes.get(name, 0)}
+                if hist is not None:
+                    row.update(
+                        count=hist.count,
+                        total_ms=round(hist.total_ms, 3),
+                        p50_ms=round(hist.percentile(50), 3),
+                        p95_ms=round(hist.percentile(95), 3),
+                        p99_ms=round(hist.percentile(99), 3),
+                        max_ms=round(hist.max_ms, 3),
+                    )
+                out[name] = row
+            return out
+
+    def report(self) -> str:
+        lines = [f"{'operation':<36} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'MB':>8}"]
+        for name, row in sorted(self.snapshot().items(), key=lambda kv: -kv[1].get("total_ms", 0)):
+            lines.append(
+                f"{name:<36} {row.get('count', 0):>7} {row.get('p50_ms', 0):9.2f} {row.get('p95_ms', 0):9.2f} "
+                f"{row.get('p99_ms', 0):9.2f} {row.get('max_ms', 0):9.2f} {row['bytes'] / 1e6:8.2f}"
+            )
+        return "\n".join(lines)
+
+
+metrics = Metrics()
+
+
+def instrument(prefix: str, extra: Iterable[str] = (), skip: Iterable[str] = ()) -> Callable[[type], type]:
+    """Class decorator: time every public method (plus `extra` private ones)
+    as `<prefix>.<method>` spans."""
+    skip = set(skip)
+
+    def decorate(cls: type) -> type:
+        names: List[str] = [n for n in vars(cls) if not n.startswith("_")] + list(extra)
+        for name in names:
+            attr = vars(cls).get(name)
+            if name in skip or not callable(attr) or isinstance(attr, (type, staticmethod, classmethod)):
+                continue
+            setattr(cls, name, metrics.timed(f"{prefix}.{name}")(attr))
+        return cls
+    return decorate
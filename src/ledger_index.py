@@ -0,0 +1,91 @@
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from models import Transaction
+from utils import iso_to_epoch
+
+
+class LedgerIndex:
+    """Sorted epoch-timestamp index over `AppData.transactions`.
+
+    Rows are identified by their rank in time order; `_rows[rank]` is the
+    position in the ledger list. Secondary indexes (type, reason, sku) map a
+    key to the ascending ranks carrying it, so a time-range query on any of
+    them is two bisects plus a walk over the matching rows only.
+    """
+
+    def __init__(self, transactions: Sequence[Transaction]):
+        self.transactions = transactions
+        self._epochs: List[float] = []
+        self._rows: List[int] = []
+        self._by_type: Dict[str, List[int]] = {}
+        self._by_reason: Dict[str, List[int]] = {}
+        self._by_sku: Dict[str, List[int]] = {}
+        self._build()
+
+    def _build(self) -> None:
+        epochs = [iso_to_epoch(tx.timestamp) for tx in self.transactions]
+        order = list(range(len(epochs)))
+        if any(epochs[i] > epochs[i + 1] for i in range(len(epochs) - 1)):
+            order.sort(key=epochs.__getitem__)
+        for pos in order:
+            self._add(pos, epochs[pos])
+
+    def _add(self, pos: int, epoch: float) -> None:
+        rank = len(self._rows)
+        self._epochs.append(epoch)
+        self._rows.append(pos)
+        tx = self.transactions[pos]
+        self._by_type.setdefault(getattr(tx.type, "value", tx.type), []).append(rank)
+        self._by_reason.setdefault(tx.reason, []).append(rank)
+        self._by_sku.setdefault(tx.sku, []).append(rank)
+
+    def append(self, pos: int) -> bool:
+        """Index a row appended at `pos`. Returns False if it is out of time
+        order, in which case the caller should rebuild the index."""
+        epoch = iso_to_epoch(self.transactions[pos].timestamp)
+        if self._epochs and epoch < self._epochs[-1]:
+            return False
+        self._add(pos, epoch)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def query(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        type: Optional[str] = None,
+        sku: Optional[str] = None,
+        reason: Optional[str] = None,
+    ) -> Iterator[Transaction]:
+        """Yield transactions with start <= epoch < end in time order."""
+        lo = 0 if start is None else bisect_left(self._epochs, start)
+        hi = len(self._epochs) if end is None else bisect_left(self._epochs, end)
+        if lo >= hi:
+            return
+        type = getattr(type, "value", type)
+        candidates = []
+        if type is not None:
+            candidates.append(self._by_type.get(type, []))
+        if reason is not None:
+            candidates.append(self._by_reason.get(reason, []))
+        if sku is not None:
+            candidates.append(self._by_sku.get(sku, []))
+        if candidates:
+            ranks = min(candidates, key=len)
+            span = range(bisect_left(ranks, lo), bisect_left(ranks, hi))
+        else:
+            ranks = None
+            span = range(lo, hi)
+        for i in span:
+            rank = ranks[i] if ranks is not None else i
+            tx = self.transactions[self._rows[rank]]
+            if type is not None and getattr(tx.type, "value", tx.type) != type:
+                continue
+            if reason is not None and tx.reason != reason:
+                continue
+            if sku is not None and tx.sku != sku:
+                continue
+            yield tx
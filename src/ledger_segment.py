@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from models import Transaction, TransactionType
+from utils import iso_to_epoch
+
+try:
+    import numpy as np  # Optional: vectorized reporting over the mapped columns
+except Exception:  # pragma: no cover - numpy is not a dependency
+    np = None
+
+
+# Columnar, fixed-width ledger file for read-only reporting.
+#
+#   header: magic, byte order, row count
+#   columns (each 8-byte aligned, native byte order, sorted by timestamp):
+#     ts     int64   epoch seconds
+#     sku    uint32  index into the "skus" string table
+#     reason uint32  index into the "reasons" string table
+#     qty    int32   signed stock change
+#     type   uint8   index into TYPE_CODES
+#
+# String tables live in a JSON sidecar (`<path>.json`) with the revision of
+# the data it was built from and the source ledger's row count and last TX
+# id, used to tell whether it is stale.
+# Compacted months are included as their summaries' synthetic rows, which
+# are not counted as source rows.
+SEGMENT_MAGIC = b"CSTLSEG1"
+_HEADER = struct.Struct("<8s8sq")
+_COLUMNS: List[Tuple[str, str]] = [("ts", "q"), ("sku", "I"), ("reason", "I"), ("qty", "i"), ("type", "B")]
+TYPE_CODES = [t.value for t in TransactionType]
+
+
+def _column_offsets(count: int) -> Dict[str, int]:
+    offsets = {}
+    pos = _HEADER.size
+    for name, code in _COLUMNS:
+        pos = (pos + 7) & ~7
+        offsets[name] = pos
+        pos += count * array(code).itemsize
+    return offsets
+
+
+def write_segment(path: str, transactions: Iterable[Transaction], compacted: Sequence[Transaction] = (), revision: int = 0) -> int:
+    """Write the `compacted` summary rows and the ledger as a segment file plus
+    its string-table sidecar. Returns the number of ledger rows."""
+    skus: Dict[str, int] = {}
+    reasons: Dict[str, int] = {}
+    types = {t: i for i, t in enumerate(TYPE_CODES)}
+    columns = {name: array(code) for name, code in _COLUMNS}
+    ts, sku_col, reason_col, qty_col, type_col = (columns[name] for name, _ in _COLUMNS)
+    on_hand: Dict[str, int] = {}
+    last_id = ""
+    in_order = True
+    for tx in chain(compacted, transactions):
+        epoch = int(iso_to_epoch(tx.timestamp))
+        if ts and epoch < ts[-1]:
+            in_order = False
+        delta = tx.signed_qty(on_hand.get(tx.sku, 0))
+        on_hand[tx.sku] = on_hand.get(tx.sku, 0) + delta
+        ts.append(epoch)
+        sku_col.append(skus.setdefault(tx.sku, len(skus)))
+        reason_col.append(reasons.setdefault(tx.reason, len(reasons)))
+        qty_col.append(delta)
+        type_col.append(types[getattr(tx.type, "value", tx.type)])
+        last_id = tx.id
+    count = len(ts)
+    source_count = count - len(compacted)
+    if not source_count:
+        last_id = ""
+    if not in_order:
+        order = sorted(range(count), key=ts.__getitem__)
+        for name, code in _COLUMNS:
+            col = columns[name]
+            columns[name] = array(code, (col[i] for i in order))
+    offsets = _column_offsets(count)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(SEGMENT_MAGIC, sys.byteorder.encode("ascii").ljust(8), count))
+        for name, _ in _COLUMNS:
+            f.write(b"\0" * (offsets[name] - f.tell()))
+            columns[name].tofile(f)
+    tables = {
+        "skus": list(skus),
+        "reasons": list(reasons),
+        "types": TYPE_CODES,
+        "source_revision": revision,
+        "source_count": source_count,
+        "source_last_id": last_id,
+    }
+    with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+        json.dump(tables, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    os.replace(path + ".json.tmp", path + ".json")
+    return source_count
+
+
+class LedgerSegment:
+    """Read-only, memory-mapped view over a segment file.
+
+    Columns are zero-copy views into the mapping: NumPy arrays when numpy is
+    installed, typed memoryviews otherwise. Only the string tables are
+    decoded into Python objects.
+    """
+
+    def __init__(self, path: str):
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            tables = json.load(f)
+        self.skus: List[str] = tables["skus"]
+        self.reasons: List[str] = tables["reasons"]
+        self.types: List[str] = tables["types"]
+        self.source_revision: Optional[int] = tables.get("source_revision")
+        self.source_count: int = tables["source_count"]
+        self.source_last_id: str = tables["source_last_id"]
+        self._sku_codes = {s: i for i, s in enumerate(self.skus)}
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byteorder, count = _HEADER.unpack(self._mm[:_HEADER.size])
+        if magic != SEGMENT_MAGIC or byteorder.strip() != sys.byteorder.encode("ascii"):
+            self.close()
+            raise ValueError("Not a ledger segment for this platform")
+        self.count = count
+        offsets = _column_offsets(count)
+        self._views = []
+        for name, code in _COLUMNS:
+            start = offsets[name]
+            length = count * array(code).itemsize
+            if np is not None:
+                column = np.frombuffer(self._mm, dtype=np.dtype(code), count=count, offset=start)
+            else:
+                view = memoryview(self._mm)[start:start + length].cast(code)
+                self._views.append(view)
+                column = view
+            setattr(self, name, column)
+
+    def close(self) -> None:
+        for view in getattr(self, "_views", []):
+            view.release()
+        self._views = []
+        for name, _ in _COLUMNS:
+            if hasattr(self, name):
+                delattr(self, name)
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self) -> "LedgerSegment":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def is_current(self, transactions: List[Transaction], revision: int) -> bool:
+        """True if built from `transactions` as saved at `revision`.
+
+        Every save bumps the revision, so rows rewritten in place (same count
+        and last id) make the segment stale too.
+        """
+        if revision != self.source_revision or len(transactions) != self.source_count:
+            return False
+        return not transactions or transactions[-1].id == self.source_last_id
+
+    def _bounds(self, start: Optional[float], end: Optional[float]) -> Tuple[int, int]:
+        if np is not None:
+            lo = 0 if start is None else int(np.searchsorted(self.ts, start, side="left"))
+            hi = self.count if end is None else int(np.searchsorted(self.ts, end, side="left"))
+        else:
+            lo = 0 if start is None else bisect_left(self.ts, start)
+            hi = self.count if end is None else bisect_left(self.ts, end)
+        return lo, hi
+
+    def totals_by_sku(self, start: Optional[float] = None, end: Optional[float] = None, type: Optional[str] = None) -> Dict[str, int]:
+        """Sum of signed quantities per SKU for start <= ts < end."""
+        lo, hi = self._bounds(start, end)
+        type_code = None if type is None else self.types.index(getattr(type, "value", type))
+        if np is not None:
+            sku = self.sku[lo:hi]
+            qty = self.qty[lo:hi]
+            if type_code is not None:
+                mask = self.type[lo:hi] == type_code
+                sku, qty = sku[mask], qty[mask]
+            sums = np.bincount(sku, weights=qty, minlength=len(self.skus))
+            return {self.skus[i]: int(v) for i, v in enumerate(sums) if v}
+        totals = [0] * len(self.skus)
+        sku, qty, types = self.sku, self.qty, self.type
+        for i in range(lo, hi):
+            if type_code is None or types[i] == type_code:
+                totals[sku[i]] += qty[i]
+        return {self.skus[i]: v for i, v in enumerate(totals) if v}
+
+    def history(self, sku: str, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple[int, str, int, str]]:
+        """Yield (epoch, type, signed qty, reason) rows of one SKU in time order."""
+        code = self._sku_codes.get(sku)
+        if code is None:
+            return
+        lo, hi = self._bounds(start, end)
+        if np is not None:
+            for i in np.flatnonzero(self.sku[lo:hi] == code):
+                i = int(i) + lo
+                yield int(self.ts[i]), self.types[self.type[i]], int(self.qty[i]), self.reasons[self.reason[i]]
+            return
+        for i in range(lo, hi):
+            if self.sku[i] == code:
+                yield self.ts[i], self.types[self.type[i]], self.qty[i], self.reasons[self.reason[i]]
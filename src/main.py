@@ -1,6 +1,7 @@
 import sys
 import logging
 import os
+import argparse
 
 # Add src directory to path for PyInstaller
 if getattr(sys, 'frozen', False):
@@ -12,22 +13,51 @@ else:
 
 sys.path.insert(0, src_dir)
 
-from utils import get_app_root, setup_logging, SingleInstanceLock
-from storage import Storage
-from services import Services
+from utils import get_app_root, get_logs_dir, setup_logging, InstanceLock
 from ui import run_ui
+from instrumentation import metrics
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Kafe Stok Takip")
+    parser.add_argument(
+        "--profile",
+        metavar="ACTIONS",
+        default=os.environ.get("CAFESTOCK_PROFILE"),
+        help="comma-separated Services actions (or 'all') to capture with cProfile/tracemalloc under logs/profiles/; "
+             "also read from CAFESTOCK_PROFILE",
+    )
+    parser.add_argument("--profile-keep", type=int, default=5, metavar="N", help="profiles kept per action (default 5)")
+    return parser.parse_args(argv)
 
 
 def main():
+    args = parse_args()
     app_root = get_app_root()
     logger = setup_logging(app_root, level=logging.INFO)
-    lock = SingleInstanceLock(app_root)
+    lock = InstanceLock(app_root)
     try:
         lock.acquire()
-        storage = Storage(app_root, logger)
-        storage.ensure_initial_files()
-        services = Services(storage, logger)
-        run_ui(services, logger)
+
+        def load_services():
+            # Runs on the UI's loader thread while the window shows its
+            # loading state; the data stack is imported here for the same reason
+            from storage import Storage
+            from services import Services
+            storage = Storage(app_root, logger, lazy_transactions=True, snapshot_cache=True, verify_on_load=True)
+            storage.ensure_initial_files()
+            services = Services(storage, logger)
+            if args.profile:
+                from profiling import ActionProfiler
+                profiler = ActionProfiler(os.path.join(get_logs_dir(app_root), "profiles"), logger, keep=args.profile_keep)
+                profiler.install(services, [a.strip() for a in args.profile.split(",") if a.strip()])
+            return services
+
+        services = run_ui(load_services, app_root, logger)
+        if services is not None:
+            # Next launch skips JSON parsing if items.json is left untouched
+            services.storage.write_snapshot(services.app_data)
+        logger.info("Session timings:\n%s", metrics.report())
     finally:
         lock.release()
 
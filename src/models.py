@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import threading
 from dataclasses import dataclass, field, asdict
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any
 from enum import Enum
 
 
@@ -48,10 +49,211 @@ class Transaction:
     timestamp: str
     reason: str
     note: Optional[str] = None
+    unit_cost: Optional[float] = None  # per-receipt cost, IN only
+    delta: Optional[int] = None  # signed stock change, ADJUST only
 
     def validate(self) -> None:
         if self.qty is None or not isinstance(self.qty, int) or self.qty <= 0:
             raise ValueError("qty must be an integer > 0")
+        if self.unit_cost is not None and self.unit_cost < 0:
+            raise ValueError("unit_cost must be >= 0")
+
+    def signed_qty(self, on_hand: Optional[int] = None) -> int:
+        """Stock change caused by this transaction.
+
+        Older ADJUST rows have no `delta`; their direction is recovered from the
+        generated note ("Delta +3" / "Set to 12", the latter needs `on_hand`).
+        """
+        if self.type == TransactionType.IN:
+            return self.qty
+        if self.type == TransactionType.OUT:
+            return -self.qty
+        if self.delta is not None:
+            return self.delta
+        note = self.note or ""
+        try:
+            if note.startswith("Delta "):
+                return int(note[6:])
+            if note.startswith("Set to ") and on_hand is not None:
+                return int(note[7:]) - on_hand
+        except ValueError:
+            pass
+        return self.qty
+
+
+def transactions_from_dicts(rows: List[Dict[str, Any]]) -> List[Transaction]:
+    return [
+        Transaction(
+            id=t["id"],
+            type=TransactionType(t["type"]),
+            sku=t["sku"],
+            qty=int(t["qty"]),
+            timestamp=t["timestamp"],
+            reason=t.get("reason", ""),
+            note=t.get("note"),
+            unit_cost=t.get("unit_cost"),
+            delta=t.get("delta"),
+        )
+        for t in rows
+    ]
+
+
+class LazyTransactionList(list):
+    """A transaction list that is decoded on first use.
+
+    `loader` returns the decoded transactions; it runs once, either on the
+    first list access from any thread or in the background via
+    `materialize_in_background`. Afterwards this behaves as a plain list.
+    """
+
+    def __init__(self, loader: Callable[[], List[Transaction]]):
+        super().__init__()
+        self._loader: Optional[Callable[[], List[Transaction]]] = loader
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loader is None
+
+    def materialize(self) -> None:
+        if self._loader is None:
+            return
+        with self._lock:
+            if self._loader is None:
+                return
+            list.extend(self, self._loader())
+            self._loader = None
+
+    def materialize_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.materialize, name="tx-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def __reduce_ex__(self, protocol):
+        self.materialize()
+        return (list, (list.copy(self),))
+
+
+def _materializing(name: str):
+    base = getattr(list, name)
+
+    def method(self, *args, **kwargs):
+        self.materialize()
+        return base(self, *args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+for _name in (
+    "__iter__", "__len__", "__getitem__", "__setitem__", "__delitem__", "__contains__",
+    "__reversed__", "__iadd__", "__add__", "__mul__", "__eq__", "__ne__", "__lt__", "__le__",
+    "__gt__", "__ge__", "__repr__", "append", "extend", "insert", "remove", "pop", "clear",
+    "index", "count", "sort", "reverse", "copy",
+):
+    setattr(LazyTransactionList, _name, _materializing(_name))
+
+
+@dataclass
+class PeriodSummary:
+    """Net movements of one SKU in one compacted month ("YYYY-MM").
+
+    The original rows live in the month's archive segment.
+    """
+    sku: str
+    period: str
+    qty_in: int = 0
+    qty_out: int = 0
+    net_adjust: int = 0
+    tx_count: int = 0
+    costed_qty_in: int = 0
+    cost_in: float = 0.0
+    first_tx_id: str = ""
+    last_tx_id: str = ""
+    last_timestamp: str = ""
+
+    @property
+    def net_qty(self) -> int:
+        return self.qty_in - self.qty_out + self.net_adjust
+
+    def as_transactions(self) -> List[Transaction]:
+        """Synthetic IN/OUT/ADJUST rows equivalent to this period's movements."""
+        out: List[Transaction] = []
+        tx_id = f"{self.last_tx_id}@{self.period}"
+        if self.qty_in:
+            unit_cost = self.cost_in / self.costed_qty_in if self.costed_qty_in else None
+            out.append(Transaction(tx_id, TransactionType.IN, self.sku, self.qty_in, self.last_timestamp, "Summary", unit_cost=unit_cost))
+        if self.qty_out:
+            out.append(Transaction(tx_id, TransactionType.OUT, self.sku, self.qty_out, self.last_timestamp, "Summary"))
+        if self.net_adjust:
+            out.append(Transaction(tx_id, TransactionType.ADJUST, self.sku, abs(self.net_adjust), self.last_timestamp, "Summary", delta=self.net_adjust))
+        return out
+
+
+@dataclass
+class PurchaseOrderLine:
+    sku: str
+    name: str
+    supplier: Optional[str]
+    unit: str
+    stock_qty: int
+    reorder_level: int
+    suggested_qty: int
+    unit_cost: Optional[float] = None
+
+    @property
+    def line_cost(self) -> Optional[float]:
+        if self.unit_cost is None:
+            return None
+        return round(self.unit_cost * self.suggested_qty, 2)
+
+
+@dataclass
+class Recipe:
+    """A sellable menu product and the ingredients one unit of it uses.
+
+    Quantities are whole units of each ingredient's stock unit, so
+    ingredients used in small amounts are best stocked in gram/ml.
+    """
+    product: str  # menu/POS product code
+    name: str
+    components: Dict[str, int] = field(default_factory=dict)  # ingredient SKU -> qty per unit sold
+
+    def validate(self) -> None:
+        if not self.product.strip():
+            raise ValueError("Product code is required")
+        if not self.components:
+            raise ValueError("A recipe needs at least one ingredient")
+        for sku, qty in self.components.items():
+            if not isinstance(qty, int) or qty <= 0:
+                raise ValueError(f"Ingredient quantity for {sku} must be a positive integer")
+
+
+@dataclass
+class StockTakeSession:
+    """A physical count in progress: counted quantities staged per SKU."""
+    started: str
+    counts: Dict[str, int] = field(default_factory=dict)
+    note: Optional[str] = None
+
+
+@dataclass
+class StockTakeLine:
+    sku: str
+    name: str
+    expected: int
+    counted: int
+    unit_cost: Optional[float] = None
+
+    @property
+    def delta(self) -> int:
+        return self.counted - self.expected
+
+    @property
+    def value_delta(self) -> Optional[float]:
+        if self.unit_cost is None:
+            return None
+        return round(self.unit_cost * self.delta, 2)
 
 
 @dataclass
@@ -59,6 +261,9 @@ class Settings:
     categories: List[str] = field(default_factory=lambda: ["Malzeme", "İçecek", "Ambalaj", "Diğer"])
     low_stock_inclusive: bool = True  # True: <=, False: <
     csv_delimiter: str = ","
+    durability: str = "none"  # see utils.DURABILITY_MODES
+    group_fsync_window_ms: int = 200
+    slow_op_ms: int = 500  # operations slower than this are logged
 
 
 @dataclass
@@ -67,10 +272,14 @@ class AppData:
     items: List[Item] = field(default_factory=list)
     transactions: List[Transaction] = field(default_factory=list)
     settings: Settings = field(default_factory=Settings)
+    summaries: List[PeriodSummary] = field(default_factory=list)
+    recipes: List[Recipe] = field(default_factory=list)
+    revision: int = 0  # bumped by every save, for optimistic concurrency
 
     def to_dict(self) -> Dict[str, Any]:
         return {
             "version": self.version,
+            "revision": self.revision,
             "items": [asdict(i) for i in self.items],
             "transactions": [
                 {
@@ -80,6 +289,8 @@ class AppData:
                 for t in self.transactions
             ],
             "settings": asdict(self.settings),
+            "summaries": [asdict(s) for s in self.summaries],
+            "recipes": [asdict(r) for r in self.recipes],
         }
 
     @staticmethod
@@ -88,18 +299,20 @@ class AppData:
         transactions_raw = data.get("transactions", [])
         settings_raw = data.get("settings", {})
         items = [Item(**i) for i in items_raw]
-        txs = [
-            Transaction(
-                id=t["id"],
-                type=TransactionType(t["type"]),
-                sku=t["sku"],
-                qty=int(t["qty"]),
-                timestamp=t["timestamp"],
-                reason=t.get("reason", ""),
-                note=t.get("note"),
-            )
-            for t in transactions_raw
-        ]
+        if isinstance(transactions_raw, LazyTransactionList):
+            txs = transactions_raw
+        else:
+            txs = transactions_from_dicts(transactions_raw)
         settings = Settings(**settings_raw) if settings_raw else Settings()
-        app = AppData(version=int(data.get("version", 1)), items=items, transactions=txs, settings=settings)
+        summaries = [PeriodSummary(**s) for s in data.get("summaries", [])]
+        recipes = [Recipe(**r) for r in data.get("recipes", [])]
+        app = AppData(
+            version=int(data.get("version", 1)),
+            items=items,
+            transactions=txs,
+            settings=settings,
+            summaries=summaries,
+            recipes=recipes,
+            revision=int(data.get("revision", 0)),
+        )
         return app
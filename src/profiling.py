@@ -0,0 +1,125 @@
+import os
+import io
+import time
+import pstats
+import cProfile
+import functools
+import threading
+import tracemalloc
+from typing import Iterable, List, Optional
+
+# Field profiling: each call of a chosen Services action is run under
+# cProfile and tracemalloc, and leaves two files under logs/profiles/:
+#   <action>.prof   binary profile for pstats / snakeviz
+#   <action>.txt    wall time, peak memory, top functions and allocations
+# Older captures rotate to <action>.prof.1 ... .N like RotatingFileHandler.
+PROFILE_KEEP = 5
+TOP_N = 25
+
+
+def _rotate(path: str, keep: int) -> None:
+    if keep <= 0:
+        return
+    for i in range(keep - 1, 0, -1):
+        src = f"{path}.{i}"
+        if os.path.exists(src):
+            os.replace(src, f"{path}.{i + 1}")
+    if os.path.exists(path):
+        os.replace(path, f"{path}.1")
+
+
+def profilable_actions(services) -> List[str]:
+    cls = type(services)
+    return sorted(n for n, v in vars(cls).items() if not n.startswith("_") and callable(v) and n not in ("batch", "can_undo", "can_redo"))
+
+
+class ActionProfiler:
+    def __init__(self, profiles_dir: str, logger, keep: int = PROFILE_KEEP, top: int = TOP_N):
+        self.profiles_dir = profiles_dir
+        self.logger = logger
+        self.keep = keep
+        self.top = top
+        self._local = threading.local()
+        os.makedirs(profiles_dir, exist_ok=True)
+
+    def install(self, services, actions: Iterable[str]) -> List[str]:
+        """Wrap `actions` ("all" for every public one) on this Services instance."""
+        actions = list(actions)
+        if "all" in actions:
+            actions = profilable_actions(services)
+        installed = []
+        for name in actions:
+            method = getattr(services, name, None)
+            if not callable(method):
+                self.logger.warning(f"Profiling: unknown action {name!r}")
+                continue
+            setattr(services, name, self._wrap(name, method))
+            installed.append(name)
+        self.logger.info(f"Profiling enabled for: {', '.join(installed)}")
+        return installed
+
+    def _wrap(self, name: str, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            # Actions calling other profiled actions are captured once, as a whole
+            if getattr(self._local, "active", False):
+                return method(*args, **kwargs)
+            self._local.active = True
+            try:
+                return self._run(name, method, args, kwargs)
+            finally:
+                self._local.active = False
+        return wrapper
+
+    def _run(self, name: str, method, args, kwargs):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        profile = cProfile.Profile()
+        t0 = time.perf_counter()
+        error: Optional[BaseException] = None
+        try:
+            profile.enable()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                profile.disable()
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - t0
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            try:
+                self._write(name, profile, before, after, elapsed, peak, error)
+            except Exception as e:
+                self.logger.error(f"Profiling: could not write results for {name}: {e}")
+
+    def _write(self, name, profile, before, after, elapsed, peak, error) -> None:
+        prof_path = os.path.join(self.profiles_dir, f"{name}.prof")
+        txt_path = os.path.join(self.profiles_dir, f"{name}.txt")
+        _rotate(prof_path, self.keep)
+        _rotate(txt_path, self.keep)
+        profile.dump_stats(prof_path)
+
+        out = io.StringIO()
+        out.write(f"action: {name}\n")
+        out.write(f"time: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        out.write(f"wall: {elapsed * 1000:.1f} ms\n")
+        out.write(f"peak traced memory: {peak / 1e6:.2f} MB\n")
+        if error is not None:
+            out.write(f"raised: {type(error).__name__}: {error}\n")
+        out.write(f"\n== top {self.top} functions by cumulative time ==\n")
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        out.write(f"\n== top {self.top} allocations (net, by line) ==\n")
+        for stat in after.compare_to(before, "lineno")[:self.top]:
+            out.write(f"{stat}\n")
+        with open(txt_path, "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+        self.logger.info(f"Profiled {name}: {elapsed * 1000:.1f} ms, peak {peak / 1e6:.2f} MB -> {prof_path}")
@@ -0,0 +1,80 @@
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+def approx_size(obj: Any, _depth: int = 0) -> int:
+    """Rough deep size of a report result: containers, dataclasses and scalars."""
+    size = sys.getsizeof(obj)
+    if _depth > 4:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(approx_size(k, _depth + 1) + approx_size(v, _depth + 1) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(approx_size(v, _depth + 1) for v in obj)
+    if hasattr(obj, "__dict__"):
+        return size + approx_size(obj.__dict__, _depth + 1)
+    return size
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class ReportCache:
+    """LRU cache of report results, bounded by their estimated size.
+
+    Each entry remembers the versions of the inputs it was computed from; a
+    lookup with different versions is a miss and replaces the entry, so stale
+    results never linger beside fresh ones. Cached values are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[int, ...], Any, int]]" = OrderedDict()
+
+    def get_or_compute(self, key: Hashable, versions: Tuple[int, ...], compute: Callable[[], Any]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == versions:
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+        self.stats.misses += 1
+        value = compute()
+        self._store(key, versions, value)
+        return value
+
+    def _store(self, key: Hashable, versions: Tuple[int, ...], value: Any) -> None:
+        self._discard(key)
+        size = approx_size(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (versions, value, size)
+        self.stats.bytes += size
+        while self.stats.bytes > self.max_bytes:
+            _, (_, _, dropped) = self._entries.popitem(last=False)
+            self.stats.bytes -= dropped
+            self.stats.evictions += 1
+        self.stats.entries = len(self._entries)
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.stats.bytes -= entry[2]
+            self.stats.entries = len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.stats.bytes = 0
+        self.stats.entries = 0
+
+    def stats_dict(self) -> Dict[str, int]:
+        return dict(self.stats.__dict__)
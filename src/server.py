@@ -0,0 +1,334 @@
+"""Local HTTP/JSON API over one Services instance, for POS integration.
+
+Mutations are queued to a single writer, which applies everything queued so
+far inside one `Services.batch()` and saves once (group commit); each request
+is answered after the save that includes it. Reads run on the writer thread
+too, between commits, so they only ever see saved data. When idle, the writer
+picks up saves made by other terminals every SYNC_INTERVAL_S, so reads are at
+most that stale.
+
+    GET  /items/<sku>            item
+    GET  /items?q=&category=&low=1
+    GET  /counts                 {"items": n, "low_stock": n}
+    GET  /stats                  server counters
+    POST /stock/in               {"sku", "qty", "reason"?, "note"?, "unit_cost"?}
+    POST /stock/out              {"sku", "qty", "reason"?, "note"?}
+    POST /stock/adjust           {"sku", "qty", "mode"?, "reason"?, "note"?}
+    POST /stock/batch            {"movements": [{"type": "in|out|adjust", ...}, ...]}
+
+Errors are {"error": message} with status 400 (invalid request or rejected
+movement), 404 (unknown route or item) or 500.
+"""
+import sys
+import json
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from models import Item, Transaction
+from services import Services
+from storage import Storage
+from instrumentation import metrics
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+MAX_GROUP = 512  # mutations applied per save at most
+SYNC_INTERVAL_S = 1.0  # idle writer checks items.json for other terminals' saves
+ADJUST_MODES = ("set", "delta")
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _item_dict(item: Item) -> Dict[str, Any]:
+    return asdict(item)
+
+
+def _tx_dict(tx: Transaction) -> Dict[str, Any]:
+    return {**asdict(tx), "type": tx.type.value}
+
+
+def _error_status(e: ValueError) -> int:
+    return 404 if str(e) == "Item not found" else 400
+
+
+def _movement(body: Dict[str, Any], kind: Optional[str] = None) -> Callable[[Services], Transaction]:
+    """Validate a movement request and return the mutation that applies it."""
+    if not isinstance(body, dict):
+        raise HttpError(400, "Movement must be a JSON object")
+    kind = kind or body.get("type")
+    sku = body.get("sku")
+    qty = body.get("qty")
+    if not isinstance(sku, str) or not sku:
+        raise HttpError(400, "sku is required")
+    if not isinstance(qty, int) or isinstance(qty, bool):
+        raise HttpError(400, "qty must be an integer")
+    # Everything is checked here: a mutation failing with anything but a
+    # ValueError on the writer would be a 500
+    extra: Dict[str, str] = {}
+    for key in ("reason", "note"):
+        value = body.get(key)
+        if value is not None:
+            if not isinstance(value, str):
+                raise HttpError(400, f"{key} must be a string")
+            extra[key] = value
+    if kind == "in":
+        unit_cost = body.get("unit_cost")
+        if unit_cost is not None and (not isinstance(unit_cost, (int, float)) or isinstance(unit_cost, bool)):
+            raise HttpError(400, "unit_cost must be a number")
+        return lambda s: s.stock_in(sku, qty, unit_cost=unit_cost, **extra)
+    if kind == "out":
+        return lambda s: s.stock_out(sku, qty, **extra)
+    if kind == "adjust":
+        mode = body.get("mode", "set")
+        if mode not in ADJUST_MODES:
+            raise HttpError(400, f"mode must be one of {', '.join(ADJUST_MODES)}")
+        return lambda s: s.stock_adjust(sku, qty, mode=mode, **extra)
+    raise HttpError(400, "type must be one of in, out, adjust")
+
+
+class InventoryServer:
+    def __init__(
+        self,
+        services: Services,
+        logger,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        max_group: int = MAX_GROUP,
+        sync_interval_s: float = SYNC_INTERVAL_S,
+    ):
+        self.services = services
+        self.logger = logger
+        self.host = host
+        self.port = port
+        self.max_group = max_group
+        self.sync_interval_s = sync_interval_s
+        self.stats = {"requests": 0, "mutations": 0, "commits": 0, "reloads": 0}
+        self._queue: Optional[asyncio.Queue] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        # One thread, so saves never overlap and reads never see a half-applied batch
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cafestock-writer")
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._writer())
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.logger.info(f"Inventory server listening on http://{self.host}:{self.port}")
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._writer_task is not None:
+            # Let queued mutations commit before shutting down
+            await self._queue.join()
+            self._writer_task.cancel()
+        self._executor.shutdown(wait=True)
+
+    # ---------- Writer ----------
+    async def submit(self, mutation: Callable[[Services], Any]) -> Any:
+        """Queue a mutation and wait until the save that includes it is done."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((mutation, future))
+        return await future
+
+    async def _read(self, query: Callable[[Services], Any]) -> Any:
+        """Run a read on the writer thread, between group commits and syncs,
+        so it never sees a batch that is unsaved or about to be rolled back."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, query, self.services)
+
+    async def _writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                first = await asyncio.wait_for(self._queue.get(), self.sync_interval_s)
+            except asyncio.TimeoutError:
+                await loop.run_in_executor(self._executor, self._sync)
+                continue
+            group = [first]
+            while len(group) < self.max_group and not self._queue.empty():
+                group.append(self._queue.get_nowait())
+            results = await loop.run_in_executor(self._executor, self._commit_group, [m for m, _ in group])
+            for (_, future), result in zip(group, results):
+                if not future.done():
+                    if isinstance(result, BaseException):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+                self._queue.task_done()
+
+    def _sync(self) -> None:
+        """Reload if another terminal saved; runs on the writer thread only."""
+        try:
+            if self.services.sync_if_changed():
+                self.stats["reloads"] += 1
+        except Exception as e:
+            self.logger.error(f"Sync failed: {e}")
+
+    def _commit_group(self, mutations: List[Callable[[Services], Any]]) -> List[Any]:
+        """Apply mutations in one batch; returns a result or exception per mutation."""
+        # Start from the latest save rather than losing the race to it
+        self._sync()
+        try:
+            results = self.services.run_batch(mutations)
+        except Exception as e:
+            self.logger.error(f"Group commit failed: {e}")
+            return [e] * len(mutations)
+        self.stats["commits"] += 1
+        self.stats["mutations"] += len(mutations)
+        return results
+
+    # ---------- HTTP ----------
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                self.stats["requests"] += 1
+                try:
+                    status, payload = await self._dispatch(method, target, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except ValueError as e:
+                    status, payload = _error_status(e), {"error": str(e)}
+                except Exception as e:
+                    self.logger.error(f"{method} {target} failed: {e}")
+                    status, payload = 500, {"error": str(e)}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HttpError as e:
+            writer.write(self._response(e.status, {"error": str(e)}, False))
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    @staticmethod
+    def _response(status: int, payload: Any, keep_alive: bool) -> bytes:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode("latin-1") + body
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        if method == "GET":
+            if parts == ["items"]:
+                low = query.get("low") in ("1", "true")
+                return 200, await self._read(
+                    lambda s: [_item_dict(i) for i in s.search_items(query.get("q", ""), query.get("category"), low)]
+                )
+            if len(parts) == 2 and parts[0] == "items":
+                return 200, await self._read(lambda s: _item_dict(s.get_item(parts[1])))
+            if parts == ["counts"]:
+                total, low = await self._read(lambda s: s.counts())
+                return 200, {"items": total, "low_stock": low}
+            if parts == ["stats"]:
+                return 200, {**self.stats, "queued": self._queue.qsize(), "report_cache": self.services.report_cache_stats(), "timings": metrics.snapshot()}
+        elif method == "POST" and len(parts) == 2 and parts[0] == "stock":
+            try:
+                data = json.loads(body or b"{}")
+            except ValueError:
+                raise HttpError(400, "Body must be JSON")
+            if parts[1] == "batch":
+                return 200, await self._batch(data)
+            return 200, _tx_dict(await self.submit(_movement(data, parts[1])))
+        raise HttpError(404, "Not found")
+
+    async def _batch(self, data: Any) -> Dict[str, Any]:
+        movements = data.get("movements") if isinstance(data, dict) else None
+        if not isinstance(movements, list):
+            raise HttpError(400, "movements must be a list")
+        mutations = [_movement(m) for m in movements]
+
+        def apply_all(services: Services) -> List[Dict[str, Any]]:
+            rows = []
+            for mutation in mutations:
+                try:
+                    rows.append({"ok": True, "transaction": _tx_dict(mutation(services))})
+                except ValueError as e:
+                    rows.append({"ok": False, "error": str(e)})
+            return rows
+
+        results = await self.submit(apply_all)
+        return {"results": results, "applied": sum(1 for r in results if r["ok"])}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from utils import get_app_root, setup_logging, InstanceLock
+
+    parser = argparse.ArgumentParser(description="Serve the inventory over a local HTTP/JSON API")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+    app_root = get_app_root()
+    logger = setup_logging(app_root)
+    lock = InstanceLock(app_root)
+    try:
+        lock.acquire()
+        storage = Storage(app_root, logger, snapshot_cache=True, verify_on_load=True)
+        storage.ensure_initial_files()
+        server = InventoryServer(Services(storage, logger), logger, args.host, args.port)
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lock.release()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,213 @@
 import os
 import re
-from typing import List, Optional, Dict, Any, Tuple
+import functools
+from contextlib import contextmanager, nullcontext
+from dataclasses import replace
+from datetime import datetime, timezone
+from itertools import chain, islice
+from operator import attrgetter
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Any, Tuple
 
-from models import AppData, Item, Transaction, TransactionType
-from utils import now_utc_iso
-from storage import Storage
+from models import AppData, Item, Transaction, TransactionType, PurchaseOrderLine, LazyTransactionList, Recipe, StockTakeSession, StockTakeLine
+from utils import now_utc_iso, to_utc_iso, iso_to_epoch, DURABILITY_MODES
+from storage import Storage, ConcurrentModificationError
+from valuation import value_inventory, ValuationReport, FIFO
+from ledger_index import LedgerIndex
+from compaction import compaction_cutoff, split_ledger
+from undo import UndoLog, UndoEntry, ItemChange, TxAppend, TxSkuRename, RowsRemoved, SettingsChange
+from events import EventBus, ChangeEvent, ChangeKind, coalesce
+from report_cache import ReportCache
+from bom import BomMatrix
+from instrumentation import instrument, metrics
 
 
+# Suggested orders bring stock back up to reorder_level * REORDER_TARGET_FACTOR
+REORDER_TARGET_FACTOR = 2
+
+UNDO_DEPTH = 50
+UNDO_MEMORY_BYTES = 8 * 1024 * 1024
+REPORT_CACHE_BYTES = 16 * 1024 * 1024
+
+# POS sales are booked as one stock-out per SKU per bucket of this many minutes
+SALES_BUCKET_MINUTES = 60
+
+# Inputs a cached report can depend on, and which of them each change touches
+ITEMS, LEDGER, SETTINGS = "items", "ledger", "settings"
+_CHANGED_INPUTS = {
+    ChangeKind.ITEM_ADDED: (ITEMS,),
+    ChangeKind.ITEM_UPDATED: (ITEMS,),
+    ChangeKind.ITEM_DELETED: (ITEMS, LEDGER),
+    ChangeKind.STOCK_MOVED: (ITEMS, LEDGER),
+    ChangeKind.SETTINGS_CHANGED: (SETTINGS,),
+    ChangeKind.BULK_IMPORT: (ITEMS, LEDGER),
+    ChangeKind.RECIPES_CHANGED: (),
+    ChangeKind.RELOADED: (ITEMS, LEDGER, SETTINGS),
+}
+
+# How often a mutation is replayed on fresh data after losing a save race
+SAVE_RETRIES = 5
+_TX_ID_RE = re.compile(r"^TX-(\d{6,})$")
+_timestamp_of = attrgetter("timestamp")
+
+
+def retry_on_conflict(method):
+    """Re-run a mutation on freshly loaded data if another instance saved first.
+
+    Mutations validate against the current state, so replaying them after a
+    reload merges our change on top of the other terminal's.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        for _ in range(SAVE_RETRIES):
+            try:
+                return method(self, *args, **kwargs)
+            except ConcurrentModificationError as e:
+                self.logger.info("%s: %s; reloading and retrying", method.__name__, e)
+                self.reload()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+@instrument("Services", skip=("batch", "can_undo", "can_redo"))
 class Services:
-    def __init__(self, storage: Storage, logger):
+    def __init__(
+        self,
+        storage: Storage,
+        logger,
+        undo_depth: int = UNDO_DEPTH,
+        undo_memory_bytes: int = UNDO_MEMORY_BYTES,
+        report_cache_bytes: int = REPORT_CACHE_BYTES,
+    ):
         self.storage = storage
         self.logger = logger
         self.app_data: AppData = self.storage.load()
+        metrics.slow_ms = self.app_data.settings.slow_op_ms
+        if isinstance(self.app_data.transactions, LazyTransactionList):
+            self.app_data.transactions.materialize_in_background()
+        # Purchase order lines by supplier, built on first use and then kept
+        # up to date per SKU. None means "rebuild from the catalog".
+        self._po_lines: Optional[Dict[str, Dict[str, PurchaseOrderLine]]] = None
+        self._po_supplier_of: Dict[str, str] = {}
+        # Time/type/reason/sku index over the ledger, built on first query
+        self._ledger_index: Optional[LedgerIndex] = None
+        # Barcode -> item, built on first scan and then kept up to date per
+        # item. None means "rebuild from the catalog".
+        self._barcode_index: Optional[Dict[str, Item]] = None
+        # Sparse recipe matrix, built on first explosion; None means "rebuild"
+        self._bom: Optional[BomMatrix] = None
+        # Physical count in progress, if any (see start_stock_take)
+        self.stock_take: Optional[StockTakeSession] = None
+        # In-memory inverse operations for undo/redo
+        self._undo = UndoLog(max_depth=undo_depth, max_bytes=undo_memory_bytes)
+        # Open batch() blocks and whether a save was deferred by them
+        self._batch_depth = 0
+        self._batch_dirty = False
+        # Highest TX number in use, found by one ledger scan and then kept
+        # current by _append_tx; None means "scan on next use"
+        self._last_tx_num: Optional[int] = None
+        # Change notifications, published once the change is saved
+        self.events = EventBus(logger)
+        self._pending_events: List[ChangeEvent] = []
+        # Per-input version counters, bumped as soon as memory changes, and
+        # report results keyed by the versions they were computed from
+        self._versions = {ITEMS: 0, LEDGER: 0, SETTINGS: 0}
+        self._reports = ReportCache(max_bytes=report_cache_bytes)
 
     def save(self, backup_before: bool = False) -> None:
+        if self._batch_depth:
+            self._batch_dirty = True
+            return
         self.storage.save(self.app_data, backup_before=backup_before)
+        self._publish_pending()
+
+    def _emit(self, kind: ChangeKind, *skus: str) -> None:
+        for name in _CHANGED_INPUTS[kind]:
+            self._versions[name] += 1
+        self._pending_events.append(ChangeEvent(kind, skus))
+
+    def _publish_pending(self) -> None:
+        events, self._pending_events = coalesce(self._pending_events), []
+        self.events.publish(events)
+
+    @contextmanager
+    def batch(self):
+        """Group several mutations into a single save at the end of the block.
+
+        Mutations inside the block change memory only, and their change events
+        are coalesced and published after that save. If the final save hits a
+        concurrent modification, ConcurrentModificationError propagates: the
+        caller should reload() and re-run the whole block. On any other error
+        the block's changes stay in memory unsaved.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+        if self._batch_depth == 0 and self._batch_dirty:
+            self._batch_dirty = False
+            self.storage.save(self.app_data)
+            self._publish_pending()
+
+    def run_batch(self, mutations: List[Callable[["Services"], Any]], undo_label: Optional[str] = None) -> List[Any]:
+        """Apply `mutations` (callables taking this Services) with one save.
+
+        Returns each mutation's result, or the exception it raised; rejected
+        mutations don't stop the others. If another instance saved first the
+        whole batch is replayed on reloaded data. If the save itself fails
+        unsaved changes are dropped and the error propagates. With
+        `undo_label` the applied mutations are undone as one step.
+        """
+        for attempt in range(SAVE_RETRIES + 1):
+            results: List[Any] = []
+            try:
+                with self.batch(), self._undo.grouped(undo_label) if undo_label else nullcontext():
+                    for mutation in mutations:
+                        try:
+                            results.append(mutation(self))
+                        except ValueError as e:
+                            results.append(e)
+                        except ConcurrentModificationError:
+                            raise
+                        except Exception as e:
+                            # A bug or bad input in one mutation must not
+                            # fail everyone else's in the same group
+                            self.logger.exception("Batch mutation failed: %s", e)
+                            results.append(e)
+                return results
+            except ConcurrentModificationError as e:
+                self.reload()
+                if attempt == SAVE_RETRIES:
+                    raise
+                self.logger.info("Batch of %d: %s; reloading and retrying", len(mutations), e)
+            except Exception:
+                self.reload()
+                raise
+        return []
+
+    def reload(self) -> None:
+        self.app_data = self.storage.load()
+        metrics.slow_ms = self.app_data.settings.slow_op_ms
+        self._batch_dirty = False
+        self._last_tx_num = None
+        self._po_lines = None
+        self._ledger_index = None
+        self._barcode_index = None
+        self._bom = None
+        # Inverse operations refer to the objects we just dropped
+        self._undo.clear()
+        # Unsaved changes are gone; whatever was saved may differ from memory
+        self._pending_events = []
+        for name in self._versions:
+            self._versions[name] += 1
+        self.events.publish([ChangeEvent(ChangeKind.RELOADED)])
+
+    def sync_if_changed(self) -> bool:
+        """Reload if another instance saved since our last load/save (a stat call otherwise)."""
+        if not self.storage.has_external_changes():
+            return False
+        self.reload()
+        return True
 
     # ---------- ID generation ----------
     def generate_next_sku(self) -> str:
@@ -27,15 +220,15 @@ class Services:
         return f"SKU-{max_num + 1:04d}"
 
     def generate_next_tx_id(self) -> str:
-        pattern = re.compile(r"^TX-(\d{6,})$")
-        max_num = 0
-        for tx in self.app_data.transactions:
-            m = pattern.match(tx.id)
-            if m:
-                max_num = max(max_num, int(m.group(1)))
-        return f"TX-{max_num + 1:06d}"
+        if self._last_tx_num is None:
+            # Compacted rows are gone from the hot ledger; their summaries keep
+            # the highest id so numbers are never reused.
+            ids = chain((tx.id for tx in self.app_data.transactions), (s.last_tx_id for s in self.app_data.summaries))
+            self._last_tx_num = max((int(m.group(1)) for m in map(_TX_ID_RE.match, ids) if m), default=0)
+        return f"TX-{self._last_tx_num + 1:06d}"
 
     # ---------- CRUD Items ----------
+    @retry_on_conflict
     def add_item(self, data: Dict[str, Any]) -> Item:
         name = (data.get("name") or "").strip()
         if not name:
@@ -46,6 +239,8 @@ class Services:
         item_id = (data.get("id") or "").strip() or self.generate_next_sku()
         if any(i.id == item_id for i in self.app_data.items):
             raise ValueError("Item ID already exists")
+        barcode = (data.get("barcode") or "").strip() or None
+        self._check_barcode_free(barcode, item_id)
         item = Item(
             id=item_id,
             name=name,
@@ -56,17 +251,25 @@ class Services:
             stock_qty=self._to_int_or_default(data.get("stock_qty"), 0),
             reorder_level=self._to_int_or_default(data.get("reorder_level"), 0),
             supplier=((data.get("supplier") or "").strip() or None),
-            barcode=((data.get("barcode") or "").strip() or None),
+            barcode=barcode,
             notes=((data.get("notes") or "").strip() or None),
             last_updated=now_utc_iso(),
         )
         item.validate()
         self.app_data.items.append(item)
+        self._undo.record(UndoEntry("add_item", [ItemChange(len(self.app_data.items) - 1, None, item)]))
+        self._refresh_po_line(item)
+        self._index_barcode(item)
+        self._emit(ChangeKind.ITEM_ADDED, item.id)
         self.save()
         return item
 
+    @retry_on_conflict
     def update_item(self, item_id: str, updates: Dict[str, Any]) -> Item:
-        item = self._get_item_or_raise(item_id)
+        idx, live = self._get_indexed_item_or_raise(item_id)
+        before = replace(live)
+        # Edit a copy so a rejected update leaves the live item untouched
+        item = replace(live)
         # Validate name uniqueness if changed
         new_name = updates.get("name")
         if new_name is not None:
@@ -91,33 +294,69 @@ class Services:
         if "supplier" in updates:
             item.supplier = (updates.get("supplier") or "").strip() or None
         if "barcode" in updates:
-            item.barcode = (updates.get("barcode") or "").strip() or None
+            barcode = (updates.get("barcode") or "").strip() or None
+            if barcode != item.barcode:
+                self._check_barcode_free(barcode, item.id)
+            item.barcode = barcode
         if "notes" in updates:
             item.notes = (updates.get("notes") or "").strip() or None
         item.last_updated = now_utc_iso()
         item.validate()
+        live.__dict__.update(item.__dict__)
+        item = live
+        self._undo.record(UndoEntry("update_item", [ItemChange(idx, before, item)]))
+        self._refresh_po_line(item)
+        self._index_barcode(item, old_barcode=before.barcode)
+        self._emit(ChangeKind.ITEM_UPDATED, item.id)
         self.save()
         return item
 
+    def item_has_history(self, item_id: str) -> bool:
+        """True if the ledger or a compacted summary refers to `item_id`;
+        deleting the item then needs confirm_delete_transactions."""
+        return any(tx.sku == item_id for tx in self.app_data.transactions) or any(sm.sku == item_id for sm in self.app_data.summaries)
+
+    @retry_on_conflict
     def delete_item(self, item_id: str, confirm_delete_transactions: bool) -> None:
         idx = self._find_item_index(item_id)
         if idx < 0:
             raise ValueError("Item not found")
-        has_tx = any(tx.sku == item_id for tx in self.app_data.transactions)
+        has_tx = self.item_has_history(item_id)
         if has_tx and not confirm_delete_transactions:
             raise ValueError("Item has transactions. Confirmation required to delete.")
+        used_by = [r.product for r in self.app_data.recipes if item_id in r.components]
+        if used_by:
+            raise ValueError(f"Item is an ingredient of: {', '.join(used_by)}")
         # Remove
+        entry = UndoEntry("delete_item", [ItemChange(idx, self.app_data.items[idx], None)])
         del self.app_data.items[idx]
         if has_tx:
+            removed = [(pos, tx) for pos, tx in enumerate(self.app_data.transactions) if tx.sku == item_id]
             self.app_data.transactions = [tx for tx in self.app_data.transactions if tx.sku != item_id]
+            self._ledger_index = None
+            entry.ops.append(RowsRemoved("transactions", removed))
+            removed = [(pos, sm) for pos, sm in enumerate(self.app_data.summaries) if sm.sku == item_id]
+            if removed:
+                self.app_data.summaries = [sm for sm in self.app_data.summaries if sm.sku != item_id]
+                entry.ops.append(RowsRemoved("summaries", removed))
+        self._undo.record(entry)
+        self._drop_po_line(item_id)
+        self._drop_barcode(entry.ops[0].before.barcode, item_id)
+        self._emit(ChangeKind.ITEM_DELETED, item_id)
         self.save()
 
     # ---------- Stock operations ----------
-    def stock_in(self, item_id: str, qty: int, reason: str = "Purchase", note: Optional[str] = None) -> Transaction:
+    @retry_on_conflict
+    def stock_in(self, item_id: str, qty: int, reason: str = "Purchase", note: Optional[str] = None, unit_cost: Optional[float] = None) -> Transaction:
         if qty <= 0:
             raise ValueError("Quantity must be > 0")
-        item = self._get_item_or_raise(item_id)
+        unit_cost = self._to_float_or_none(unit_cost)
+        idx, item = self._get_indexed_item_or_raise(item_id)
+        before = replace(item)
         item.stock_qty += qty
+        if unit_cost is not None:
+            # The item keeps the latest purchase price; history lives on the tx
+            item.unit_cost = unit_cost
         item.last_updated = now_utc_iso()
         tx = Transaction(
             id=self.generate_next_tx_id(),
@@ -127,17 +366,23 @@ class Services:
             timestamp=now_utc_iso(),
             reason=reason,
             note=note,
+            unit_cost=unit_cost,
         )
         tx.validate()
-        self.app_data.transactions.append(tx)
         item.validate()
+        self._append_tx(tx)
+        self._undo.record(UndoEntry("stock_in", [ItemChange(idx, before, item), TxAppend(len(self.app_data.transactions) - 1, tx)]))
+        self._refresh_po_line(item)
+        self._emit(ChangeKind.STOCK_MOVED, item.id)
         self.save()
         return tx
 
+    @retry_on_conflict
     def stock_out(self, item_id: str, qty: int, reason: str = "Sale", note: Optional[str] = None) -> Transaction:
         if qty <= 0:
             raise ValueError("Quantity must be > 0")
-        item = self._get_item_or_raise(item_id)
+        idx, item = self._get_indexed_item_or_raise(item_id)
+        before = replace(item)
         if item.stock_qty - qty < 0:
             raise ValueError("Cannot reduce stock below 0")
         item.stock_qty -= qty
@@ -152,16 +397,21 @@ class Services:
             note=note,
         )
         tx.validate()
-        self.app_data.transactions.append(tx)
         item.validate()
+        self._append_tx(tx)
+        self._undo.record(UndoEntry("stock_out", [ItemChange(idx, before, item), TxAppend(len(self.app_data.transactions) - 1, tx)]))
+        self._refresh_po_line(item)
+        self._emit(ChangeKind.STOCK_MOVED, item.id)
         self.save()
         return tx
 
+    @retry_on_conflict
     def stock_adjust(self, item_id: str, qty: int, mode: str = "set", reason: str = "Count correction", note: Optional[str] = None) -> Transaction:
         """Adjust stock. mode="set" sets to value qty; mode="delta" adds qty (can be +/-).
         For transactions, we record the absolute magnitude in qty due to schema (>0).
         """
-        item = self._get_item_or_raise(item_id)
+        idx, item = self._get_indexed_item_or_raise(item_id)
+        before = replace(item)
         if mode == "set":
             if qty < 0:
                 raise ValueError("New quantity must be >= 0")
@@ -189,15 +439,366 @@ class Services:
             timestamp=now_utc_iso(),
             reason=reason,
             note=(note or (f"Set to {new_qty}" if mode == "set" else f"Delta {delta:+d}")),
+            delta=delta,
         )
         tx.validate()
-        self.app_data.transactions.append(tx)
         item.validate()
+        self._append_tx(tx)
+        self._undo.record(UndoEntry("stock_adjust", [ItemChange(idx, before, item), TxAppend(len(self.app_data.transactions) - 1, tx)]))
+        self._refresh_po_line(item)
+        self._emit(ChangeKind.STOCK_MOVED, item.id)
         self.save()
         return tx
 
+    def stock_move_many(self, direction: str, quantities: Dict[str, int], reason: Optional[str] = None, note: Optional[str] = None) -> Dict[str, Any]:
+        """Stock several SKUs in or out (e.g. a scanned basket) with one save.
+
+        Returns each SKU's Transaction, or the exception that rejected it;
+        rejected SKUs don't stop the others.
+        """
+        if direction not in ("in", "out"):
+            raise ValueError("Direction must be 'in' or 'out'")
+        method = "stock_in" if direction == "in" else "stock_out"
+        extra: Dict[str, Any] = {"note": note}
+        if reason:
+            extra["reason"] = reason
+
+        def move(sku: str, qty: int) -> Callable[["Services"], Transaction]:
+            return lambda s: getattr(s, method)(sku, qty, **extra)
+        skus = list(quantities)
+        results = self.run_batch([move(sku, quantities[sku]) for sku in skus])
+        return dict(zip(skus, results))
+
+    # ---------- Recipes ----------
+    def get_recipe(self, product: str) -> Optional[Recipe]:
+        return next((r for r in self.app_data.recipes if r.product == product), None)
+
+    @retry_on_conflict
+    def set_recipe(self, product: str, name: str, components: Dict[str, Any]) -> Recipe:
+        """Add or replace the recipe of menu product `product`."""
+        recipe = self._put_recipe(product, name, components)
+        self.save()
+        return recipe
+
+    @retry_on_conflict
+    def delete_recipe(self, product: str) -> None:
+        recipe = self.get_recipe(product)
+        if recipe is None:
+            raise ValueError("Recipe not found")
+        self.app_data.recipes.remove(recipe)
+        self._bom = None
+        self._emit(ChangeKind.RECIPES_CHANGED)
+        self.save()
+
+    @retry_on_conflict
+    def import_recipes_csv(self, file_path: str) -> Dict[str, Any]:
+        recipes, skipped = self.storage.read_recipes_csv(file_path, self.app_data.settings.csv_delimiter)
+        imported = 0
+        with self.batch():
+            for recipe in recipes.values():
+                try:
+                    self._put_recipe(recipe.product, recipe.name, recipe.components)
+                    imported += 1
+                except ValueError as e:
+                    skipped.append({"product": recipe.product, "error": str(e)})
+        return {"imported": imported, "skipped": len(skipped), "skipped_rows": skipped}
+
+    def _put_recipe(self, product: str, name: str, components: Dict[str, Any]) -> Recipe:
+        product = (product or "").strip()
+        recipe = Recipe(
+            product=product,
+            name=(name or "").strip() or product,
+            components={sku.strip(): self._to_int_or_default(qty, 0) for sku, qty in components.items()},
+        )
+        recipe.validate()
+        known = {i.id for i in self.app_data.items}
+        missing = [sku for sku in recipe.components if sku not in known]
+        if missing:
+            raise ValueError(f"Unknown ingredient SKU: {', '.join(missing)}")
+        existing = self.get_recipe(product)
+        if existing is None:
+            self.app_data.recipes.append(recipe)
+        else:
+            self.app_data.recipes[self.app_data.recipes.index(existing)] = recipe
+        self._bom = None
+        self._emit(ChangeKind.RECIPES_CHANGED)
+        return recipe
+
+    def explode_sales(self, sold: Iterable[Tuple[str, int]]) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """Ingredient usage for (product code, qty) pairs, and the quantities of unknown codes."""
+        if self._bom is None:
+            self._bom = BomMatrix(self.app_data.recipes)
+        return self._bom.explode(sold)
+
+    def sell_products(self, sold: Iterable[Tuple[str, int]], reason: str = "Satış", note: Optional[str] = None) -> Dict[str, Any]:
+        """Record menu sales as aggregated ingredient stock-outs with one save
+        and one undo step.
+
+        A product is sold only if every one of its ingredients is in stock
+        (after the products before it); otherwise none of them is taken out.
+        Returns each ingredient's Transaction, the rejected products with the
+        reason, and the sold quantities of product codes that have no recipe.
+        """
+        per_product: Dict[str, int] = {}
+        for product, qty in sold:
+            per_product[product] = per_product.get(product, 0) + qty
+
+        def sell(s: "Services") -> Dict[str, Any]:
+            # Checked inside the batch, so a replay after a conflict checks
+            # the reloaded stock
+            on_hand = {i.id: i.stock_qty for i in s.app_data.items}
+            usage: Dict[str, int] = {}
+            rejected: Dict[str, str] = {}
+            unknown: Dict[str, int] = {}
+            for product, qty in per_product.items():
+                needs, missing = s.explode_sales([(product, qty)])
+                if missing:
+                    unknown.update(missing)
+                    continue
+                if qty <= 0:
+                    rejected[product] = "Quantity must be > 0"
+                    continue
+                short = [sku for sku, n in needs.items() if on_hand.get(sku, 0) - usage.get(sku, 0) < n]
+                if short:
+                    rejected[product] = f"Not enough stock: {', '.join(short)}"
+                    continue
+                for sku, n in needs.items():
+                    usage[sku] = usage.get(sku, 0) + n
+            ingredients = {sku: s.stock_out(sku, n, reason=reason, note=note) for sku, n in usage.items()}
+            return {"ingredients": ingredients, "rejected": rejected, "unknown": unknown}
+
+        result = self.run_batch([sell], undo_label="sell_products")[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    # ---------- POS sales ----------
+    @retry_on_conflict
+    def ingest_sales_csv(
+        self,
+        file_path: str,
+        bucket_minutes: int = SALES_BUCKET_MINUTES,
+        reason: str = "Satış",
+        strict: bool = False,
+    ) -> Dict[str, Any]:
+        """Book a POS sales export as one stock-out per SKU per time bucket, with one save.
+
+        The file is streamed and summed per (bucket, code) before anything
+        is looked up. Codes resolve to a recipe (exploded into ingredients),
+        an item SKU or a barcode, in that order. Unknown codes are reported
+        and skipped, or with `strict` reject the whole file. Movements that
+        would take stock below zero are rejected one by one. The whole
+        ingest is undone as one step.
+        """
+        if bucket_minutes <= 0:
+            raise ValueError("Bucket must be at least one minute")
+        bucket_s = bucket_minutes * 60
+        now = now_utc_iso()
+        sold: Dict[Tuple[str, str], int] = {}
+        bucket_iso: Dict[int, str] = {}
+        # POS files carry many lines per minute; the bucket only depends on
+        # the timestamp without its ":SS" seconds
+        bucket_of_minute: Dict[str, str] = {}
+        skipped: List[Dict[str, Any]] = []
+        lines = 0
+        for rownum, code, qty, timestamp in self.storage.iter_sales_csv(file_path, self.app_data.settings.csv_delimiter):
+            try:
+                if not code:
+                    raise ValueError("Missing code")
+                qty = int(qty)
+                timestamp = (timestamp or "").strip()
+                if not timestamp:
+                    bucket = now
+                else:
+                    minute = timestamp[:16] + timestamp[19:] if timestamp[16:17] == ":" else timestamp
+                    bucket = bucket_of_minute.get(minute)
+                    if bucket is None:
+                        epoch = int(iso_to_epoch(timestamp))
+                        start = epoch - epoch % bucket_s
+                        bucket = bucket_iso.get(start)
+                        if bucket is None:
+                            bucket = bucket_iso[start] = datetime.fromtimestamp(start, timezone.utc).isoformat()
+                        bucket_of_minute[minute] = bucket
+            except (ValueError, TypeError) as e:
+                skipped.append({"row": rownum, "error": str(e)})
+                continue
+            lines += 1
+            key = (bucket, code)
+            sold[key] = sold.get(key, 0) + qty
+
+        # Resolve each distinct code once
+        if self._bom is None:
+            self._bom = BomMatrix(self.app_data.recipes)
+        sku_of = {i.barcode: i.id for i in self.app_data.items if i.barcode}
+        sku_of.update((i.id, i.id) for i in self.app_data.items)
+        usage: Dict[Tuple[str, str], int] = {}
+        menu_sales: Dict[str, List[Tuple[str, int]]] = {}
+        unknown: Dict[str, int] = {}
+        for (bucket, code), qty in sold.items():
+            if code in self._bom.products:
+                menu_sales.setdefault(bucket, []).append((code, qty))
+            elif code in sku_of:
+                key = (bucket, sku_of[code])
+                usage[key] = usage.get(key, 0) + qty
+            else:
+                unknown[code] = unknown.get(code, 0) + qty
+        if unknown and strict:
+            raise ValueError(f"Unknown product codes: {', '.join(sorted(unknown)[:10])}")
+        for bucket, products in menu_sales.items():
+            for sku, qty in self._bom.explode(products)[0].items():
+                usage[(bucket, sku)] = usage.get((bucket, sku), 0) + qty
+
+        positions = {item.id: (idx, item) for idx, item in enumerate(self.app_data.items)}
+        befores: Dict[str, Item] = {}
+        rejected: List[Dict[str, Any]] = []
+        entry = UndoEntry("ingest_sales")
+        note = f"POS: {os.path.basename(file_path)}"
+        for (bucket, sku), qty in sorted(usage.items()):
+            found = positions.get(sku)
+            if found is None:
+                error = "Item not found"
+            elif qty <= 0:
+                error = "Quantity must be > 0"
+            elif found[1].stock_qty < qty:
+                error = "Cannot reduce stock below 0"
+            else:
+                error = None
+            if error is not None:
+                rejected.append({"sku": sku, "timestamp": bucket, "qty": qty, "error": error})
+                continue
+            item = found[1]
+            befores.setdefault(sku, replace(item))
+            item.stock_qty -= qty
+            tx = Transaction(
+                id=self.generate_next_tx_id(),
+                type=TransactionType.OUT,
+                sku=sku,
+                qty=qty,
+                timestamp=bucket,
+                reason=reason,
+                note=note,
+            )
+            tx.validate()
+            self._append_tx(tx)
+            entry.ops.append(TxAppend(len(self.app_data.transactions) - 1, tx))
+        for sku, before in befores.items():
+            idx, item = positions[sku]
+            item.last_updated = now
+            item.validate()
+            entry.ops.append(ItemChange(idx, before, item))
+            self._refresh_po_line(item)
+        summary = {
+            "lines": lines,
+            "movements": len(entry.ops) - len(befores),
+            "skus": len(befores),
+            "unknown": unknown,
+            "rejected": rejected,
+            "skipped": len(skipped),
+            "skipped_rows": skipped,
+        }
+        if not befores:
+            return summary
+        self._undo.record(entry)
+        self._emit(ChangeKind.STOCK_MOVED, *befores)
+        self.save()
+        self.logger.info("Sales %s: %d lines as %d movements", file_path, lines, summary["movements"])
+        return summary
+
+    # ---------- Stock take ----------
+    def start_stock_take(self, note: Optional[str] = None) -> StockTakeSession:
+        """Open the count in progress, resuming it from stocktake.json, or start one."""
+        if self.stock_take is None:
+            self.stock_take = self.storage.load_stocktake() or StockTakeSession(started=now_utc_iso(), note=note)
+            self.storage.save_stocktake(self.stock_take)
+        return self.stock_take
+
+    def stage_count(self, item_id: str, counted: int) -> StockTakeLine:
+        """Record a counted quantity. Only the session file is written."""
+        session = self._stock_take_or_raise()
+        counted = int(counted)
+        if counted < 0:
+            raise ValueError("Counted quantity must be >= 0")
+        item = self._get_item_or_raise(item_id)
+        session.counts[item.id] = counted
+        self.storage.save_stocktake(session)
+        return StockTakeLine(item.id, item.name, item.stock_qty, counted, item.unit_cost)
+
+    def unstage_count(self, item_id: str) -> None:
+        session = self._stock_take_or_raise()
+        if session.counts.pop(item_id, None) is not None:
+            self.storage.save_stocktake(session)
+
+    def stock_take_preview(self) -> List[StockTakeLine]:
+        """Counted SKUs against their current stock_qty, in catalog order.
+
+        Variances are taken at preview/commit time, so sales recorded while
+        the count runs show up as differences of their own.
+        """
+        counts = self._stock_take_or_raise().counts
+        return [
+            StockTakeLine(i.id, i.name, i.stock_qty, counts[i.id], i.unit_cost)
+            for i in self.app_data.items
+            if i.id in counts
+        ]
+
+    def commit_stock_take(self, reason: str = "Sayım") -> Dict[str, Any]:
+        """Apply every variance as an ADJUST transaction with one save and
+        one undo step.
+
+        Closes the session, unless some counts were rejected: those stay
+        staged so they can be corrected and committed again.
+        """
+        session = self._stock_take_or_raise()
+        lines = self.stock_take_preview()
+        changed = [line for line in lines if line.delta]
+
+        def adjust(line: StockTakeLine) -> Callable[["Services"], Transaction]:
+            return lambda s: s.stock_adjust(line.sku, line.counted, mode="set", reason=reason, note=session.note)
+        results = self.run_batch([adjust(line) for line in changed], undo_label="commit_stock_take")
+        rejected = {line.sku: str(r) for line, r in zip(changed, results) if isinstance(r, Exception)}
+        counted = len(session.counts)
+        if rejected:
+            session.counts = {sku: session.counts[sku] for sku in rejected}
+            self.storage.save_stocktake(session)
+        else:
+            self.discard_stock_take()
+        return {
+            "counted": counted,
+            "missing": counted - len(lines),
+            "adjusted": len(changed) - len(rejected),
+            "unchanged": len(lines) - len(changed),
+            "rejected": rejected,
+        }
+
+    def discard_stock_take(self) -> None:
+        self.storage.clear_stocktake()
+        self.stock_take = None
+
+    def _stock_take_or_raise(self) -> StockTakeSession:
+        if self.stock_take is None:
+            raise ValueError("No stock take in progress")
+        return self.stock_take
+
     # ---------- Search / Filter ----------
+    def get_item(self, item_id: str) -> Item:
+        return self._get_item_or_raise(item_id)
+
+    def find_by_barcode(self, code: str) -> Optional[Item]:
+        """The item carrying barcode `code` (surrounding whitespace ignored), or None."""
+        if self._barcode_index is None:
+            index: Dict[str, Item] = {}
+            for item in self.app_data.items:
+                if item.barcode:
+                    index.setdefault(item.barcode, item)
+            self._barcode_index = index
+        return self._barcode_index.get((code or "").strip())
+
     def search_items(self, query: str = "", category: Optional[str] = None, low_only: bool = False) -> List[Item]:
+        matches = self.item_filter(query, category, low_only)
+        return [i for i in self.app_data.items if matches(i)]
+
+    def item_filter(self, query: str = "", category: Optional[str] = None, low_only: bool = False) -> Callable[[Item], bool]:
+        """The predicate search_items applies, for re-checking single rows."""
         q = (query or "").strip().lower()
         low_inclusive = self.app_data.settings.low_stock_inclusive
         def matches(i: Item) -> bool:
@@ -211,7 +812,31 @@ class Services:
             if ok and low_only:
                 ok = (i.stock_qty <= i.reorder_level) if low_inclusive else (i.stock_qty < i.reorder_level)
             return ok
-        return [i for i in self.app_data.items if matches(i)]
+        return matches
+
+    def category_totals(self) -> Dict[str, Dict[str, float]]:
+        """Item count, units on hand and stock value (at unit_cost) per category."""
+        def compute() -> Dict[str, Dict[str, float]]:
+            totals: Dict[str, Dict[str, float]] = {}
+            for i in self.app_data.items:
+                row = totals.setdefault(i.category, {"items": 0, "qty": 0, "value": 0.0})
+                row["items"] += 1
+                row["qty"] += i.stock_qty
+                row["value"] += i.stock_qty * (i.unit_cost or 0.0)
+            for row in totals.values():
+                row["value"] = round(row["value"], 2)
+            return totals
+        return self._cached("category_totals", (ITEMS,), (), compute)
+
+    def low_stock_by_supplier(self) -> Dict[str, List[str]]:
+        """SKUs at or below their reorder level, grouped by supplier ("" for none)."""
+        def compute() -> Dict[str, List[str]]:
+            grouped: Dict[str, List[str]] = {}
+            for i in self.app_data.items:
+                if self._is_low(i):
+                    grouped.setdefault(i.supplier or "", []).append(i.id)
+            return grouped
+        return self._cached("low_stock_by_supplier", (ITEMS, SETTINGS), (), compute)
 
     def counts(self) -> Tuple[int, int]:
         total = len(self.app_data.items)
@@ -222,12 +847,228 @@ class Services:
             low = sum(1 for i in self.app_data.items if i.stock_qty < i.reorder_level)
         return total, low
 
+    # ---------- Purchase orders ----------
+    def purchase_order_drafts(self) -> Dict[str, List[PurchaseOrderLine]]:
+        """Return draft order lines grouped by supplier ("" for items without one).
+
+        Lines are maintained incrementally by the stock/item operations, so this
+        only walks the current low-stock set, never the whole catalog.
+        """
+        if self._po_lines is None:
+            self._rebuild_po_lines()
+        drafts: Dict[str, List[PurchaseOrderLine]] = {}
+        for supplier in sorted(self._po_lines):
+            lines = self._po_lines[supplier]
+            if lines:
+                drafts[supplier] = sorted(lines.values(), key=lambda l: l.sku)
+        return drafts
+
+    def export_purchase_orders_csv(self, file_path: str, supplier: Optional[str] = None) -> int:
+        drafts = self.purchase_order_drafts()
+        if supplier is not None:
+            drafts = {supplier: drafts.get(supplier, [])}
+        self.storage.export_purchase_orders_csv(drafts, file_path, self.app_data.settings.csv_delimiter)
+        return sum(len(lines) for lines in drafts.values())
+
+    def _suggest_order_line(self, item: Item) -> Optional[PurchaseOrderLine]:
+        if item.reorder_level <= 0 or not self._is_low(item):
+            return None
+        target = item.reorder_level * REORDER_TARGET_FACTOR
+        return PurchaseOrderLine(
+            sku=item.id,
+            name=item.name,
+            supplier=item.supplier,
+            unit=item.unit,
+            stock_qty=item.stock_qty,
+            reorder_level=item.reorder_level,
+            suggested_qty=max(target - item.stock_qty, 1),
+            unit_cost=item.unit_cost,
+        )
+
+    def _rebuild_po_lines(self) -> None:
+        self._po_lines = {}
+        self._po_supplier_of = {}
+        for it in self.app_data.items:
+            self._refresh_po_line(it)
+
+    def _refresh_po_line(self, item: Item) -> None:
+        if self._po_lines is None:
+            return
+        self._drop_po_line(item.id)
+        line = self._suggest_order_line(item)
+        if line is None:
+            return
+        supplier = item.supplier or ""
+        self._po_lines.setdefault(supplier, {})[item.id] = line
+        self._po_supplier_of[item.id] = supplier
+
+    def _drop_po_line(self, sku: str) -> None:
+        if self._po_lines is None:
+            return
+        supplier = self._po_supplier_of.pop(sku, None)
+        if supplier is not None:
+            self._po_lines.get(supplier, {}).pop(sku, None)
+
+    # ---------- Ledger queries ----------
+    def query_transactions(
+        self,
+        start=None,
+        end=None,
+        type: Optional[str] = None,
+        sku: Optional[str] = None,
+        reason: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[Transaction]:
+        """Lazily yield transactions with start <= timestamp < end, oldest first.
+
+        `start`/`end` accept datetimes, dates, ISO strings or None (unbounded).
+        """
+        if self._ledger_index is None:
+            self._ledger_index = LedgerIndex(self.app_data.transactions)
+        rows = self._ledger_index.query(
+            start=iso_to_epoch(to_utc_iso(start)) if start is not None else None,
+            end=iso_to_epoch(to_utc_iso(end)) if end is not None else None,
+            type=type,
+            sku=sku,
+            reason=reason,
+        )
+        return islice(rows, offset, None if limit is None else offset + limit)
+
+    def todays_transactions(self, **filters) -> Iterator[Transaction]:
+        midnight = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.query_transactions(start=midnight, **filters)
+
+    # ---------- Reporting segment ----------
+    def ledger_segment(self):
+        """Memory-mapped view of the ledger for reports, rebuilt when stale.
+
+        The caller owns the returned LedgerSegment and should close it.
+        """
+        segment = self.storage.open_ledger_segment()
+        if segment is not None and segment.is_current(self.app_data.transactions, self.app_data.revision):
+            return segment
+        if segment is not None:
+            segment.close()
+        self.storage.write_ledger_segment(self.app_data)
+        return self.storage.open_ledger_segment()
+
+    def movement_totals(self, start=None, end=None, type: Optional[str] = None) -> Dict[str, int]:
+        """Net signed quantity per SKU in [start, end), optionally for one type."""
+        start = iso_to_epoch(to_utc_iso(start)) if start is not None else None
+        end = iso_to_epoch(to_utc_iso(end)) if end is not None else None
+        type = getattr(type, "value", type)
+
+        def compute() -> Dict[str, int]:
+            with self.ledger_segment() as segment:
+                return segment.totals_by_sku(start=start, end=end, type=type)
+        return self._cached("movement_totals", (LEDGER,), (start, end, type), compute)
+
+    def consumption_by_sku(self, start=None, end=None) -> Dict[str, int]:
+        def compute() -> Dict[str, int]:
+            return {sku: -qty for sku, qty in self.movement_totals(start, end, type=TransactionType.OUT).items()}
+        key = tuple(to_utc_iso(v) if v is not None else None for v in (start, end))
+        return self._cached("consumption_by_sku", (LEDGER,), key, compute)
+
+    # ---------- Compaction ----------
+    @retry_on_conflict
+    def compact_ledger(self, retention_days: int = 90) -> Dict[str, Any]:
+        """Move whole months older than the retention window into archive
+        segments and keep one summary row per SKU per month in the hot file."""
+        if retention_days < 0:
+            raise ValueError("retention_days must be >= 0")
+        cutoff = compaction_cutoff(retention_days)
+        opening = self._stock_outside_ledger()
+        for sm in self.app_data.summaries:
+            opening[sm.sku] = opening.get(sm.sku, 0) + sm.qty_in - sm.qty_out + sm.net_adjust
+        kept, archived, summaries = split_ledger(self.app_data.transactions, cutoff, opening)
+        if not archived:
+            return {"archived": 0, "periods": [], "summaries": 0}
+        # Archives go to disk first so a crash can never lose the originals
+        for period, rows in archived.items():
+            self.storage.write_archive_segment(period, rows)
+        self.app_data.transactions = kept
+        # Inverse operations refer to ledger rows that are now archived
+        self._undo.clear()
+        self.app_data.summaries = sorted(self.app_data.summaries + summaries, key=lambda sm: (sm.period, sm.sku))
+        self._ledger_index = None
+        self._emit(ChangeKind.RELOADED)
+        self.save()
+        archived_count = sum(len(rows) for rows in archived.values())
+        self.logger.info("Compacted %d transactions into %d summaries", archived_count, len(summaries))
+        return {"archived": archived_count, "periods": sorted(archived), "summaries": len(summaries)}
+
+    def archived_transactions(self, period: str) -> List[Transaction]:
+        return self.storage.load_archive_segment(period)
+
+    # ---------- Valuation ----------
+    def inventory_valuation(self, method: str = FIFO, start=None, end=None) -> ValuationReport:
+        """FIFO ("fifo") or weighted-average ("wac") valuation and COGS for a period.
+
+        `start`/`end` accept datetimes, dates or ISO strings; None means unbounded.
+        """
+        start = to_utc_iso(start) if start is not None else None
+        end = to_utc_iso(end) if end is not None else None
+
+        def compute() -> ValuationReport:
+            fallback = {i.id: i.unit_cost for i in self.app_data.items if i.unit_cost is not None}
+            return value_inventory(
+                self._ledger_in_time_order(),
+                method=method,
+                start=start,
+                end=end,
+                fallback_costs=fallback,
+                opening_qty=self._stock_outside_ledger(),
+            )
+        return self._cached("inventory_valuation", (ITEMS, LEDGER), (method, start, end), compute)
+
+    def _stock_outside_ledger(self) -> Dict[str, int]:
+        """Stock per SKU that no ledger row explains, e.g. the opening
+        quantity given to add_item: current stock minus the ledger's net."""
+        net: Dict[str, int] = {}
+        for sm in self.app_data.summaries:
+            net[sm.sku] = net.get(sm.sku, 0) + sm.qty_in - sm.qty_out + sm.net_adjust
+        for tx in self.app_data.transactions:
+            on_hand = net.get(tx.sku, 0)
+            net[tx.sku] = on_hand + tx.signed_qty(on_hand)
+        return {i.id: i.stock_qty - net.get(i.id, 0) for i in self.app_data.items if i.stock_qty != net.get(i.id, 0)}
+
+    def _ledger_in_time_order(self) -> Iterable[Transaction]:
+        """Compacted summaries and then the ledger, in timestamp order.
+
+        Rows are appended as they happen, so this is normally the ledger
+        itself; back-dated rows (POS sales booked at their bucket start)
+        make it a sorted copy instead.
+        """
+        compacted = sorted((t for sm in self.app_data.summaries for t in sm.as_transactions()), key=_timestamp_of)
+        rows = chain(compacted, self.app_data.transactions)
+        stamps = map(_timestamp_of, rows)
+        previous = next(stamps, "")
+        for stamp in stamps:
+            if stamp < previous:
+                return sorted(chain(compacted, self.app_data.transactions), key=_timestamp_of)
+            previous = stamp
+        return chain(compacted, self.app_data.transactions)
+
+    # ---------- Report cache ----------
+    def _cached(self, name: str, inputs: Tuple[str, ...], params: Tuple[Any, ...], compute: Callable[[], Any]) -> Any:
+        """Result of `compute`, reused until one of `inputs` changes. Treat it as read-only."""
+        versions = tuple(self._versions[i] for i in inputs)
+        return self._reports.get_or_compute((name, params), versions, compute)
+
+    def report_cache_stats(self) -> Dict[str, int]:
+        return self._reports.stats_dict()
+
     # ---------- Import/Export ----------
     def export_csv(self, file_path: str) -> None:
         self.storage.export_csv(self.app_data, file_path)
 
+    @retry_on_conflict
     def import_csv(self, file_path: str) -> Dict[str, Any]:
+        before = [replace(i) for i in self.app_data.items]
         self.app_data, summary = self.storage.import_csv(self.app_data, file_path)
+        # The whole import is undone as one step
+        entry = UndoEntry("import_csv")
         # Normalize IDs for any temporary ones
         used = {i.id for i in self.app_data.items}
         for it in self.app_data.items:
@@ -237,9 +1078,24 @@ class Services:
                 old_id = it.id
                 it.id = new_id
                 # Update any transactions that reference this id
-                for tx in self.app_data.transactions:
+                renamed = []
+                for pos, tx in enumerate(self.app_data.transactions):
                     if tx.sku == old_id:
                         tx.sku = new_id
+                        renamed.append((pos, tx.id))
+                if renamed:
+                    entry.ops.append(TxSkuRename(old_id, new_id, renamed))
+        items = self.app_data.items
+        for idx, item in enumerate(items):
+            if idx >= len(before):
+                entry.ops.append(ItemChange(idx, None, item))
+            elif item.__dict__ != before[idx].__dict__:
+                entry.ops.append(ItemChange(idx, before[idx], item))
+        self._undo.record(entry)
+        self._po_lines = None
+        self._ledger_index = None
+        self._barcode_index = None
+        self._emit(ChangeKind.BULK_IMPORT, *entry.skus)
         self.save()
         return summary
 
@@ -259,38 +1115,64 @@ class Services:
             n += 1
 
     # ---------- Settings ----------
-    def update_settings(self, categories: List[str], low_stock_inclusive: bool, csv_delimiter: str) -> None:
+    @retry_on_conflict
+    def update_settings(self, categories: List[str], low_stock_inclusive: bool, csv_delimiter: str, durability: Optional[str] = None) -> None:
         cats = [c.strip() for c in categories if c.strip()]
         if not cats:
             cats = ["Ingredient", "Beverage", "Packaging", "Other"]
         delim = (csv_delimiter or ",").strip()
         if len(delim) != 1:
             delim = ","
+        if durability is not None and durability not in DURABILITY_MODES:
+            raise ValueError("Invalid durability mode")
+        before = replace(self.app_data.settings)
         self.app_data.settings.categories = cats
         self.app_data.settings.low_stock_inclusive = bool(low_stock_inclusive)
         self.app_data.settings.csv_delimiter = delim
+        if durability is not None:
+            self.app_data.settings.durability = durability
+        self._undo.record(UndoEntry("update_settings", [SettingsChange(before, self.app_data.settings)]))
+        self._po_lines = None
+        self._emit(ChangeKind.SETTINGS_CHANGED)
         self.save()
 
     # ---------- Undo ----------
+    def can_undo(self) -> bool:
+        return self._undo.can_undo()
+
+    def can_redo(self) -> bool:
+        return self._undo.can_redo()
+
+    @retry_on_conflict
     def undo_last_action(self) -> bool:
-        backups_dir = os.path.join(self.storage.app_root, "backups")
-        if not os.path.isdir(backups_dir):
-            return False
-        files = [os.path.join(backups_dir, f) for f in os.listdir(backups_dir) if f.startswith("items_") and f.endswith(".json")]
-        if not files:
-            return False
-        files.sort(key=lambda p: os.path.getmtime(p), reverse=True)
-        latest = files[0]
-        target = os.path.join(self.storage.app_root, "items.json")
-        try:
-            with open(latest, "r", encoding="utf-8") as f:
-                content = f.read()
-            from utils import atomic_write_text
-            atomic_write_text(target, content)
-            self.app_data = self.storage.load()
-            return True
-        except Exception:
+        return self._apply_history(self._undo.undo)
+
+    @retry_on_conflict
+    def redo_last_action(self) -> bool:
+        return self._apply_history(self._undo.redo)
+
+    def _apply_history(self, step) -> bool:
+        entry = step(self.app_data)
+        if entry is None:
             return False
+        self._barcode_index = None
+        for op in entry.ops:
+            if not isinstance(op, ItemChange):
+                self._ledger_index = None
+            if isinstance(op, SettingsChange):
+                self._po_lines = None
+        for sku in entry.skus:
+            idx = self._find_item_index(sku)
+            if idx >= 0:
+                self._refresh_po_line(self.app_data.items[idx])
+            else:
+                self._drop_po_line(sku)
+        if any(isinstance(op, SettingsChange) for op in entry.ops):
+            self._emit(ChangeKind.SETTINGS_CHANGED)
+        # An undone step may add, remove or edit rows; consumers rebuild
+        self._emit(ChangeKind.RELOADED, *entry.skus)
+        self.save()
+        return True
 
     # ---------- Helpers ----------
     def _get_item_or_raise(self, item_id: str) -> Item:
@@ -299,6 +1181,46 @@ class Services:
                 return it
         raise ValueError("Item not found")
 
+    def _get_indexed_item_or_raise(self, item_id: str) -> Tuple[int, Item]:
+        idx = self._find_item_index(item_id)
+        if idx < 0:
+            raise ValueError("Item not found")
+        return idx, self.app_data.items[idx]
+
+    def _append_tx(self, tx: Transaction) -> None:
+        self.app_data.transactions.append(tx)
+        m = _TX_ID_RE.match(tx.id)
+        if m and self._last_tx_num is not None:
+            self._last_tx_num = max(self._last_tx_num, int(m.group(1)))
+        if self._ledger_index is not None:
+            if not self._ledger_index.append(len(self.app_data.transactions) - 1):
+                self._ledger_index = None
+
+    def _check_barcode_free(self, barcode: Optional[str], item_id: str) -> None:
+        owner = self.find_by_barcode(barcode) if barcode else None
+        if owner is not None and owner.id != item_id:
+            raise ValueError(f"Barcode already used by {owner.id}")
+
+    def _index_barcode(self, item: Item, old_barcode: Optional[str] = None) -> None:
+        if self._barcode_index is None:
+            return
+        if old_barcode and old_barcode != item.barcode:
+            self._drop_barcode(old_barcode, item.id)
+        if item.barcode:
+            self._barcode_index[item.barcode] = item
+
+    def _drop_barcode(self, barcode: Optional[str], sku: str) -> None:
+        if self._barcode_index is None or not barcode:
+            return
+        owner = self._barcode_index.get(barcode)
+        if owner is not None and owner.id == sku:
+            del self._barcode_index[barcode]
+
+    def _is_low(self, item: Item) -> bool:
+        if self.app_data.settings.low_stock_inclusive:
+            return item.stock_qty <= item.reorder_level
+        return item.stock_qty < item.reorder_level
+
     def _find_item_index(self, item_id: str) -> int:
         for idx, it in enumerate(self.app_data.items):
             if it.id == item_id:
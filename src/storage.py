@@ -1,30 +1,212 @@
 import os
+import re
 import json
 import csv
-from typing import Dict, Any, Tuple
+import gzip
+import hashlib
+import marshal
+import struct
+from dataclasses import asdict, fields
+from typing import Dict, Any, Iterator, Tuple, List, Optional
 
 from utils import (
     get_data_file_path,
     get_backups_dir,
+    get_archive_dir,
+    get_cache_dir,
+    get_ledger_segment_path,
+    get_checksum_path,
+    get_data_lock_path,
+    get_stocktake_path,
+    FileLock,
     ensure_dir,
     now_utc_iso,
     atomic_write_text,
+    atomic_write_stream,
+)
+from ledger_segment import LedgerSegment, write_segment
+from instrumentation import instrument, metrics
+from models import (
+    AppData,
+    Item,
+    Settings,
+    PeriodSummary,
+    PurchaseOrderLine,
+    Recipe,
+    StockTakeSession,
+    Transaction,
+    TransactionType,
+    LazyTransactionList,
+    transactions_from_dicts,
 )
-from models import AppData, Settings
 
 
 BACKUP_KEEP = 20
 
+# Accepted names for the product code column of POS sales exports
+SALES_CODE_COLUMNS = ("code", "product", "sku", "barcode")
+
+
+# Top-level key as written by json.dumps(..., indent=2). With that layout the
+# first "\n  ]" after it closes the transactions array, since nested lines are
+# indented deeper and strings cannot contain raw newlines.
+_TX_KEY = '\n  "transactions": ['
+_TX_END = "\n  ]"
+
+
+# Warm-start snapshot: magic, then the data file's size, mtime_ns and sha256,
+# then a marshal'd payload of plain tuples (one per dataclass instance).
+SNAPSHOT_MAGIC = b"CSTSNAP1"
+_SNAPSHOT_KEY = struct.Struct("<qq32s")
+_SNAPSHOT_TYPES = {"items": Item, "transactions": Transaction, "summaries": PeriodSummary, "recipes": Recipe}
+
+
+def _field_names(cls) -> List[str]:
+    return [f.name for f in fields(cls)]
+
+
+# Streaming JSON writer. Rows (items, transactions, summaries) are flat
+# dataclasses, so encoding their __dict__ with the C encoder and a newline
+# item separator reproduces json.dumps(..., indent=2) byte for byte.
+_ROW_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",\n      ", ": "))
+_COMPACT_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_INDENT_ENCODER = json.JSONEncoder(ensure_ascii=False, indent=2)
+_WRITE_CHUNK_ROWS = 1000
+
+
+def _indented_row(row) -> str:
+    body = _ROW_ENCODER.encode(row.__dict__)
+    return "{\n      " + body[1:-1] + "\n    }"
+
+
+class ChecksumWriter:
+    """Binary sink for write_app_data_json that hashes what it writes.
+
+    `mark(name)` starts a new section; every byte belongs to exactly one
+    section, and the whole file gets its own digest.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.pos = 0
+        self.whole = hashlib.sha256()
+        self.sections: List[List[Any]] = []
+        self._name = "head"
+        self._start = 0
+        self._hash = hashlib.sha256()
+
+    def write(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.raw.write(data)
+        self.whole.update(data)
+        self._hash.update(data)
+        self.pos += len(data)
+
+    def mark(self, name: str) -> None:
+        if self.pos > self._start:
+            self.sections.append([self._name, self._start, self.pos - self._start, self._hash.hexdigest()])
+        self._name, self._start, self._hash = name, self.pos, hashlib.sha256()
+
+    def manifest(self) -> Dict[str, Any]:
+        self.mark("")
+        return {"size": self.pos, "sha256": self.whole.hexdigest(), "sections": self.sections}
+
+
+def write_app_data_json(f, app_data: AppData, compact: bool = False) -> None:
+    """Encode `app_data` to the text file `f` section by section.
+
+    Equivalent to json.dumps(app_data.to_dict(), indent=2) (or compact
+    separators), without building the intermediate dicts or the full string.
+    Sinks with a `mark` method (ChecksumWriter) are told where sections and
+    transaction chunks start.
+    """
+    mark = getattr(f, "mark", lambda name: None)
+    sections = [
+        ("version", app_data.version, False),
+        ("revision", app_data.revision, False),
+        ("items", app_data.items, True),
+        ("transactions", app_data.transactions, True),
+        ("settings", app_data.settings.__dict__, False),
+        ("summaries", app_data.summaries, True),
+        # Few rows, with a nested dict each: encoded like settings
+        ("recipes", [asdict(r) for r in app_data.recipes], False),
+    ]
+    f.write("{" if compact else "{\n  ")
+    for n, (key, value, is_rows) in enumerate(sections):
+        if n:
+            f.write("," if compact else ",\n  ")
+        mark(key)
+        f.write(f'"{key}":' if compact else f'"{key}": ')
+        if not is_rows:
+            if compact:
+                f.write(_COMPACT_ENCODER.encode(value))
+            else:
+                f.write(_INDENT_ENCODER.encode(value).replace("\n", "\n  "))
+            continue
+        if not value:
+            f.write("[]")
+            continue
+        encode = (lambda r: _COMPACT_ENCODER.encode(r.__dict__)) if compact else _indented_row
+        sep = "," if compact else ",\n    "
+        f.write("[" if compact else "[\n    ")
+        chunk: List[str] = []
+        first = True
+        for n_rows, row in enumerate(value, 1):
+            chunk.append(encode(row))
+            if len(chunk) >= _WRITE_CHUNK_ROWS:
+                f.write(sep.join(chunk) if first else sep + sep.join(chunk))
+                first = False
+                chunk = []
+                mark(f"{key}@{n_rows}")
+        if chunk:
+            f.write(sep.join(chunk) if first else sep + sep.join(chunk))
+        f.write("]" if compact else "\n  ]")
+    mark("tail")
+    f.write("}" if compact else "\n}")
+
+
+_REVISION_RE = re.compile(rb'"revision":\s*(\d+)')
+
+
+class ConcurrentModificationError(RuntimeError):
+    """items.json was saved by another instance since this one loaded it."""
 
+    def __init__(self, disk_revision: int, our_revision: int):
+        super().__init__(f"Data changed by another instance (revision {disk_revision}, ours {our_revision})")
+        self.disk_revision = disk_revision
+        self.our_revision = our_revision
+
+
+@instrument("Storage", extra=("_write_backup", "_rotate_backups"))
 class Storage:
-    def __init__(self, app_root: str, logger):
+    def __init__(
+        self,
+        app_root: str,
+        logger,
+        lazy_transactions: bool = False,
+        snapshot_cache: bool = False,
+        compact_json: bool = False,
+        verify_on_load: bool = False,
+    ):
         self.app_root = app_root
         self.logger = logger
+        # Defer decoding the transaction history until it is first used
+        self.lazy_transactions = lazy_transactions
+        # Load from .cache/items.snapshot when items.json is unchanged
+        self.snapshot_cache = snapshot_cache
+        # Write items.json without indentation (smaller, but lazy loading
+        # then falls back to a full parse)
+        self.compact_json = compact_json
+        # Quick integrity check on load, falling back to the newest valid backup
+        self.verify_on_load = verify_on_load
+        # (mtime_ns, size) of items.json as of our last load or save
+        self._seen_stat: Optional[Tuple[int, int]] = None
         ensure_dir(get_backups_dir(self.app_root))
 
     def _template(self) -> Dict[str, Any]:
         return {
             "version": 1,
+            "revision": 0,
             "items": [],
             "transactions": [],
             "settings": Settings().__dict__,
@@ -37,24 +219,226 @@ class Storage:
             content = json.dumps(self._template(), ensure_ascii=False, indent=2)
             atomic_write_text(path, content)
 
-    def load(self) -> AppData:
+    def load(self, lazy_transactions: bool = None) -> AppData:
         path = get_data_file_path(self.app_root)
         if not os.path.exists(path):
             self.ensure_initial_files()
+        if lazy_transactions is None:
+            lazy_transactions = self.lazy_transactions
+        if self.verify_on_load:
+            # Under the save lock, so a save in progress is never mistaken
+            # for corruption (and then overwritten by a backup)
+            with FileLock(get_data_lock_path(self.app_root)):
+                if not self.verify(path) and self.restore_newest_valid_backup() is None:
+                    self.logger.error("Data file failed verification and no valid backup was found")
+        self._seen_stat = self._stat_key()
+        if self.snapshot_cache:
+            cached = self.load_snapshot()
+            if cached is not None:
+                return cached
         with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+            if lazy_transactions:
+                data = self._parse_deferring_transactions(f.read())
+            else:
+                data = json.load(f)
         data = self._migrate_if_needed(data)
-        return AppData.from_dict(data)
+        app_data = AppData.from_dict(data)
+        if self.snapshot_cache and not lazy_transactions:
+            # Lazy loads rebuild the snapshot on close instead, so startup
+            # does not pay for decoding the history anyway.
+            self.write_snapshot(app_data)
+        return app_data
+
+    # Read-only reporting segment (ledger.seg + ledger.seg.json)
+    # The segment and its sidecar are replaced one after the other, so both
+    # writing and opening hold the data lock: another terminal rebuilding at
+    # the same time must not pair its sidecar with our columns.
+    def write_ledger_segment(self, app_data: AppData) -> int:
+        path = get_ledger_segment_path(self.app_root)
+        compacted = [t for sm in app_data.summaries for t in sm.as_transactions()]
+        with FileLock(get_data_lock_path(self.app_root)):
+            count = write_segment(path, app_data.transactions, compacted, app_data.revision)
+        self.logger.info("Ledger segment written: %s (%d rows)", path, count)
+        return count
+
+    def open_ledger_segment(self) -> Optional[LedgerSegment]:
+        path = get_ledger_segment_path(self.app_root)
+        try:
+            with FileLock(get_data_lock_path(self.app_root)):
+                if not (os.path.exists(path) and os.path.exists(path + ".json")):
+                    return None
+                # Mapped here; a later rebuild replaces the files, not our view
+                return LedgerSegment(path)
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.error("Unreadable ledger segment %s: %s", path, e)
+            return None
+
+    # Snapshot cache
+    def _snapshot_path(self) -> str:
+        return os.path.join(get_cache_dir(self.app_root), "items.snapshot")
+
+    def _data_file_key(self) -> Tuple[bytes, int]:
+        """Snapshot key of items.json and the revision read from the same bytes."""
+        path = get_data_file_path(self.app_root)
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            content = f.read()
+        m = _REVISION_RE.search(content, 0, 256)
+        key = _SNAPSHOT_KEY.pack(st.st_size, st.st_mtime_ns, hashlib.sha256(content).digest())
+        return key, int(m.group(1)) if m else 0
+
+    def write_snapshot(self, app_data: AppData) -> None:
+        """Write the warm-start snapshot for the current items.json.
+
+        `app_data` must match what is on disk, e.g. right after load or save.
+        Skipped when another instance has saved since, since the snapshot
+        would then pair our data with their file.
+        """
+        if self.has_external_changes():
+            self.logger.info("Snapshot skipped: items.json changed since it was loaded")
+            return
+        payload = {
+            "version": app_data.version,
+            "revision": app_data.revision,
+            "fields": {name: _field_names(cls) for name, cls in _SNAPSHOT_TYPES.items()},
+            "items": [tuple(getattr(i, n) for n in _field_names(Item)) for i in app_data.items],
+            "transactions": [
+                tuple(t.type.value if n == "type" else getattr(t, n) for n in _field_names(Transaction))
+                for t in app_data.transactions
+            ],
+            "summaries": [tuple(getattr(s, n) for n in _field_names(PeriodSummary)) for s in app_data.summaries],
+            "recipes": [tuple(getattr(r, n) for n in _field_names(Recipe)) for r in app_data.recipes],
+            "settings": asdict(app_data.settings),
+        }
+        try:
+            key, disk_revision = self._data_file_key()
+            if disk_revision != app_data.revision:
+                self.logger.info("Snapshot skipped: revision %d on disk, ours %d", disk_revision, app_data.revision)
+                return
+            content = SNAPSHOT_MAGIC + key + marshal.dumps(payload)
+            path = self._snapshot_path()
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.error("Failed to write snapshot: %s", e)
+
+    def load_snapshot(self) -> Optional[AppData]:
+        path = self._snapshot_path()
+        header_len = len(SNAPSHOT_MAGIC) + _SNAPSHOT_KEY.size
+        try:
+            with open(path, "rb") as f:
+                header = f.read(header_len)
+                if len(header) != header_len or not header.startswith(SNAPSHOT_MAGIC):
+                    return None
+                size, mtime_ns, digest = _SNAPSHOT_KEY.unpack(header[len(SNAPSHOT_MAGIC):])
+                # Cheap stat check first; hash only when it could be a hit
+                st = os.stat(get_data_file_path(self.app_root))
+                if (size, mtime_ns) != (st.st_size, st.st_mtime_ns):
+                    return None
+                key, disk_revision = self._data_file_key()
+                if key != header[len(SNAPSHOT_MAGIC):]:
+                    return None
+                payload = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if payload.get("fields") != {name: _field_names(cls) for name, cls in _SNAPSHOT_TYPES.items()}:
+            return None
+        if payload.get("revision", 0) != disk_revision:
+            # Written from data that was not what the file held
+            return None
+        types = {e.value: e for e in TransactionType}
+        txs = []
+        for row in payload["transactions"]:
+            tx = Transaction(*row)
+            tx.type = types[tx.type]
+            txs.append(tx)
+        return AppData(
+            version=payload["version"],
+            items=[Item(*row) for row in payload["items"]],
+            transactions=txs,
+            settings=Settings(**payload["settings"]),
+            summaries=[PeriodSummary(*row) for row in payload["summaries"]],
+            recipes=[Recipe(*row) for row in payload["recipes"]],
+            revision=payload.get("revision", 0),
+        )
+
+    def _parse_deferring_transactions(self, text: str) -> Dict[str, Any]:
+        """Parse everything but the transactions array, which is cut out by
+        offset and decoded by a LazyTransactionList on first access."""
+        start = text.find(_TX_KEY)
+        if start < 0:
+            return json.loads(text)
+        array_start = start + len(_TX_KEY) - 1
+        if text.startswith("[]", array_start):
+            return json.loads(text)
+        end = text.find(_TX_END, array_start)
+        if end < 0:
+            return json.loads(text)
+        end += len(_TX_END)
+        raw = text[array_start:end]
+        data = json.loads(text[:array_start] + "[]" + text[end:])
+        data["transactions"] = LazyTransactionList(lambda: transactions_from_dicts(json.loads(raw)))
+        return data
 
     def save(self, app_data: AppData, backup_before: bool = False) -> None:
+        """Write `app_data` if nobody else saved since it was loaded.
+
+        Raises ConcurrentModificationError when the revision on disk differs
+        from `app_data.revision`; the caller should reload and retry.
+        """
         path = get_data_file_path(self.app_root)
-        if backup_before and os.path.exists(path):
+        with FileLock(get_data_lock_path(self.app_root)):
+            disk_revision = self.read_revision()
+            if disk_revision != app_data.revision:
+                raise ConcurrentModificationError(disk_revision, app_data.revision)
+            if backup_before and os.path.exists(path):
+                self._write_backup()
+            settings = app_data.settings
+            app_data.revision += 1
+            try:
+                with metrics.span("Storage.save:write"), atomic_write_stream(
+                    path,
+                    durability=settings.durability,
+                    group_window_s=settings.group_fsync_window_ms / 1000,
+                    binary=True,
+                ) as f:
+                    sink = ChecksumWriter(f)
+                    write_app_data_json(sink, app_data, compact=self.compact_json)
+                    # The sidecar goes in before the data is renamed over
+                    # items.json; it names its revision, so until then it
+                    # is merely "not for this file" rather than a mismatch
+                    with metrics.span("Storage.save:checksums"):
+                        atomic_write_text(get_checksum_path(path), json.dumps({**sink.manifest(), "revision": app_data.revision}))
+            except BaseException:
+                app_data.revision -= 1
+                raise
+            metrics.add_bytes("Storage.save", sink.pos)
+            self._seen_stat = self._stat_key()
+            # Backup after each save as well (spec: on every save create a backup)
             self._write_backup()
-        content = json.dumps(app_data.to_dict(), ensure_ascii=False, indent=2)
-        atomic_write_text(path, content)
-        # Backup after each save as well (spec: on every save create a backup)
-        self._write_backup()
-        self._rotate_backups()
+            self._rotate_backups()
+
+    def read_revision(self, path: Optional[str] = None) -> int:
+        """Revision of items.json (or `path`), read from the head of the file only."""
+        try:
+            with open(path or get_data_file_path(self.app_root), "rb") as f:
+                m = _REVISION_RE.search(f.read(256))
+        except FileNotFoundError:
+            return 0
+        return int(m.group(1)) if m else 0
+
+    def _stat_key(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(get_data_file_path(self.app_root))
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def has_external_changes(self) -> bool:
+        """True if items.json changed since this instance last loaded or saved it."""
+        return self._stat_key() != self._seen_stat
 
     def _write_backup(self) -> None:
         src = get_data_file_path(self.app_root)
@@ -68,6 +452,11 @@ class Storage:
             with open(src, "r", encoding="utf-8") as fsrc:
                 content = fsrc.read()
             atomic_write_text(dst, content)
+            metrics.add_bytes("Storage._write_backup", os.path.getsize(dst))
+            sums = get_checksum_path(src)
+            if os.path.exists(sums):
+                with open(sums, "r", encoding="utf-8") as fsums:
+                    atomic_write_text(get_checksum_path(dst), fsums.read())
             self.logger.info("Backup written: %s", dst)
         except Exception as e:
             self.logger.error("Failed to write backup: %s", e)
@@ -77,10 +466,116 @@ class Storage:
         files = [os.path.join(backups_dir, f) for f in os.listdir(backups_dir) if f.startswith("items_") and f.endswith(".json")]
         files.sort(key=lambda p: os.path.getmtime(p), reverse=True)
         for old in files[BACKUP_KEEP:]:
+            for victim in (old, get_checksum_path(old)):
+                try:
+                    os.remove(victim)
+                except Exception:
+                    pass
+
+    # Integrity
+    def _verified_cache_path(self) -> str:
+        return os.path.join(get_cache_dir(self.app_root), "verified.json")
+
+    def _read_json_or_none(self, path: str) -> Optional[Any]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def verify(self, path: Optional[str] = None, full: bool = False) -> bool:
+        """Check a data file (items.json by default) against its .sums sidecar.
+
+        The quick check is incremental: a file untouched since its last
+        successful check passes on a stat, and after a normal save (new
+        sidecar) only sections whose digest changed are re-hashed. A file
+        modified without a new sidecar has every section re-hashed. `full`
+        re-hashes the whole file. Files without a usable sidecar, or with one
+        written for another revision or size (e.g. a crash between writing
+        the sidecar and the data), are unverifiable rather than corrupt: they
+        pass if they parse as JSON. Callers verifying items.json while other
+        instances run should hold the data lock, as save() does.
+        """
+        path = path or get_data_file_path(self.app_root)
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(get_checksum_path(path), "rb") as f:
+                manifest_bytes = f.read()
+            manifest = json.loads(manifest_bytes)
+        except (OSError, ValueError):
+            manifest = None
+        st = os.stat(path)
+        if (
+            not manifest
+            or st.st_size != manifest.get("size")
+            or ("revision" in manifest and manifest["revision"] != self.read_revision(path))
+        ):
+            return self._read_json_or_none(path) is not None
+        manifest_digest = hashlib.sha256(manifest_bytes).hexdigest()
+        cache_path = self._verified_cache_path()
+        cache = self._read_json_or_none(cache_path) or {}
+        entry = cache.get(path) or {}
+        if not full and entry.get("mtime_ns") == st.st_mtime_ns and entry.get("manifest") == manifest_digest:
+            return True
+        verified = set()
+        if entry.get("manifest") != manifest_digest:
+            verified = {tuple(s) for s in entry.get("sections", [])}
+        try:
+            with open(path, "rb") as f:
+                if full:
+                    if hashlib.sha256(f.read()).hexdigest() != manifest["sha256"]:
+                        return False
+                else:
+                    for name, offset, length, digest in manifest["sections"]:
+                        if (name, length, digest) in verified:
+                            continue
+                        f.seek(offset)
+                        if hashlib.sha256(f.read(length)).hexdigest() != digest:
+                            return False
+        except OSError:
+            return False
+        cache = {p: v for p, v in cache.items() if os.path.exists(p)}
+        cache[path] = {
+            "mtime_ns": st.st_mtime_ns,
+            "manifest": manifest_digest,
+            "sections": [[name, length, digest] for name, _, length, digest in manifest["sections"]],
+        }
+        try:
+            atomic_write_text(cache_path, json.dumps(cache))
+        except OSError:
+            pass
+        return True
+
+    def find_newest_valid_backup(self) -> Optional[str]:
+        backups_dir = get_backups_dir(self.app_root)
+        files = [os.path.join(backups_dir, f) for f in os.listdir(backups_dir) if f.startswith("items_") and f.endswith(".json")]
+        files.sort(key=lambda p: os.path.getmtime(p), reverse=True)
+        for candidate in files:
+            if self.verify(candidate, full=True):
+                return candidate
+            self.logger.warning("Backup failed verification: %s", candidate)
+        return None
+
+    def restore_newest_valid_backup(self) -> Optional[str]:
+        backup = self.find_newest_valid_backup()
+        if backup is None:
+            return None
+        path = get_data_file_path(self.app_root)
+        # Sidecar first, as in save()
+        sums = get_checksum_path(backup)
+        if os.path.exists(sums):
+            with open(sums, "r", encoding="utf-8") as f:
+                atomic_write_text(get_checksum_path(path), f.read())
+        else:
             try:
-                os.remove(old)
-            except Exception:
+                os.remove(get_checksum_path(path))
+            except FileNotFoundError:
                 pass
+        with open(backup, "r", encoding="utf-8") as f:
+            atomic_write_text(path, f.read())
+        self.logger.error("Data file failed verification; restored from %s", backup)
+        return backup
 
     def _migrate_if_needed(self, data: Dict[str, Any]) -> Dict[str, Any]:
         version = int(data.get("version", 1))
@@ -89,6 +584,67 @@ class Storage:
             data["version"] = 1
         return data
 
+    # Stock take in progress (a small file, rewritten on every count)
+    def save_stocktake(self, session: StockTakeSession) -> None:
+        atomic_write_text(get_stocktake_path(self.app_root), json.dumps(asdict(session), ensure_ascii=False))
+
+    def load_stocktake(self) -> Optional[StockTakeSession]:
+        path = get_stocktake_path(self.app_root)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return StockTakeSession(**json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            # Kept aside for manual recovery rather than overwritten
+            self.logger.error("Unreadable stock take session %s: %s", path, e)
+            try:
+                os.replace(path, path + ".bad")
+            except OSError as e:
+                self.logger.error("Could not set aside %s: %s", path, e)
+            return None
+
+    def clear_stocktake(self) -> None:
+        try:
+            os.remove(get_stocktake_path(self.app_root))
+        except FileNotFoundError:
+            pass
+
+    # Ledger archive (one gzip'd JSON-lines segment per month)
+    def _archive_path(self, period: str) -> str:
+        return os.path.join(get_archive_dir(self.app_root), f"ledger_{period}.jsonl.gz")
+
+    def list_archive_periods(self) -> List[str]:
+        names = os.listdir(get_archive_dir(self.app_root))
+        return sorted(n[len("ledger_"):-len(".jsonl.gz")] for n in names if n.startswith("ledger_") and n.endswith(".jsonl.gz"))
+
+    def write_archive_segment(self, period: str, transactions: List[Transaction]) -> str:
+        path = self._archive_path(period)
+        existing = self.load_archive_segment(period) if os.path.exists(path) else []
+        seen = {t.id for t in existing}
+        rows = existing + [t for t in transactions if t.id not in seen]
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for t in rows:
+                f.write(json.dumps({**asdict(t), "type": t.type.value}, ensure_ascii=False))
+                f.write("\n")
+        os.replace(tmp_path, path)
+        self.logger.info("Archive segment written: %s (%d rows)", path, len(rows))
+        return path
+
+    def load_archive_segment(self, period: str) -> List[Transaction]:
+        path = self._archive_path(period)
+        if not os.path.exists(path):
+            return []
+        rows = []
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    t = json.loads(line)
+                    t["type"] = TransactionType(t["type"])
+                    rows.append(Transaction(**t))
+        return rows
+
     # CSV
     def export_csv(self, app_data: AppData, file_path: str) -> None:
         delimiter = app_data.settings.csv_delimiter
@@ -123,6 +679,82 @@ class Storage:
                     "notes": i.notes or "",
                 })
 
+    def export_purchase_orders_csv(self, drafts: Dict[str, List[PurchaseOrderLine]], file_path: str, delimiter: str = ",") -> None:
+        headers = [
+            "supplier",
+            "sku",
+            "name",
+            "unit",
+            "stock_qty",
+            "reorder_level",
+            "suggested_qty",
+            "unit_cost",
+            "line_cost",
+        ]
+        with open(file_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=headers, delimiter=delimiter)
+            writer.writeheader()
+            for supplier, lines in drafts.items():
+                for line in lines:
+                    writer.writerow({
+                        "supplier": supplier,
+                        "sku": line.sku,
+                        "name": line.name,
+                        "unit": line.unit,
+                        "stock_qty": line.stock_qty,
+                        "reorder_level": line.reorder_level,
+                        "suggested_qty": line.suggested_qty,
+                        "unit_cost": line.unit_cost if line.unit_cost is not None else "",
+                        "line_cost": line.line_cost if line.line_cost is not None else "",
+                    })
+
+    def read_recipes_csv(self, file_path: str, delimiter: str = ",") -> Tuple[Dict[str, Recipe], List[Dict[str, Any]]]:
+        """Recipes from a CSV with one row per ingredient: product, name, sku, qty.
+
+        Returns the recipes by product code and the rows that were skipped.
+        """
+        recipes: Dict[str, Recipe] = {}
+        skipped: List[Dict[str, Any]] = []
+        with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+            for rownum, row in enumerate(csv.DictReader(f, delimiter=delimiter), start=2):
+                try:
+                    product = (row.get("product") or "").strip()
+                    sku = (row.get("sku") or "").strip()
+                    if not product or not sku:
+                        raise ValueError("Missing product or sku")
+                    qty = int((row.get("qty") or "").strip())
+                    recipe = recipes.setdefault(product, Recipe(product, (row.get("name") or "").strip() or product))
+                    recipe.components[sku] = recipe.components.get(sku, 0) + qty
+                except Exception as e:
+                    skipped.append({"row": rownum, "error": str(e)})
+        return recipes, skipped
+
+    def iter_sales_csv(self, file_path: str, delimiter: str = ",") -> Iterator[Tuple[int, str, Any, Optional[str]]]:
+        """Stream a POS sales export as (row number, code, qty, timestamp) rows.
+
+        Columns: `code` (or `product`/`sku`/`barcode`), optional `qty`
+        (default 1) and optional `timestamp`. Values are passed through
+        unparsed; rows without a code are yielded with code "".
+        """
+        with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            header = [h.strip().lower() for h in next(reader, [])]
+            code_col = next((header.index(c) for c in SALES_CODE_COLUMNS if c in header), None)
+            if code_col is None:
+                raise ValueError(f"Sales file needs one of the columns: {', '.join(SALES_CODE_COLUMNS)}")
+            qty_col = header.index("qty") if "qty" in header else None
+            ts_col = header.index("timestamp") if "timestamp" in header else None
+            for rownum, row in enumerate(reader, start=2):
+                if not row:
+                    continue
+                width = len(row)
+                yield (
+                    rownum,
+                    row[code_col].strip() if code_col < width else "",
+                    row[qty_col] if qty_col is not None and qty_col < width else 1,
+                    row[ts_col] if ts_col is not None and ts_col < width else None,
+                )
+
     def import_csv(self, app_data: AppData, file_path: str) -> Tuple[AppData, Dict[str, Any]]:
         # Backup before import
         self._write_backup()
@@ -144,6 +776,10 @@ class Storage:
         # Build indexes
         id_index = {i.id: idx for idx, i in enumerate(app_data.items)}
         name_index = {i.name.strip().lower(): idx for idx, i in enumerate(app_data.items)}
+        barcode_index: Dict[str, str] = {}
+        for i in app_data.items:
+            if i.barcode:
+                barcode_index.setdefault(i.barcode, i.id)
         with open(file_path, "r", encoding="utf-8") as f:
             reader = csv.DictReader(f, delimiter=delimiter)
             for rownum, row in enumerate(reader, start=2):
@@ -167,6 +803,9 @@ class Storage:
                     supplier = (row.get("supplier") or "").strip() or None
                     barcode = (row.get("barcode") or "").strip() or None
                     notes = (row.get("notes") or "").strip() or None
+                    owner = barcode_index.get(barcode) if barcode else None
+                    if owner is not None and (key_idx is None or owner != app_data.items[key_idx].id):
+                        raise ValueError(f"Barcode already used by {owner}")
                     if key_idx is None:
                         # Add new with provided id if present
                         new_id = item_id or self._generate_temp_id(app_data)
@@ -189,9 +828,12 @@ class Storage:
                         app_data.items.append(item)
                         id_index[item.id] = len(app_data.items) - 1
                         name_index[item.name.strip().lower()] = len(app_data.items) - 1
+                        if barcode:
+                            barcode_index[barcode] = item.id
                         summary["added"] += 1
                     else:
                         item = app_data.items[key_idx]
+                        old_barcode = item.barcode
                         item.name = name
                         item.category = category
                         item.unit = unit
@@ -204,6 +846,10 @@ class Storage:
                         item.notes = notes
                         item.last_updated = now_utc_iso()
                         item.validate()
+                        if old_barcode and barcode_index.get(old_barcode) == item.id:
+                            del barcode_index[old_barcode]
+                        if barcode:
+                            barcode_index[barcode] = item.id
                         summary["updated"] += 1
                 except Exception as e:
                     summary["skipped"] += 1
@@ -1,19 +1,31 @@
 import os
+import threading
+from concurrent.futures import Future
 import customtkinter as ctk
 from tkinter import ttk, messagebox, filedialog
-from typing import List, Optional
+from typing import TYPE_CHECKING, Callable, List, Optional
 
-from services import Services
-from models import Item
+from events import ChangeKind
+from instrumentation import metrics
 from utils import APP_NAME, APP_VERSION, get_app_root, open_folder, copy_to_clipboard, format_exception
-from dialogs import ItemDialog, StockDialog, AdjustDialog, SettingsDialog, HelpDialog
+
+# services (and the storage/valuation stack behind it) is imported by the
+# loader thread, and dialogs on first use, so the window paints sooner
+if TYPE_CHECKING:
+    from services import Services
+    from models import Item
+
+# How often to check items.json for saves from other terminals
+SYNC_INTERVAL_MS = 2000
+# How often to check whether the background data load has finished
+LOAD_POLL_MS = 50
 
 
 class CafeStockTrackerApp:
-    def __init__(self, services: Services, logger):
-        self.services = services
+    def __init__(self, load_services: Callable[[], "Services"], app_root: str, logger):
+        self.services: Optional["Services"] = None
         self.logger = logger
-        self.app_root = services.storage.app_root
+        self.app_root = app_root
         
         # Set appearance mode and color theme
         ctk.set_appearance_mode("light")
@@ -30,8 +42,80 @@ class CafeStockTrackerApp:
         self.low_stock_var = ctk.BooleanVar()
         
         self.setup_ui()
+        # Data loads off the Tk thread; until it is ready the window shows
+        # a loading state with the actions disabled
+        self.set_loading(True)
+        self._loading = self.start_loading(load_services)
+        self.root.after(LOAD_POLL_MS, self.poll_loading)
+    
+    def start_loading(self, load_services: Callable[[], "Services"]) -> Future:
+        future: Future = Future()
+        
+        def run():
+            try:
+                future.set_result(load_services())
+            except BaseException as e:
+                future.set_exception(e)
+        
+        # Daemon, so closing the window during a long load does not wait for it
+        threading.Thread(target=run, name="data-loader", daemon=True).start()
+        return future
+    
+    def poll_loading(self):
+        if not self._loading.done():
+            self.root.after(LOAD_POLL_MS, self.poll_loading)
+            return
+        try:
+            self.services = self._loading.result()
+        except Exception as e:
+            self.logger.error(f"Loading data failed: {format_exception(e)}")
+            self.status_label.configure(text="Veri yüklenemedi.")
+            self.show_error(e)
+            return
+        self.update_categories()
         self.refresh_table()
-        
+        self.set_loading(False)
+        self.services.events.subscribe(self.on_data_changed)
+        self.root.after(SYNC_INTERVAL_MS, self.poll_external_changes)
+    
+    def set_loading(self, loading: bool):
+        state = "disabled" if loading else "normal"
+        for widget in self.action_widgets:
+            widget.configure(state=state)
+        if loading:
+            self.status_label.configure(text=f"Veriler yükleniyor... ({os.path.join(self.app_root, 'items.json')})")
+        
+    def poll_external_changes(self):
+        # Pick up saves made by other terminals sharing the data folder;
+        # the reload is published as a change event
+        try:
+            self.services.sync_if_changed()
+        except Exception as e:
+            self.logger.warning(f"Sync failed: {e}")
+        self.root.after(SYNC_INTERVAL_MS, self.poll_external_changes)
+    
+    def on_data_changed(self, events):
+        kinds = {e.kind for e in events}
+        if kinds & {ChangeKind.SETTINGS_CHANGED, ChangeKind.RELOADED}:
+            self.update_categories()
+        # Only edits and stock movements can be patched row by row
+        if kinds - {ChangeKind.ITEM_UPDATED, ChangeKind.STOCK_MOVED, ChangeKind.RECIPES_CHANGED}:
+            self.refresh_table()
+            return
+        matches = self.services.item_filter(self.search_var.get(), self.category_var.get(), self.low_stock_var.get())
+        for sku in {sku for e in events for sku in e.skus}:
+            item = self.services.get_item(sku)
+            if not self.tree.exists(sku):
+                if matches(item):
+                    # Newly visible rows go where a full search would put them
+                    self.refresh_table()
+                    return
+            elif matches(item):
+                self.tree.item(sku, values=self.row_values(item))
+            else:
+                self.tree.delete(sku)
+        self.update_status()
+    
     def setup_ui(self):
         # Main frame
         main_frame = ctk.CTkFrame(self.root)
@@ -46,6 +130,7 @@ class CafeStockTrackerApp:
         search_entry = ctk.CTkEntry(controls_frame, textvariable=self.search_var, width=200)
         search_entry.grid(row=0, column=1, padx=5, pady=5, sticky="w")
         search_entry.bind("<KeyRelease>", lambda e: self.refresh_table())
+        self.action_widgets = [search_entry]
         
         ctk.CTkLabel(controls_frame, text="Kategori:").grid(row=0, column=2, padx=(20, 5), pady=5, sticky="w")
         self.category_combo = ctk.CTkComboBox(controls_frame, variable=self.category_var, width=150)
@@ -54,6 +139,7 @@ class CafeStockTrackerApp:
         
         self.low_stock_check = ctk.CTkCheckBox(controls_frame, text="Düşük Stok Göster", variable=self.low_stock_var, command=self.refresh_table)
         self.low_stock_check.grid(row=0, column=4, padx=20, pady=5, sticky="w")
+        self.action_widgets += [self.category_combo, self.low_stock_check]
         
         # Buttons frame
         buttons_frame = ctk.CTkFrame(main_frame)
@@ -70,6 +156,13 @@ class CafeStockTrackerApp:
         # Button row 2
         ctk.CTkButton(buttons_frame, text="Ayarlar", command=self.settings, width=100).grid(row=1, column=0, padx=5, pady=5)
         ctk.CTkButton(buttons_frame, text="Yardım/Hakkında", command=self.help_about, width=100).grid(row=1, column=1, padx=5, pady=5)
+        ctk.CTkButton(buttons_frame, text="Geri Al", command=self.undo, width=100).grid(row=1, column=2, padx=5, pady=5)
+        ctk.CTkButton(buttons_frame, text="Yinele", command=self.redo, width=100).grid(row=1, column=3, padx=5, pady=5)
+        ctk.CTkButton(buttons_frame, text="Performans", command=self.show_stats, width=100).grid(row=1, column=4, padx=5, pady=5)
+        ctk.CTkButton(buttons_frame, text="Barkod Tara", command=self.scan_barcodes, width=100).grid(row=1, column=5, padx=5, pady=5)
+        ctk.CTkButton(buttons_frame, text="Sayım", command=self.stock_take, width=100).grid(row=0, column=6, padx=5, pady=5)
+        ctk.CTkButton(buttons_frame, text="Menü Satışı", command=self.menu_sale, width=100).grid(row=1, column=6, padx=5, pady=5)
+        self.action_widgets += [w for w in buttons_frame.winfo_children() if isinstance(w, ctk.CTkButton)]
         
         # Table frame
         table_frame = ctk.CTkFrame(main_frame)
@@ -101,9 +194,6 @@ class CafeStockTrackerApp:
         self.status_label = ctk.CTkLabel(main_frame, text="", height=30)
         self.status_label.pack(fill="x", padx=10, pady=(5, 10))
         
-        # Update categories
-        self.update_categories()
-        
     def update_categories(self):
         categories = ["Tümü"] + self.services.app_data.settings.categories
         self.category_combo.configure(values=categories)
@@ -111,6 +201,8 @@ class CafeStockTrackerApp:
             self.category_var.set("Tümü")
     
     def refresh_table(self):
+        if self.services is None:
+            return
         # Clear existing items
         for item in self.tree.get_children():
             self.tree.delete(item)
@@ -124,18 +216,24 @@ class CafeStockTrackerApp:
         
         # Add items to table
         for item in items:
-            self.tree.insert("", "end", values=(
-                item.id,
-                item.name,
-                item.category,
-                item.unit,
-                item.stock_qty,
-                item.reorder_level,
-                item.supplier or "",
-                item.last_updated
-            ))
-        
-        # Update status
+            self.tree.insert("", "end", iid=item.id, values=self.row_values(item))
+        
+        self.update_status()
+    
+    @staticmethod
+    def row_values(item: "Item"):
+        return (
+            item.id,
+            item.name,
+            item.category,
+            item.unit,
+            item.stock_qty,
+            item.reorder_level,
+            item.supplier or "",
+            item.last_updated
+        )
+    
+    def update_status(self):
         total, low_count = self.services.counts()
         self.status_label.configure(text=f"Ürünler: {total} | Düşük Stok: {low_count} | Veri: {os.path.join(self.app_root, 'items.json')}")
     
@@ -147,9 +245,9 @@ class CafeStockTrackerApp:
         return item['values'][0]  # SKU is first column
     
     def add_item(self):
+        from dialogs import ItemDialog
         dialog = ItemDialog(self.root, self.services, "Ürün Ekle")
         if dialog.result:
-            self.refresh_table()
             messagebox.showinfo("Başarılı", "Ürün başarıyla eklendi!")
     
     def edit_item(self):
@@ -159,9 +257,9 @@ class CafeStockTrackerApp:
             return
         
         item = next(i for i in self.services.app_data.items if i.id == item_id)
+        from dialogs import ItemDialog
         dialog = ItemDialog(self.root, self.services, "Ürün Düzenle", item)
         if dialog.result:
-            self.refresh_table()
             messagebox.showinfo("Başarılı", "Ürün başarıyla güncellendi!")
     
     def delete_item(self):
@@ -170,8 +268,7 @@ class CafeStockTrackerApp:
             messagebox.showwarning("Uyarı", "Silmek için bir ürün seçin.")
             return
         
-        has_tx = any(tx.sku == item_id for tx in self.services.app_data.transactions)
-        if has_tx:
+        if self.services.item_has_history(item_id):
             if not messagebox.askyesno("Silme Onayı", 
                                      "Bu ürünün işlemleri var. Ürünü ve ilgili işlemleri silmek istiyor musunuz? Bu işlem geri alınamaz."):
                 return
@@ -183,7 +280,6 @@ class CafeStockTrackerApp:
         
         try:
             self.services.delete_item(item_id, confirm_delete_transactions=confirm)
-            self.refresh_table()
             messagebox.showinfo("Başarılı", "Ürün başarıyla silindi!")
         except Exception as e:
             self.show_error(e)
@@ -194,9 +290,9 @@ class CafeStockTrackerApp:
             messagebox.showwarning("Uyarı", "Lütfen bir ürün seçin.")
             return
         
+        from dialogs import StockDialog
         dialog = StockDialog(self.root, self.services, item_id, "in")
         if dialog.result:
-            self.refresh_table()
             messagebox.showinfo("Başarılı", "Stok başarıyla güncellendi!")
     
     def stock_out(self):
@@ -205,9 +301,9 @@ class CafeStockTrackerApp:
             messagebox.showwarning("Uyarı", "Lütfen bir ürün seçin.")
             return
         
+        from dialogs import StockDialog
         dialog = StockDialog(self.root, self.services, item_id, "out")
         if dialog.result:
-            self.refresh_table()
             messagebox.showinfo("Başarılı", "Stok başarıyla güncellendi!")
     
     def adjust_stock(self):
@@ -216,19 +312,68 @@ class CafeStockTrackerApp:
             messagebox.showwarning("Uyarı", "Lütfen bir ürün seçin.")
             return
         
+        from dialogs import AdjustDialog
         dialog = AdjustDialog(self.root, self.services, item_id)
         if dialog.result:
-            self.refresh_table()
             messagebox.showinfo("Başarılı", "Stok başarıyla düzeltildi!")
     
     
+    def scan_barcodes(self):
+        from dialogs import ScanDialog
+        ScanDialog(self.root, self.services)
+    
+    def menu_sale(self):
+        if not self.services.app_data.recipes:
+            messagebox.showinfo("Bilgi", "Tanımlı reçete yok. Reçeteler CSV ile yüklenebilir: python src/cli.py recipes FILE")
+            return
+        from dialogs import MenuSaleDialog
+        MenuSaleDialog(self.root, self.services)
+    
+    def stock_take(self):
+        from dialogs import StockTakeDialog
+        try:
+            StockTakeDialog(self.root, self.services)
+        except Exception as e:
+            self.show_error(e)
+    
     def settings(self):
-        dialog = SettingsDialog(self.root, self.services)
-        if dialog.result:
-            self.update_categories()
-            self.refresh_table()
+        from dialogs import SettingsDialog
+        SettingsDialog(self.root, self.services)
+    
+    def undo(self):
+        try:
+            if not self.services.undo_last_action():
+                messagebox.showinfo("Bilgi", "Geri alınacak işlem yok.")
+        except Exception as e:
+            self.show_error(e)
+    
+    def redo(self):
+        try:
+            if not self.services.redo_last_action():
+                messagebox.showinfo("Bilgi", "Yinelenecek işlem yok.")
+        except Exception as e:
+            self.show_error(e)
+    
+    def show_stats(self):
+        report = metrics.report()
+        stats_window = ctk.CTkToplevel(self.root)
+        stats_window.title("Performans İstatistikleri")
+        stats_window.geometry("900x500")
+        
+        text_widget = ctk.CTkTextbox(stats_window, font=ctk.CTkFont(family="Courier", size=12))
+        text_widget.pack(pady=10, padx=10, fill="both", expand=True)
+        text_widget.insert("1.0", report)
+        text_widget.configure(state="disabled")
+        
+        button_frame = ctk.CTkFrame(stats_window)
+        button_frame.pack(pady=10)
+        
+        ctk.CTkButton(button_frame, text="Kopyala", command=lambda: copy_to_clipboard(report)).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Sıfırla", command=lambda: (metrics.reset(), stats_window.destroy())).pack(side="left", padx=5)
+        ctk.CTkButton(button_frame, text="Kapat", command=stats_window.destroy).pack(side="left", padx=5)
     
     def help_about(self):
+        from dialogs import HelpDialog
         dialog = HelpDialog(self.root, self.app_root)
     
     def show_error(self, e: Exception):
@@ -255,6 +400,11 @@ class CafeStockTrackerApp:
 
 
 # Dialog classes will be added in the next part...
-def run_ui(services: Services, logger):
-    app = CafeStockTrackerApp(services, logger)
+def run_ui(load_services: Callable[[], "Services"], app_root: str, logger) -> Optional["Services"]:
+    """Show the main window at once and load data behind it.
+
+    Returns the loaded Services, or None if the window was closed first.
+    """
+    app = CafeStockTrackerApp(load_services, app_root, logger)
     app.run()
+    return app.services
@@ -0,0 +1,249 @@
+import sys
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Any, Deque, List, Optional, Tuple
+
+from models import AppData, Item, Settings, Transaction
+
+
+def _approx_size(obj: Any) -> int:
+    if obj is None:
+        return 0
+    values = obj.__dict__.values() if hasattr(obj, "__dict__") else ()
+    return sys.getsizeof(obj) + sum(sys.getsizeof(v) for v in values)
+
+
+def _find(rows: List[Any], key: str, hint: int, attr: str = "id") -> int:
+    if 0 <= hint < len(rows) and getattr(rows[hint], attr) == key:
+        return hint
+    for idx, row in enumerate(rows):
+        if getattr(row, attr) == key:
+            return idx
+    return -1
+
+
+class ItemChange:
+    """An item added (before=None), removed (after=None) or edited in place.
+
+    States are private copies; applying one updates the live Item object so
+    references held elsewhere (dialogs, indexes) stay valid.
+    """
+
+    def __init__(self, index: int, before: Optional[Item], after: Optional[Item]):
+        self.index = index
+        self.before = replace(before) if before is not None else None
+        self.after = replace(after) if after is not None else None
+        self.size = _approx_size(self.before) + _approx_size(self.after)
+
+    @property
+    def skus(self) -> Tuple[str, ...]:
+        return tuple({s.id for s in (self.before, self.after) if s is not None})
+
+    def _apply(self, app_data: AppData, src: Optional[Item], dst: Optional[Item]) -> None:
+        items = app_data.items
+        if src is None:
+            items.insert(min(self.index, len(items)), replace(dst))
+            return
+        idx = _find(items, src.id, self.index)
+        if idx < 0:
+            raise ValueError("Item not found")
+        if dst is None:
+            del items[idx]
+        else:
+            items[idx].__dict__.update(replace(dst).__dict__)
+
+    def undo(self, app_data: AppData) -> None:
+        self._apply(app_data, self.after, self.before)
+
+    def redo(self, app_data: AppData) -> None:
+        self._apply(app_data, self.before, self.after)
+
+
+class TxAppend:
+    def __init__(self, position: int, tx: Transaction):
+        self.position = position
+        self.tx = tx
+        self.size = _approx_size(tx)
+
+    @property
+    def skus(self) -> Tuple[str, ...]:
+        return (self.tx.sku,)
+
+    def undo(self, app_data: AppData) -> None:
+        txs = app_data.transactions
+        idx = _find(txs, self.tx.id, self.position)
+        if idx >= 0:
+            del txs[idx]
+
+    def redo(self, app_data: AppData) -> None:
+        txs = app_data.transactions
+        txs.insert(min(self.position, len(txs)), self.tx)
+
+
+class TxSkuRename:
+    """Ledger rows moved from SKU `before` to `after` (import ID normalization)."""
+
+    def __init__(self, before: str, after: str, rows: List[Tuple[int, str]]):
+        self.before = before
+        self.after = after
+        self.rows = rows
+        self.size = sys.getsizeof(rows) + sum(sys.getsizeof(tx_id) for _, tx_id in rows)
+
+    @property
+    def skus(self) -> Tuple[str, ...]:
+        return (self.before, self.after)
+
+    def _apply(self, app_data: AppData, sku: str) -> None:
+        txs = app_data.transactions
+        for pos, tx_id in self.rows:
+            idx = _find(txs, tx_id, pos)
+            if idx >= 0:
+                txs[idx].sku = sku
+
+    def undo(self, app_data: AppData) -> None:
+        self._apply(app_data, self.before)
+
+    def redo(self, app_data: AppData) -> None:
+        self._apply(app_data, self.after)
+
+
+class RowsRemoved:
+    """Rows removed from `AppData.<attr>` (cascaded deletes), with positions."""
+
+    def __init__(self, attr: str, removed: List[Tuple[int, Any]]):
+        self.attr = attr
+        self.removed = removed
+        self.size = sum(_approx_size(row) for _, row in removed)
+
+    @property
+    def skus(self) -> Tuple[str, ...]:
+        return tuple({row.sku for _, row in self.removed})
+
+    def undo(self, app_data: AppData) -> None:
+        rows = getattr(app_data, self.attr)
+        merged = []
+        it = iter(rows)
+        for pos, row in self.removed:
+            while len(merged) < pos:
+                nxt = next(it, None)
+                if nxt is None:
+                    break
+                merged.append(nxt)
+            merged.append(row)
+        merged.extend(it)
+        setattr(app_data, self.attr, merged)
+
+    def redo(self, app_data: AppData) -> None:
+        gone = {id(row) for _, row in self.removed}
+        setattr(app_data, self.attr, [row for row in getattr(app_data, self.attr) if id(row) not in gone])
+
+
+class SettingsChange:
+    def __init__(self, before: Settings, after: Settings):
+        self.before = replace(before, categories=list(before.categories))
+        self.after = replace(after, categories=list(after.categories))
+        self.size = _approx_size(self.before) + _approx_size(self.after)
+        self.skus: Tuple[str, ...] = ()
+
+    def undo(self, app_data: AppData) -> None:
+        app_data.settings.__dict__.update(replace(self.before, categories=list(self.before.categories)).__dict__)
+
+    def redo(self, app_data: AppData) -> None:
+        app_data.settings.__dict__.update(replace(self.after, categories=list(self.after.categories)).__dict__)
+
+
+@dataclass
+class UndoEntry:
+    label: str
+    ops: List[Any] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return sum(op.size for op in self.ops)
+
+    @property
+    def skus(self) -> List[str]:
+        return sorted({sku for op in self.ops for sku in op.skus})
+
+
+class UndoLog:
+    """Bounded undo/redo stacks of inverse operations.
+
+    Entries past `max_depth`, or the oldest ones once the stack's estimated
+    size exceeds `max_bytes`, are dropped.
+    """
+
+    def __init__(self, max_depth: int = 50, max_bytes: int = 8 * 1024 * 1024):
+        self.max_depth = max_depth
+        self.max_bytes = max_bytes
+        self._undo: Deque[UndoEntry] = deque()
+        self._redo: List[UndoEntry] = []
+        self._bytes = 0
+        # Entry collecting everything recorded inside grouped(), if open
+        self._group: Optional[UndoEntry] = None
+
+    def record(self, entry: UndoEntry) -> None:
+        if self._group is not None:
+            self._group.ops.extend(entry.ops)
+            return
+        if not entry.ops or self.max_depth <= 0:
+            return
+        self._redo.clear()
+        self._push(entry)
+
+    @contextmanager
+    def grouped(self, label: str):
+        """Record everything inside the block as one entry labelled `label`.
+
+        Nested blocks join the outermost one. Nothing is recorded if the
+        block raises (callers reload in that case).
+        """
+        if self._group is not None:
+            yield
+            return
+        self._group = UndoEntry(label)
+        try:
+            yield
+            entry = self._group
+        finally:
+            self._group = None
+        self.record(entry)
+
+    def _push(self, entry: UndoEntry) -> None:
+        self._undo.append(entry)
+        self._bytes += entry.size
+        while self._undo and (len(self._undo) > self.max_depth or self._bytes > self.max_bytes):
+            self._bytes -= self._undo.popleft().size
+
+    def clear(self) -> None:
+        if self._group is not None:
+            self._group.ops.clear()
+        self._undo.clear()
+        self._redo.clear()
+        self._bytes = 0
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def undo(self, app_data: AppData) -> Optional[UndoEntry]:
+        if not self._undo:
+            return None
+        entry = self._undo.pop()
+        self._bytes -= entry.size
+        for op in reversed(entry.ops):
+            op.undo(app_data)
+        self._redo.append(entry)
+        return entry
+
+    def redo(self, app_data: AppData) -> Optional[UndoEntry]:
+        if not self._redo:
+            return None
+        entry = self._redo.pop()
+        for op in entry.ops:
+            op.redo(app_data)
+        self._push(entry)
+        return entry
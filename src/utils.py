@@ -1,17 +1,23 @@
 import os
 import sys
+import json
+import time
+import queue
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
-from datetime import datetime, timezone
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from datetime import datetime, date, timezone
 import tempfile
 import traceback
+from contextlib import contextmanager
+from typing import Optional
 import platform
 
 try:
-    import PySimpleGUI as sg  # For clipboard in runtime
-except Exception:  # pragma: no cover - tests don't require GUI
-    sg = None
-
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
 
 APP_NAME = "Cafe Stock Tracker"
 APP_VERSION = "1.0.0"
@@ -44,20 +50,131 @@ def get_backups_dir(app_root: str) -> str:
     return path
 
 
+def get_archive_dir(app_root: str) -> str:
+    path = os.path.join(app_root, "archive")
+    ensure_dir(path)
+    return path
+
+
+def get_cache_dir(app_root: str) -> str:
+    path = os.path.join(app_root, ".cache")
+    ensure_dir(path)
+    return path
+
+
 def get_data_file_path(app_root: str) -> str:
     return os.path.join(app_root, "items.json")
 
 
+def get_ledger_segment_path(app_root: str) -> str:
+    return os.path.join(app_root, "ledger.seg")
+
+
+def get_data_lock_path(app_root: str) -> str:
+    return os.path.join(app_root, "items.json.lock")
+
+
+def get_checksum_path(data_path: str) -> str:
+    return data_path + ".sums"
+
+
 def get_lock_file_path(app_root: str) -> str:
     return os.path.join(app_root, "app.lock")
 
 
-def setup_logging(app_root: str, level: int = logging.INFO) -> logging.Logger:
+def get_stocktake_path(app_root: str) -> str:
+    return os.path.join(app_root, "stocktake.json")
+
+
+LOG_QUEUE_SIZE = 10_000
+OVERFLOW_DROP_NEW = "drop_new"  # discard the record being logged
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # discard the oldest queued record
+
+_log_listener: Optional[QueueListener] = None
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler over a bounded queue that never blocks the caller.
+
+    When the queue is full, records are dropped per `overflow`; WARNING and
+    above always evict the oldest queued record instead. The drop count is
+    reported as a warning once the queue has room again.
+    """
+
+    def __init__(self, maxsize: int = LOG_QUEUE_SIZE, overflow: str = OVERFLOW_DROP_NEW):
+        super().__init__(queue.Queue(maxsize))
+        self.overflow = overflow
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the listener thread; only merge the args now
+        # so later changes to them don't show up in the log.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow == OVERFLOW_DROP_NEW and record.levelno < logging.WARNING:
+                self.dropped += 1
+                return
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+                self.queue.put_nowait(record)
+            except (queue.Empty, queue.Full):
+                self.dropped += 1
+            return
+        if self.dropped and self.queue.qsize() < self.queue.maxsize // 2:
+            dropped, self.dropped = self.dropped, 0
+            notice = logging.LogRecord(record.name, logging.WARNING, __file__, 0, f"{dropped} log records dropped (queue full)", None, None)
+            try:
+                self.queue.put_nowait(notice)
+            except queue.Full:
+                self.dropped += dropped
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, thread, msg[, exc]."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(
+    app_root: str,
+    level: int = logging.INFO,
+    json_lines: Optional[bool] = None,
+    queue_size: int = LOG_QUEUE_SIZE,
+    overflow: str = OVERFLOW_DROP_NEW,
+    console: bool = True,
+) -> logging.Logger:
+    """Configure the `cafestock` logger.
+
+    Callers only put records on a bounded queue; a listener thread writes
+    them to logs/app.log (or logs/app.jsonl with `json_lines`, also enabled
+    by CAFESTOCK_LOG_JSON=1) and the console.
+    """
+    global _log_listener
     logs_dir = get_logs_dir(app_root)
-    log_file = os.path.join(logs_dir, "app.log")
+    if json_lines is None:
+        json_lines = os.environ.get("CAFESTOCK_LOG_JSON", "") not in ("", "0")
+    log_file = os.path.join(logs_dir, "app.jsonl" if json_lines else "app.log")
 
     logger = logging.getLogger("cafestock")
     logger.setLevel(level)
+    shutdown_logging()
     logger.handlers.clear()
 
     file_handler = RotatingFileHandler(log_file, maxBytes=1_000_000, backupCount=5, encoding="utf-8")
@@ -65,29 +182,141 @@ def setup_logging(app_root: str, level: int = logging.INFO) -> logging.Logger:
         fmt="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
     )
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+    file_handler.setFormatter(JsonLinesFormatter() if json_lines else file_formatter)
 
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(file_formatter)
-    logger.addHandler(console_handler)
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(file_formatter)
+        handlers.append(console_handler)
+
+    queue_handler = BoundedQueueHandler(queue_size, overflow)
+    logger.addHandler(queue_handler)
+    _log_listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
 
     logger.debug("Logging initialized")
     return logger
 
 
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread (also run at exit)."""
+    global _log_listener
+    if _log_listener is not None:
+        listener, _log_listener = _log_listener, None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+atexit.register(shutdown_logging)
+
+
 def now_utc_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
 
-def atomic_write_text(target_path: str, content: str) -> None:
+def to_utc_iso(value) -> str:
+    """Normalize a datetime, date or ISO string to the `now_utc_iso` format.
+
+    Naive values are taken as UTC. The result compares correctly as a string
+    against stored transaction timestamps.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    elif isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0).isoformat()
+
+
+def iso_to_epoch(value: str) -> float:
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+# Durability levels for atomic writes, from fastest to safest:
+#   none       rename only; a power cut may lose or truncate the new file
+#   fsync      fsync the file before the rename
+#   fsync_dir  fsync the file and then its directory, so the rename itself is durable
+#   group      fsync the file before the rename, like fsync; the directory
+#              fsyncs are batched by a background flusher at most once per
+#              window. A crash can roll items.json back by up to one window
+#              (the old, intact file), never leave it empty or torn
+DURABILITY_NONE = "none"
+DURABILITY_FSYNC = "fsync"
+DURABILITY_FSYNC_DIR = "fsync_dir"
+DURABILITY_GROUP = "group"
+DURABILITY_MODES = (DURABILITY_NONE, DURABILITY_FSYNC, DURABILITY_FSYNC_DIR, DURABILITY_GROUP)
+
+
+def fsync_dir(dirname: str) -> None:
+    if os.name == "nt":  # pragma: no cover - directories cannot be opened on Windows
+        return
+    fd = os.open(dirname, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class GroupFsync:
+    """Coalesces fsyncs of directories with recent renames into one flush per window."""
+
+    def __init__(self, window_s: float = 0.2):
+        self.window_s = window_s
+        self._pending: set = set()
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
+
+    def submit(self, dirname: str, window_s: Optional[float] = None) -> None:
+        with self._lock:
+            self._pending.add(dirname)
+            if self._timer is None:
+                self._timer = threading.Timer(self.window_s if window_s is None else window_s, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+        for dirname in pending:
+            try:
+                fsync_dir(dirname)
+            except FileNotFoundError:
+                continue
+
+
+group_fsync = GroupFsync()
+
+
+@contextmanager
+def atomic_write_stream(target_path: str, buffering: int = 1 << 20, durability: str = DURABILITY_NONE, group_window_s: Optional[float] = None, binary: bool = False):
+    """Yield a text (or binary) file that replaces `target_path` atomically on success."""
+    if durability not in DURABILITY_MODES:
+        raise ValueError(f"Unknown durability mode: {durability}")
     dirname = os.path.dirname(target_path)
     ensure_dir(dirname)
     fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix=".tmp_items_", suffix=".json")
     try:
-        with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
-            tmp_file.write(content)
+        mode_kwargs = {"mode": "wb"} if binary else {"mode": "w", "encoding": "utf-8"}
+        with os.fdopen(fd, buffering=buffering, **mode_kwargs) as tmp_file:
+            yield tmp_file
+            if durability != DURABILITY_NONE:
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
         os.replace(tmp_path, target_path)
+        if durability == DURABILITY_FSYNC_DIR:
+            fsync_dir(dirname)
+        elif durability == DURABILITY_GROUP:
+            group_fsync.submit(dirname, group_window_s)
     finally:
         try:
             if os.path.exists(tmp_path):
@@ -96,44 +325,136 @@ def atomic_write_text(target_path: str, content: str) -> None:
             pass
 
 
-class SingleInstanceLock:
-    """Simple single-instance file lock using exclusive creation.
+def atomic_write_text(target_path: str, content: str, durability: str = DURABILITY_NONE) -> None:
+    with atomic_write_stream(target_path, durability=durability) as tmp_file:
+        tmp_file.write(content)
 
-    Creates `app.lock` with the current PID. If the file already exists, raises RuntimeError.
+
+def pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if os.name == "nt":  # pragma: no cover - os.kill(pid, 0) would terminate it
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class FileLock:
+    """Shared/exclusive advisory lock on `path`.
+
+    Uses fcntl.flock where available, so the kernel drops the lock when the
+    holder dies and a leftover file never blocks anyone. Elsewhere it falls
+    back to exclusive creation of a PID file, removed if its PID is dead;
+    shared locks are then not enforced.
     """
 
-    def __init__(self, app_root: str):
-        self.app_root = app_root
-        self.lock_path = get_lock_file_path(app_root)
-        self.fd = None
+    def __init__(self, path: str, exclusive: bool = True, timeout: float = 10.0):
+        self.path = path
+        self.exclusive = exclusive
+        self.timeout = timeout
+        self.fd: Optional[int] = None
 
     def acquire(self) -> None:
-        try:
-            # O_EXCL ensures exclusive creation; fails if file exists
-            self.fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            if self._try_acquire():
+                return
+            if time.monotonic() >= deadline:
+                if self.fd is not None:
+                    # Opened for flock but never locked
+                    os.close(self.fd)
+                    self.fd = None
+                raise RuntimeError(f"Timed out waiting for lock: {self.path}")
+            time.sleep(0.01)
+
+    def _try_acquire(self) -> bool:
+        if fcntl is not None:
+            if self.fd is None:
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(self.fd, (fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                return False
+        if not self.exclusive:  # pragma: no cover - non-POSIX fallback
+            return True
+        try:  # pragma: no cover - non-POSIX fallback
+            self.fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
             os.write(self.fd, str(os.getpid()).encode("utf-8"))
-            os.fsync(self.fd)
-        except FileExistsError:
-            raise RuntimeError("Another instance appears to be running. If not, delete app.lock.")
+            return True
+        except FileExistsError:  # pragma: no cover
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    pid = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                pid = 0
+            if not pid_alive(pid):
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+            return False
 
     def release(self) -> None:
+        if self.fd is None:
+            return
         try:
-            if self.fd is not None:
-                try:
-                    os.close(self.fd)
-                except Exception:
-                    pass
-            if os.path.exists(self.lock_path):
-                os.remove(self.lock_path)
-        except Exception:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            if fcntl is None and self.exclusive:  # pragma: no cover
+                os.remove(self.path)
+        except OSError:
             pass
+        self.fd = None
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class InstanceLock(FileLock):
+    """Held for the lifetime of an app instance on `app.lock`.
+
+    Terminals share it, so several can run against one data folder.
+    Maintenance (compaction, restores) takes it exclusively and therefore
+    only runs when no other instance is open.
+    """
+
+    def __init__(self, app_root: str, exclusive: bool = False):
+        super().__init__(get_lock_file_path(app_root), exclusive=exclusive, timeout=0)
+
+    def acquire(self) -> None:
+        try:
+            super().acquire()
+        except RuntimeError:
+            if self.exclusive:
+                raise RuntimeError("Other instances are running. Close them and try again.")
+            raise RuntimeError("Another instance holds exclusive access to the data folder.")
 
 
 def copy_to_clipboard(text: str) -> None:
+    # GUI toolkits are imported here, not at module level, so headless
+    # entry points (cli.py, server.py) never load them
     try:
-        if sg is not None:
-            sg.clipboard_set(text)
-            return
+        import PySimpleGUI as sg
+        sg.clipboard_set(text)
+        return
     except Exception:
         pass
     # Fallback using tkinter (not imported at top to avoid GUI deps in tests)
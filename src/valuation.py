@@ -0,0 +1,177 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, List, Optional
+
+from models import Transaction, TransactionType
+
+
+FIFO = "fifo"
+WEIGHTED_AVERAGE = "wac"
+
+
+@dataclass
+class SkuValuation:
+    sku: str
+    qty: int
+    value: float
+
+
+@dataclass
+class ValuationReport:
+    method: str
+    start: Optional[str]
+    end: Optional[str]
+    opening_value: float = 0.0
+    purchases: float = 0.0
+    cogs: float = 0.0
+    adjustments: float = 0.0  # net value of ADJUST movements (negative = shrinkage)
+    closing_value: float = 0.0
+    items: Dict[str, SkuValuation] = field(default_factory=dict)
+
+
+class _FifoBook:
+    """Cost layers per SKU as [qty, unit_cost] pairs, oldest first."""
+
+    def __init__(self, fallback_costs: Dict[str, float]):
+        self.fallback_costs = fallback_costs
+        self.layers: Dict[str, Deque[List[float]]] = {}
+        self.on_hand: Dict[str, int] = {}
+
+    def receive(self, sku: str, qty: int, unit_cost: Optional[float]) -> float:
+        layers = self.layers.setdefault(sku, deque())
+        if unit_cost is None:
+            unit_cost = layers[-1][1] if layers else self.fallback_costs.get(sku, 0.0)
+        # Merge with the newest layer when the cost is unchanged so repeated
+        # receipts at the same price don't grow the deque.
+        if layers and layers[-1][1] == unit_cost:
+            layers[-1][0] += qty
+        else:
+            layers.append([qty, unit_cost])
+        self.on_hand[sku] = self.on_hand.get(sku, 0) + qty
+        return qty * unit_cost
+
+    def issue(self, sku: str, qty: int) -> float:
+        layers = self.layers.get(sku)
+        remaining = qty
+        cost = 0.0
+        while remaining > 0 and layers:
+            layer = layers[0]
+            take = min(remaining, layer[0])
+            cost += take * layer[1]
+            layer[0] -= take
+            remaining -= take
+            if layer[0] <= 0:
+                layers.popleft()
+        if remaining > 0:
+            # More than the ledger (and opening_qty) ever received: costed at
+            # the item's current unit cost.
+            cost += remaining * self.fallback_costs.get(sku, 0.0)
+        self.on_hand[sku] = self.on_hand.get(sku, 0) - qty
+        return cost
+
+    def value_of(self, sku: str) -> float:
+        return sum(q * c for q, c in self.layers.get(sku, ()))
+
+
+class _AverageBook:
+    """Running [qty, total_value] per SKU."""
+
+    def __init__(self, fallback_costs: Dict[str, float]):
+        self.fallback_costs = fallback_costs
+        self.state: Dict[str, List[float]] = {}
+        self.on_hand: Dict[str, int] = {}
+
+    def _avg(self, sku: str) -> float:
+        st = self.state.get(sku)
+        if st and st[0] > 0:
+            return st[1] / st[0]
+        return self.fallback_costs.get(sku, 0.0)
+
+    def receive(self, sku: str, qty: int, unit_cost: Optional[float]) -> float:
+        if unit_cost is None:
+            unit_cost = self._avg(sku)
+        st = self.state.setdefault(sku, [0, 0.0])
+        st[0] += qty
+        st[1] += qty * unit_cost
+        self.on_hand[sku] = self.on_hand.get(sku, 0) + qty
+        return qty * unit_cost
+
+    def issue(self, sku: str, qty: int) -> float:
+        cost = qty * self._avg(sku)
+        st = self.state.setdefault(sku, [0, 0.0])
+        st[0] -= qty
+        st[1] -= cost
+        if st[0] <= 0:
+            st[0], st[1] = 0, 0.0
+        self.on_hand[sku] = self.on_hand.get(sku, 0) - qty
+        return cost
+
+    def value_of(self, sku: str) -> float:
+        st = self.state.get(sku)
+        return st[1] if st else 0.0
+
+
+def _total_value(book) -> float:
+    return sum(book.value_of(sku) for sku in book.on_hand)
+
+
+def value_inventory(
+    transactions: Iterable[Transaction],
+    method: str = FIFO,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    fallback_costs: Optional[Dict[str, float]] = None,
+    opening_qty: Optional[Dict[str, int]] = None,
+) -> ValuationReport:
+    """Compute inventory value and COGS in one pass over the ledger.
+
+    `transactions` must be in timestamp order (normally the ledger's append
+    order, but not once back-dated rows were appended) and may be any
+    iterable, so callers can stream rows from disk. `start` and
+    `end` are `now_utc_iso`-formatted bounds of the half-open period
+    [start, end), like the other ledger reports; movements before `start` only
+    build up the opening cost layers. `opening_qty` is stock held before the
+    first row (positive quantities only), costed at `fallback_costs`.
+    """
+    if method == FIFO:
+        book = _FifoBook(fallback_costs or {})
+    elif method == WEIGHTED_AVERAGE:
+        book = _AverageBook(fallback_costs or {})
+    else:
+        raise ValueError("Invalid valuation method")
+    for sku, qty in (opening_qty or {}).items():
+        if qty > 0:
+            book.receive(sku, qty, None)
+    report = ValuationReport(method=method, start=start, end=end)
+    in_period = start is None
+    for tx in transactions:
+        if end is not None and tx.timestamp >= end:
+            break
+        if not in_period and tx.timestamp >= start:
+            report.opening_value = _total_value(book)
+            in_period = True
+        if tx.type == TransactionType.IN:
+            amount = book.receive(tx.sku, tx.qty, tx.unit_cost)
+            if in_period:
+                report.purchases += amount
+        elif tx.type == TransactionType.OUT:
+            amount = book.issue(tx.sku, tx.qty)
+            if in_period:
+                report.cogs += amount
+        else:
+            delta = tx.signed_qty(book.on_hand.get(tx.sku, 0))
+            if delta >= 0:
+                amount = book.receive(tx.sku, delta, None) if delta else 0.0
+            else:
+                amount = -book.issue(tx.sku, -delta)
+            if in_period:
+                report.adjustments += amount
+    if not in_period:
+        report.opening_value = _total_value(book)
+    for sku, qty in book.on_hand.items():
+        value = book.value_of(sku)
+        report.items[sku] = SkuValuation(sku=sku, qty=qty, value=round(value, 2))
+        report.closing_value += value
+    for name in ("opening_value", "purchases", "cogs", "adjustments", "closing_value"):
+        setattr(report, name, round(getattr(report, name), 2))
+    return report
@@ -0,0 +1,64 @@
+import io
+import json
+import tempfile
+import shutil
+import logging
+from contextlib import redirect_stdout, redirect_stderr
+
+from src import cli as cli_module
+
+
+def run_cli(*argv):
+    out, err = io.StringIO(), io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        code = cli_module.main(list(argv))
+    return code, out.getvalue(), err.getvalue()
+
+
+def test_batch_report_and_ledger_export():
+    root = tempfile.mkdtemp(prefix='cafestock_cli_')
+    try:
+        storage = cli_module.Storage(root, logging.getLogger('t'))
+        storage.ensure_initial_files()
+        services = cli_module.Services(storage, logging.getLogger('t'))
+        sku = services.add_item({'name': 'Çay', 'category': 'İçecek', 'unit': 'kg', 'stock_qty': 10, 'unit_cost': 50}).id
+
+        moves = f"{root}/moves.csv"
+        with open(moves, 'w', encoding='utf-8') as f:
+            f.write("type,sku,qty,reason\n")
+            f.write(f"in,{sku},5,Satın alma\n")
+            f.write(f"out,{sku},3,Satış\n")
+            f.write(f"out,{sku},100,Satış\n")     # insufficient stock
+            f.write(f"move,{sku},1,\n")           # unknown type
+            f.write(f"adjust,{sku},10,Sayım\n")
+        code, out, err = run_cli('--data-dir', root, 'batch', moves, '--chunk', '2')
+        assert code == 1
+        assert json.loads(out) == {'applied': 3, 'rejected': 2}
+        assert 'row 3:' in err and 'row 4:' in err
+
+        services.reload()
+        assert services.get_item(sku).stock_qty == 10
+        assert len(services.app_data.transactions) == 3
+
+        jsonl = f"{root}/moves.jsonl"
+        with open(jsonl, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'type': 'in', 'sku': sku, 'qty': 1}) + "\n")
+            f.write("[1, 2]\n")                  # not an object
+            f.write("\n")
+            f.write("{not json\n")
+            f.write(json.dumps({'type': 'out', 'sku': sku, 'qty': 1}) + "\n")
+        code, out, err = run_cli('--data-dir', root, 'batch', jsonl, '--chunk', '2')
+        assert code == 1
+        assert json.loads(out) == {'applied': 2, 'rejected': 2}
+        assert 'row 2:' in err and 'row 4: invalid JSON' in err
+
+        code, out, _ = run_cli('--data-dir', root, 'report', 'consumption')
+        assert code == 0 and json.loads(out) == {sku: 4}
+
+        ledger = f"{root}/ledger.csv"
+        code, _, err = run_cli('--data-dir', root, 'export', 'ledger', ledger)
+        assert code == 0 and err.strip() == '5 transactions'
+        with open(ledger, encoding='utf-8') as f:
+            assert f.readline().strip() == ','.join(cli_module.LEDGER_FIELDS)
+    finally:
+        shutil.rmtree(root)
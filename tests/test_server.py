@@ -0,0 +1,171 @@
+import json
+import asyncio
+import logging
+import tempfile
+import shutil
+
+from src import server as server_module
+
+
+async def request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def test_concurrent_sales_are_group_committed():
+    root = tempfile.mkdtemp(prefix='cafestock_server_')
+    logger = logging.getLogger('t')
+    try:
+        storage = server_module.Storage(root, logger)
+        storage.ensure_initial_files()
+        services = server_module.Services(storage, logger)
+        item = services.add_item({'name': 'Süt', 'category': 'Malzeme', 'unit': 'litre', 'stock_qty': 500})
+
+        async def scenario():
+            srv = server_module.InventoryServer(services, logger, port=0)
+            await srv.start()
+
+            async def client(n):
+                reader, writer = await asyncio.open_connection('127.0.0.1', srv.port)
+                statuses = []
+                for _ in range(n):
+                    status, _ = await request(reader, writer, 'POST', '/stock/out', {'sku': item.id, 'qty': 1})
+                    statuses.append(status)
+                writer.close()
+                return statuses
+
+            results = await asyncio.gather(*(client(5) for _ in range(20)))
+            reader, writer = await asyncio.open_connection('127.0.0.1', srv.port)
+            got = await request(reader, writer, 'GET', f'/items/{item.id}')
+            missing = await request(reader, writer, 'GET', '/items/SKU-9999')
+            bad_cost = await request(reader, writer, 'POST', '/stock/in', {'sku': item.id, 'qty': 1, 'unit_cost': [1]})
+            bad_mode = await request(reader, writer, 'POST', '/stock/adjust', {'sku': item.id, 'qty': 1, 'mode': 'x'})
+            batch = await request(reader, writer, 'POST', '/stock/batch', {'movements': [
+                {'type': 'in', 'sku': item.id, 'qty': 10, 'unit_cost': 30.0},
+                {'type': 'out', 'sku': item.id, 'qty': 10000},
+            ]})
+            writer.close()
+            await srv.stop()
+            return results, got, missing, bad_cost + bad_mode, batch, srv.stats
+
+        results, got, missing, invalid, batch, stats = asyncio.run(scenario())
+        assert all(s == 200 for statuses in results for s in statuses)
+        assert got[0] == 200 and got[1]['stock_qty'] == 400
+        assert missing[0] == 404
+        assert invalid[0] == 400 and invalid[2] == 400
+        assert batch[1]['applied'] == 1 and not batch[1]['results'][1]['ok']
+        # 100 sales from 20 connections share far fewer saves
+        assert stats['mutations'] == 101
+        assert stats['commits'] < stats['mutations']
+        reloaded = server_module.Storage(root, logger).load()
+        assert reloaded.items[0].stock_qty == 410
+        assert len(reloaded.transactions) == 101
+    finally:
+        shutil.rmtree(root)
+
+
+def test_reads_pick_up_another_terminals_saves():
+    root = tempfile.mkdtemp(prefix='cafestock_server_')
+    logger = logging.getLogger('t')
+    try:
+        storage = server_module.Storage(root, logger)
+        storage.ensure_initial_files()
+        services = server_module.Services(storage, logger)
+        item = services.add_item({'name': 'Süt', 'category': 'Malzeme', 'unit': 'litre', 'stock_qty': 10})
+        desktop = server_module.Services(server_module.Storage(root, logger), logger)
+
+        async def scenario():
+            srv = server_module.InventoryServer(services, logger, port=0, sync_interval_s=0.02)
+            await srv.start()
+            reader, writer = await asyncio.open_connection('127.0.0.1', srv.port)
+            desktop.stock_out(item.id, 2)
+            await asyncio.sleep(0.2)
+            got = await request(reader, writer, 'GET', f'/items/{item.id}')
+            sold = await request(reader, writer, 'POST', '/stock/out', {'sku': item.id, 'qty': 1})
+            writer.close()
+            await srv.stop()
+            return got, sold, srv.stats
+
+        got, sold, stats = asyncio.run(scenario())
+        assert got[1]['stock_qty'] == 8 and stats['reloads'] == 1
+        assert sold[0] == 200 and server_module.Storage(root, logger).load().items[0].stock_qty == 7
+    finally:
+        shutil.rmtree(root)
+
+
+def test_reads_wait_for_the_group_commit_in_progress():
+    import threading
+    root = tempfile.mkdtemp(prefix='cafestock_server_')
+    logger = logging.getLogger('t')
+    try:
+        storage = server_module.Storage(root, logger)
+        storage.ensure_initial_files()
+        services = server_module.Services(storage, logger)
+        item = services.add_item({'name': 'Süt', 'category': 'Malzeme', 'unit': 'litre', 'stock_qty': 10})
+        release = threading.Event()
+
+        def slow_sale(s):
+            tx = s.stock_out(item.id, 4)
+            release.wait(5)
+            return tx
+
+        async def scenario():
+            srv = server_module.InventoryServer(services, logger, port=0)
+            await srv.start()
+            sale = asyncio.ensure_future(srv.submit(slow_sale))
+            await asyncio.sleep(0.05)
+            reader, writer = await asyncio.open_connection('127.0.0.1', srv.port)
+            read = asyncio.ensure_future(request(reader, writer, 'GET', f'/items/{item.id}'))
+            await asyncio.sleep(0.05)
+            # The sale is in memory but not saved: the read must not see it yet
+            blocked = not read.done()
+            release.set()
+            await sale
+            got = await read
+            writer.close()
+            await srv.stop()
+            return blocked, got
+
+        blocked, got = asyncio.run(scenario())
+        assert blocked and got[1]['stock_qty'] == 6
+    finally:
+        shutil.rmtree(root)
+
+
+def test_invalid_content_length_is_a_bad_request():
+    root = tempfile.mkdtemp(prefix='cafestock_server_')
+    logger = logging.getLogger('t')
+    try:
+        storage = server_module.Storage(root, logger)
+        storage.ensure_initial_files()
+        services = server_module.Services(storage, logger)
+
+        async def send(port, length):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f"POST /stock/out HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode('latin-1'))
+            await writer.drain()
+            status_line = await reader.readline()
+            writer.close()
+            return int(status_line.split()[1])
+
+        async def scenario():
+            srv = server_module.InventoryServer(services, logger, port=0)
+            await srv.start()
+            statuses = [await send(srv.port, 'abc'), await send(srv.port, '-5')]
+            await srv.stop()
+            return statuses
+
+        assert asyncio.run(scenario()) == [400, 400]
+    finally:
+        shutil.rmtree(root)
@@ -5,6 +5,7 @@ import shutil
 
 from src.storage import Storage
 from src.services import Services
+from src import services as services_module
 
 
 def make_services():
@@ -79,3 +80,532 @@ def test_import_upsert_behavior():
         assert summary['updated'] >= 1 and summary['added'] >= 1
     finally:
         cleanup(root)
+
+
+def test_purchase_order_drafts_follow_stock_moves():
+    root, s = make_services()
+    try:
+        milk = s.add_item({'name': 'Milk', 'category': 'Ingredient', 'unit': 'L', 'stock_qty': 2, 'reorder_level': 5, 'supplier': 'Sütaş', 'unit_cost': 30})
+        s.add_item({'name': 'Cups', 'category': 'Packaging', 'unit': 'piece', 'stock_qty': 1, 'reorder_level': 10})
+        s.add_item({'name': 'Beans', 'category': 'Ingredient', 'unit': 'kg', 'stock_qty': 50, 'reorder_level': 5, 'supplier': 'Sütaş'})
+        drafts = s.purchase_order_drafts()
+        assert sorted(drafts) == ['', 'Sütaş']
+        line = drafts['Sütaş'][0]
+        assert line.sku == milk.id and line.suggested_qty == 8 and line.line_cost == 240
+        s.stock_in(milk.id, 20)
+        assert 'Sütaş' not in s.purchase_order_drafts()
+        csv_path = os.path.join(root, 'po.csv')
+        assert s.export_purchase_orders_csv(csv_path) == 1
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            assert f.read().splitlines()[0].startswith('supplier,sku,name')
+    finally:
+        cleanup(root)
+
+
+def test_inventory_valuation_fifo_and_average():
+    root, s = make_services()
+    try:
+        it = s.add_item({'name': 'Beans', 'category': 'Ingredient', 'unit': 'kg', 'stock_qty': 0})
+        s.stock_in(it.id, 10, unit_cost=100)
+        s.stock_in(it.id, 10, unit_cost=130)
+        s.stock_out(it.id, 15)
+        s.stock_adjust(it.id, 3, mode='set')  # 2 kg lost
+        fifo = s.inventory_valuation('fifo')
+        assert fifo.purchases == 2300
+        assert fifo.cogs == 10 * 100 + 5 * 130
+        assert fifo.adjustments == -2 * 130
+        assert fifo.items[it.id].qty == 3 and fifo.closing_value == 3 * 130
+        wac = s.inventory_valuation('wac')
+        assert wac.cogs == 15 * 115 and wac.closing_value == 3 * 115
+        later = s.inventory_valuation('fifo', start='2999-01-01')
+        assert later.cogs == 0 and later.opening_value == later.closing_value == fifo.closing_value
+        # Opening stock typed in on creation has no IN row; it is valued at unit_cost
+        cups = s.add_item({'name': 'Cups', 'category': 'Packaging', 'unit': 'piece', 'stock_qty': 10, 'unit_cost': 100})
+        s.stock_out(cups.id, 3)
+        for method in ('fifo', 'wac'):
+            report = s.inventory_valuation(method)
+            assert report.items[cups.id].qty == 7 and report.items[cups.id].value == 700
+            assert report.cogs == (fifo.cogs if method == 'fifo' else wac.cogs) + 300
+    finally:
+        cleanup(root)
+
+
+def test_query_transactions_by_range_and_filters():
+    root, s = make_services()
+    try:
+        a = s.add_item({'name': 'Milk', 'category': 'Ingredient', 'unit': 'L', 'stock_qty': 0})
+        b = s.add_item({'name': 'Cups', 'category': 'Packaging', 'unit': 'piece', 'stock_qty': 0})
+        s.stock_in(a.id, 10, reason='Purchase')
+        s.stock_in(b.id, 50, reason='Purchase')
+        assert len(list(s.query_transactions())) == 2  # builds the index
+        s.stock_out(a.id, 2, reason='Sale')
+        s.stock_out(a.id, 1, reason='Waste')
+        assert [t.qty for t in s.query_transactions(type='out')] == [2, 1]
+        assert [t.qty for t in s.query_transactions(sku=a.id, reason='Purchase')] == [10]
+        assert [t.qty for t in s.query_transactions(limit=2, offset=1)] == [50, 2]
+        assert len(list(s.todays_transactions())) == 4
+        assert list(s.query_transactions(end='2000-01-01')) == []
+        s.delete_item(b.id, confirm_delete_transactions=True)
+        assert len(list(s.query_transactions(type='in'))) == 1
+    finally:
+        cleanup(root)
+
+
+def test_compact_ledger_keeps_stock_and_valuation():
+    root, s = make_services()
+    try:
+        it = s.add_item({'name': 'Beans', 'category': 'Ingredient', 'unit': 'kg', 'stock_qty': 0})
+        s.stock_in(it.id, 10, unit_cost=100)
+        s.stock_out(it.id, 4)
+        s.stock_adjust(it.id, -1, mode='delta')
+        for tx in s.app_data.transactions:
+            tx.timestamp = '2024-01-15T10:00:00+00:00'
+        s.stock_in(it.id, 5, unit_cost=120)
+        before = s.inventory_valuation('fifo')
+        assert s.consumption_by_sku() == {it.id: 4} and s.movement_totals() == {it.id: 10}
+        result = s.compact_ledger(retention_days=30)
+        assert result['archived'] == 3 and result['periods'] == ['2024-01']
+        assert len(s.app_data.transactions) == 1
+        summary = s.app_data.summaries[0]
+        assert summary.net_qty == 5 and summary.tx_count == 3
+        assert s.inventory_valuation('fifo').closing_value == before.closing_value
+        # Compacted months still count in segment reports
+        assert s.consumption_by_sku() == {it.id: 4} and s.movement_totals() == {it.id: 10}
+        assert s.movement_totals(start='2024-02-01') == {it.id: 5}
+        assert len(s.archived_transactions('2024-01')) == 3
+        reloaded = s.storage.load()
+        assert len(reloaded.summaries) == 1
+        assert s.generate_next_tx_id() == 'TX-000005'
+    finally:
+        cleanup(root)
+
+
+def test_compaction_measures_set_adjustments_from_earlier_stock():
+    root, s = make_services()
+    try:
+        it = s.add_item({'name': 'Beans', 'category': 'Ingredient', 'unit': 'kg', 'stock_qty': 0})
+        s.stock_in(it.id, 10, unit_cost=100)
+        s.app_data.transactions[-1].timestamp = '2024-01-15T10:00:00+00:00'
+        s.compact_ledger(retention_days=30)
+        # A row from before adjustments stored their delta
+        s.stock_adjust(it.id, 4, mode='set')
+        legacy = s.app_data.transactions[-1]
+        legacy.delta, legacy.timestamp = None, '2024-02-15T10:00:00+00:00'
+        s.compact_ledger(retention_days=30)
+        february = [sm for sm in s.app_data.summaries if sm.period == '2024-02'][0]
+        assert february.net_adjust == -6
+        assert s.get_item(it.id).stock_qty == 4
+    finally:
+        cleanup(root)
+
+
+def test_ledger_segment_reports():
+    root, s = make_services()
+    try:
+        a = s.add_item({'name': 'Milk', 'category': 'Ingredient', 'unit': 'L', 'stock_qty': 0})
+        b = s.add_item({'name': 'Cups', 'category': 'Packaging', 'unit': 'piece', 'stock_qty': 0})
+        s.stock_in(a.id, 10)
+        s.stock_in(b.id, 50)
+        s.stock_out(a.id, 3, reason='Sale')
+        s.stock_out(b.id, 5, reason='Sale')
+        s.stock_adjust(a.id, 5, mode='set')
+        assert s.consumption_by_sku() == {a.id: 3, b.id: 5}
+        assert s.movement_totals() == {a.id: 5, b.id: 45}
+        s.stock_out(a.id, 1)  # segment is stale and gets rebuilt
+        assert s.consumption_by_sku()[a.id] == 4
+        assert s.movement_totals(end='2000-01-01') == {}
+        with s.ledger_segment() as seg:
+            rows = list(seg.history(a.id))
+            assert [r[2] for r in rows] == [10, -3, -2, -1]
+            assert rows[1][1] == 'out' and rows[1][3] == 'Sale'
+        # A row rewritten in place keeps the count and last id; the save still
+        # makes the segment stale
+        s.app_data.transactions[0].qty = 20
+        s.save()
+        with s.ledger_segment() as seg:
+            assert seg.totals_by_sku()[a.id] == 14
+    finally:
+        cleanup(root)
+
+
+def test_undo_redo_inverse_operations():
+    root, s = make_services()
+    try:
+        it = s.add_item({'name': 'Cups', 'category': 'Packaging', 'unit': 'piece', 'stock_qty': 10})
+        s.stock_in(it.id, 5)
+        s.stock_out(it.id, 3)
+        s.update_item(it.id, {'name': 'Paper Cups'})
+        assert s.undo_last_action()
+        assert s._get_item_or_raise(it.id).name == 'Cups'
+        assert s.undo_last_action()
+        assert s._get_item_or_raise(it.id).stock_qty == 15 and len(s.app_data.transactions) == 1
+        assert s.redo_last_action()
+        assert s._get_item_or_raise(it.id).stock_qty == 12 and len(s.app_data.transactions) == 2
+        # delete with cascade comes back with its transactions in place
+        s.delete_item(it.id, confirm_delete_transactions=True)
+        assert not s.can_redo()
+        assert s.undo_last_action()
+        assert [t.qty for t in s.app_data.transactions] == [5, 3]
+        assert s.storage.load().items[0].stock_qty == 12
+        # an import is a single step
+        csv_path = os.path.join(root, 'imp.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write('id,name,category,unit,unit_cost,unit_price,stock_qty,reorder_level,supplier,barcode,notes\n')
+            f.write(f'{it.id},Cups,Packaging,piece,,,99,0,,,\n')
+            f.write(',Milk,Ingredient,L,,,3,0,,,\n')
+        s.import_csv(csv_path)
+        assert len(s.app_data.items) == 2
+        assert s.undo_last_action()
+        assert [(i.id, i.stock_qty) for i in s.app_data.items] == [(it.id, 12)]
+        # IDs normalized by an import are renamed back on its ledger rows too
+        tmp = s.add_item({'id': 'SKU-TEMP-0001', 'name': 'Lids', 'category': 'Packaging', 'unit': 'piece'})
+        s.stock_in(tmp.id, 4)
+        s.import_csv(csv_path)
+        new_id = tmp.id
+        assert new_id != 'SKU-TEMP-0001' and s.app_data.transactions[-1].sku == new_id
+        assert s.undo_last_action()
+        assert s._get_item_or_raise('SKU-TEMP-0001') and s.app_data.transactions[-1].sku == 'SKU-TEMP-0001'
+        assert s.redo_last_action()
+        assert s.app_data.transactions[-1].sku == new_id
+    finally:
+        cleanup(root)
+
+
+def test_undo_depth_limit():
+    root = tempfile.mkdtemp(prefix='cafestock_services_')
+    try:
+        storage = Storage(root, logging.getLogger('t'))
+        storage.ensure_initial_files()
+        s = Services(storage, logging.getLogger('t'), undo_depth=2)
+        it = s.add_item({'name': 'Cups', 'category': 'Packaging', 'unit': 'piece', 'stock_qty': 0})
+        for _ in range(3):
+            s.stock_in(it.id, 1)
+        assert s.undo_last_action() and s.undo_last_action()
+        assert not s.undo_last_action()
+        assert s._get_item_or_raise(it.id).stock_qty == 1
+    finally:
+        cleanup(root)
+
+
+def test_two_terminals_merge_by_retry():
+    root, bar = make_services()
+    try:
+        it = bar.add_item({'name': 'Cups', 'category': 'Packaging', 'unit': 'piece', 'stock_qty': 10})
+        # Same Storage class Services catches conflicts from (src/ is on sys.path)
+        kitchen = Services(services_module.Storage(root, logging.getLogger('t')), logging.getLogger('t'))
+        bar.stock_out(it.id, 2)
+        assert kitchen.sync_if_changed() is True
+        assert kitchen.sync_if_changed() is False
+        bar.stock_out(it.id, 3)
+        # kitchen saves on stale data: it reloads and replays its own sale
+        kitchen.stock_out(it.id, 1)
+        assert kitchen._get_item_or_raise(it.id).stock_qty == 4
+        assert bar.sync_if_changed()
+        assert bar._get_item_or_raise(it.id).stock_qty == 4
+        assert [t.qty for t in bar.app_data.transactions] == [2, 3, 1]
+        assert len({t.id for t in bar.app_data.transactions}) == 3
+    finally:
+        cleanup(root)
+
+
+def test_run_batch_isolates_a_failing_mutation():
+    root, s = make_services()
+    try:
+        item = s.add_item({'name': 'Süt', 'category': 'Malzeme', 'unit': 'litre', 'stock_qty': 10})
+
+        def broken(services):
+            raise TypeError('bad unit_cost')
+        results = s.run_batch([lambda x: x.stock_out(item.id, 1), broken, lambda x: x.stock_out(item.id, 2)])
+        assert isinstance(results[1], TypeError)
+        assert results[0].qty == 1 and results[2].qty == 2
+        assert Storage(root, logging.getLogger('t')).load().items[0].stock_qty == 7
+    finally:
+        cleanup(root)
+
+
+def test_change_events_are_coalesced_per_batch():
+    root, services = make_services()
+    try:
+        a = services.add_item({'name': 'Çay', 'category': 'İçecek', 'unit': 'kg', 'stock_qty': 10})
+        b = services.add_item({'name': 'Şeker', 'category': 'Malzeme', 'unit': 'kg', 'stock_qty': 10})
+        published = []
+        services.events.subscribe(published.append)
+        services.stock_out(a.id, 1)
+        assert [(e.kind.value, e.skus) for e in published[-1]] == [('stock_moved', (a.id,))]
+        with services.batch():
+            services.stock_out(a.id, 1)
+            services.stock_in(b.id, 5)
+            services.update_item(a.id, {'reorder_level': 3})
+            assert len(published) == 1  # nothing until the batch is saved
+        assert len(published) == 2
+        assert [(e.kind.value, e.skus) for e in published[-1]] == [('stock_moved', (a.id, b.id)), ('item_updated', (a.id,))]
+    finally:
+        cleanup(root)
+
+
+def test_report_cache_invalidated_by_inputs_only():
+    root, services = make_services()
+    try:
+        a = services.add_item({'name': 'Kahve', 'category': 'İçecek', 'unit': 'kg', 'stock_qty': 10, 'unit_cost': 100})
+        first = services.inventory_valuation()
+        assert services.inventory_valuation() is first
+        totals = services.category_totals()
+        services.update_settings(['İçecek'], True, ',')
+        # settings are not an input of either report
+        assert services.inventory_valuation() is first
+        assert services.category_totals() is totals
+        services.stock_in(a.id, 5, unit_cost=120)
+        second = services.inventory_valuation()
+        assert second is not first and second.purchases == 600
+        assert services.category_totals()['İçecek']['qty'] == 15
+        stats = services.report_cache_stats()
+        assert stats['hits'] == 3 and stats['misses'] == 4
+    finally:
+        cleanup(root)
+
+
+def test_operations_are_timed_and_slow_ones_logged(caplog):
+    root, services = make_services()
+    metrics = services_module.metrics
+    metrics.reset()
+    slow_ms = metrics.slow_ms
+    try:
+        it = services.add_item({'name': 'Simit', 'category': 'Malzeme', 'unit': 'adet', 'stock_qty': 50})
+        metrics.slow_ms = 0
+        with caplog.at_level(logging.WARNING, logger='cafestock'):
+            services.stock_out(it.id, 1)
+        stats = metrics.snapshot()
+        assert stats['Services.stock_out']['count'] == 1
+        assert stats['Storage.save']['count'] == 2 and stats['Storage.save']['bytes'] > 0
+        assert stats['Storage.save:write']['p99_ms'] <= stats['Storage.save:write']['max_ms']
+        slow = [r.getMessage() for r in caplog.records if 'Slow operation Services.stock_out' in r.getMessage()]
+        assert slow and 'Storage.save' in slow[0]
+    finally:
+        metrics.slow_ms = slow_ms
+        cleanup(root)
+
+
+def test_profiled_actions_write_rotated_captures():
+    from src.profiling import ActionProfiler
+    root, services = make_services()
+    try:
+        profiles = os.path.join(root, 'logs', 'profiles')
+        ActionProfiler(profiles, logging.getLogger('t'), keep=1).install(services, ['stock_in', 'save'])
+        it = services.add_item({'name': 'Un', 'category': 'Malzeme', 'unit': 'kg'})
+        services.stock_in(it.id, 5)
+        services.stock_in(it.id, 5)
+        names = sorted(os.listdir(profiles))
+        # add_item's save is captured on its own; stock_in's is part of stock_in's capture
+        assert names == ['save.prof', 'save.txt', 'stock_in.prof', 'stock_in.prof.1', 'stock_in.txt', 'stock_in.txt.1']
+        with open(os.path.join(profiles, 'stock_in.txt'), encoding='utf-8') as f:
+            report = f.read()
+        assert 'peak traced memory' in report and 'top 25 allocations' in report
+    finally:
+        cleanup(root)
+
+
+def test_barcode_index_and_scanned_basket():
+    root, s = make_services()
+    try:
+        tea = s.add_item({'name': 'Çay', 'category': 'İçecek', 'unit': 'kg', 'stock_qty': 10, 'barcode': '8690000000017'})
+        cup = s.add_item({'name': 'Bardak', 'category': 'Ambalaj', 'unit': 'adet', 'stock_qty': 1, 'barcode': '8690000000024'})
+        assert s.find_by_barcode(' 8690000000017\n') is tea
+        assert s.find_by_barcode('0000') is None
+        # Kept current per item once built
+        s.update_item(tea.id, {'barcode': '8690000000031'})
+        assert s.find_by_barcode('8690000000017') is None
+        assert s.find_by_barcode('8690000000031') is tea
+        try:
+            s.add_item({'name': 'Kahve', 'category': 'İçecek', 'unit': 'kg', 'barcode': '8690000000024'})
+            assert False, 'duplicate barcode should fail'
+        except ValueError:
+            pass
+        try:
+            s.update_item(tea.id, {'name': 'Siyah Çay', 'barcode': '8690000000024'})
+            assert False, 'duplicate barcode should fail'
+        except ValueError:
+            pass
+        assert s.get_item(tea.id).name == 'Çay' and s.get_item(tea.id).barcode == '8690000000031'
+
+        # Imported rows are held to the same rule, one row at a time
+        csv_path = os.path.join(root, 'imp.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write('id,name,category,unit,unit_cost,unit_price,stock_qty,reorder_level,supplier,barcode,notes\n')
+            f.write(',Kahve,İçecek,kg,,,1,0,,8690000000024,\n')  # taken by the cups
+            f.write(',Şeker,Gıda,kg,,,1,0,,8690000000048,\n')
+            f.write(',Tuz,Gıda,kg,,,1,0,,8690000000048,\n')  # taken by the row above
+            f.write(f'{cup.id},Bardak,Ambalaj,adet,,,1,0,,8690000000055,\n')
+        summary = s.import_csv(csv_path)
+        assert summary['added'] == 1 and summary['updated'] == 1
+        assert [r['row'] for r in summary['skipped_rows']] == [2, 4]
+        assert s.find_by_barcode('8690000000048').name == 'Şeker'
+        assert s.find_by_barcode('8690000000055') is cup and s.find_by_barcode('8690000000024') is None
+        assert s.undo_last_action()
+        assert s.find_by_barcode('8690000000024') is cup
+
+        saves = []
+        s.storage.save = lambda data, backup_before=False, _save=s.storage.save: (saves.append(1), _save(data))
+        results = s.stock_move_many('out', {tea.id: 3, cup.id: 2}, reason='Satış')
+        assert len(saves) == 1
+        assert results[tea.id].qty == 3 and isinstance(results[cup.id], ValueError)
+        assert s.get_item(tea.id).stock_qty == 7 and s.get_item(cup.id).stock_qty == 1
+
+        s.delete_item(cup.id, confirm_delete_transactions=True)
+        assert s.find_by_barcode('8690000000024') is None
+    finally:
+        cleanup(root)
+
+
+def test_stock_take_resumes_and_commits_in_one_save():
+    root, s = make_services()
+    try:
+        a = s.add_item({'name': 'Un', 'category': 'Malzeme', 'unit': 'kg', 'stock_qty': 10, 'unit_cost': 20})
+        b = s.add_item({'name': 'Şeker', 'category': 'Malzeme', 'unit': 'kg', 'stock_qty': 5})
+        c = s.add_item({'name': 'Tuz', 'category': 'Malzeme', 'unit': 'kg', 'stock_qty': 3})
+        s.start_stock_take(note='Ay sonu')
+        s.stage_count(a.id, 8)
+        s.stage_count(b.id, 5)
+
+        # A restarted app picks the count up from stocktake.json
+        resumed = Services(Storage(root, logging.getLogger('t')), logging.getLogger('t'))
+        assert resumed.start_stock_take().counts == {a.id: 8, b.id: 5}
+        resumed.stage_count(c.id, 4)
+        preview = {line.sku: (line.delta, line.value_delta) for line in resumed.stock_take_preview()}
+        assert preview == {a.id: (-2, -40.0), b.id: (0, None), c.id: (1, None)}
+
+        saves = []
+        save = resumed.storage.save
+        resumed.storage.save = lambda data, backup_before=False: (saves.append(1), save(data))
+        summary = resumed.commit_stock_take()
+        assert len(saves) == 1
+        assert summary == {'counted': 3, 'missing': 0, 'adjusted': 2, 'unchanged': 1, 'rejected': {}}
+        assert [(tx.sku, tx.delta, tx.note) for tx in resumed.app_data.transactions] == [(a.id, -2, 'Ay sonu'), (c.id, 1, 'Ay sonu')]
+        assert resumed.stock_take is None and resumed.storage.load_stocktake() is None
+        # The whole count is one undo step
+        assert resumed.undo_last_action()
+        assert [resumed.get_item(x.id).stock_qty for x in (a, b, c)] == [10, 5, 3]
+        assert resumed.app_data.transactions == [] and not resumed.can_undo()
+    finally:
+        cleanup(root)
+
+
+def test_recipe_explosion_aggregates_sales_into_one_batch():
+    root, s = make_services()
+    try:
+        beans = s.add_item({'name': 'Espresso Çekirdeği', 'category': 'İçecek', 'unit': 'gram', 'stock_qty': 100_000})
+        milk = s.add_item({'name': 'Süt', 'category': 'Malzeme', 'unit': 'ml', 'stock_qty': 1_000_000})
+        cup = s.add_item({'name': 'Karton Bardak', 'category': 'Ambalaj', 'unit': 'adet', 'stock_qty': 100})
+        s.set_recipe('LATTE', 'Latte', {beans.id: 18, milk.id: 200, cup.id: 1})
+        s.set_recipe('ESP', 'Espresso', {beans.id: 9})
+        try:
+            s.set_recipe('BAD', 'Bad', {'SKU-9999': 1})
+            assert False, 'unknown ingredient should fail'
+        except ValueError:
+            pass
+
+        sold = [('LATTE', 1), ('ESP', 2), ('TOST', 1)] * 20_000
+        usage, unknown = s.explode_sales(sold)
+        assert usage == {beans.id: 20_000 * 36, milk.id: 20_000 * 200, cup.id: 20_000}
+        assert unknown == {'TOST': 20_000}
+
+        saves = []
+        save = s.storage.save
+        s.storage.save = lambda data, backup_before=False: (saves.append(1), save(data))
+        result = s.sell_products([('LATTE', 150), ('ESP', 4), ('TOST', 1), ('LATTE', 1)])
+        assert len(saves) == 1
+        assert result['unknown'] == {'TOST': 1}
+        # Only 100 cups: none of the 151 lattes' ingredients are taken out
+        assert list(result['rejected']) == ['LATTE'] and cup.id in result['rejected']['LATTE']
+        assert set(result['ingredients']) == {beans.id} and result['ingredients'][beans.id].qty == 4 * 9
+        assert s.get_item(milk.id).stock_qty == 1_000_000 and s.get_item(cup.id).stock_qty == 100
+
+        result = s.sell_products([('LATTE', 60), ('ESP', 2), ('LATTE', 40)])
+        assert result['rejected'] == {}
+        assert s.get_item(cup.id).stock_qty == 0
+        # One undo step per sale
+        s.undo_last_action()
+        assert s.get_item(cup.id).stock_qty == 100
+        assert s.get_item(beans.id).stock_qty == 100_000 - 4 * 9
+    finally:
+        cleanup(root)
+
+
+def test_pos_sales_ingest_aggregates_per_bucket():
+    root, s = make_services()
+    try:
+        beans = s.add_item({'name': 'Espresso Çekirdeği', 'category': 'İçecek', 'unit': 'gram', 'stock_qty': 10_000})
+        water = s.add_item({'name': 'Su', 'category': 'İçecek', 'unit': 'adet', 'stock_qty': 100, 'barcode': '8690000000011'})
+        s.set_recipe('ESP', 'Espresso', {beans.id: 9})
+        path = os.path.join(root, 'pos.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('code,qty,timestamp\n')
+            for minute in range(0, 120, 2):
+                f.write(f'ESP,1,2025-06-01T{10 + minute // 60}:{minute % 60:02d}:30+00:00\n')
+            f.write('8690000000011,3,2025-06-01T10:15:00+00:00\n')
+            f.write(f'{water.id},2,2025-06-01T11:59:59+00:00\n')
+            f.write('TOST,4,2025-06-01T10:00:00+00:00\n')
+            f.write('ESP,x,2025-06-01T10:00:00+00:00\n')
+
+        tx_before = len(s.app_data.transactions)
+        saves = []
+        save = s.storage.save
+        s.storage.save = lambda data, backup_before=False: (saves.append(1), save(data))
+        result = s.ingest_sales_csv(path, bucket_minutes=60)
+        assert len(saves) == 1
+        assert result['lines'] == 63 and result['skipped'] == 1
+        assert result['unknown'] == {'TOST': 4}
+        assert result['movements'] == 4 and result['skus'] == 2
+        new = s.app_data.transactions[tx_before:]
+        assert sorted((tx.sku, tx.timestamp[:16], tx.qty) for tx in new) == sorted([
+            (beans.id, '2025-06-01T10:00', 30 * 9), (beans.id, '2025-06-01T11:00', 30 * 9),
+            (water.id, '2025-06-01T10:00', 3), (water.id, '2025-06-01T11:00', 2),
+        ])
+        assert s.get_item(beans.id).stock_qty == 10_000 - 60 * 9
+        assert s.get_item(water.id).stock_qty == 95
+
+        s.undo_last_action()
+        assert s.get_item(beans.id).stock_qty == 10_000
+        assert s.get_item(water.id).stock_qty == 100
+        assert len(s.app_data.transactions) == tx_before
+        try:
+            s.ingest_sales_csv(path, strict=True)
+            assert False, 'unknown code should fail in strict mode'
+        except ValueError:
+            pass
+        assert s.get_item(beans.id).stock_qty == 10_000
+    finally:
+        cleanup(root)
+
+
+def test_valuation_periods_are_half_open():
+    root, s = make_services()
+    try:
+        milk = s.add_item({'name': 'Süt', 'category': 'Malzeme', 'unit': 'litre'})
+        s.stock_in(milk.id, 10, unit_cost=2.0)
+        s.app_data.transactions[-1].timestamp = '2025-02-01T00:00:00+00:00'
+        january = s.inventory_valuation(start='2025-01-01', end='2025-02-01')
+        february = s.inventory_valuation(start='2025-02-01', end='2025-03-01')
+        assert january.purchases == 0 and january.closing_value == 0
+        assert february.purchases == 20.0 and february.opening_value == 0
+    finally:
+        cleanup(root)
+
+
+def test_back_dated_sales_are_valued_in_their_own_period():
+    root, s = make_services()
+    try:
+        milk = s.add_item({'name': 'Süt', 'category': 'Malzeme', 'unit': 'litre', 'unit_cost': 2.0})
+        s.stock_in(milk.id, 20, unit_cost=2.5)
+        path = os.path.join(root, 'pos.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('code,qty,timestamp\n')
+            f.write(f'{milk.id},5,2020-01-15T10:20:00+00:00\n')
+        s.ingest_sales_csv(path)
+        # The sale is the newest ledger row but the oldest movement
+        january = s.inventory_valuation(start='2020-01-01', end='2020-02-01')
+        assert january.cogs == 12.5 and january.purchases == 0
+        later = s.inventory_valuation(start='2020-06-01')
+        assert later.cogs == 0 and later.purchases == 50
+        assert later.items[milk.id].qty == 15
+    finally:
+        cleanup(root)
@@ -66,3 +66,201 @@ def test_export_import_roundtrip():
         assert summary['updated'] >= 1
     finally:
         shutil.rmtree(root)
+
+
+def test_lazy_transaction_loading():
+    root = make_tmp_root()
+    try:
+        storage = Storage(root, logging.getLogger('t'))
+        storage.ensure_initial_files()
+        data = storage.load()
+        from src.models import Item, Transaction, TransactionType
+        data.items.append(Item(id='SKU-0001', name='Milk', category='Ingredient', unit='L', stock_qty=3))
+        for n in range(1, 4):
+            data.transactions.append(Transaction(id=f'TX-{n:06d}', type=TransactionType.IN, sku='SKU-0001', qty=n, timestamp='2025-09-01T12:00:00+00:00', reason='Purchase\n"quoted"'))
+        storage.save(data)
+        lazy = storage.load(lazy_transactions=True)
+        assert lazy.items[0].name == 'Milk'
+        assert lazy.settings.csv_delimiter == ','
+        assert not lazy.transactions.loaded
+        assert [t.qty for t in lazy.transactions] == [1, 2, 3]
+        assert lazy.transactions.loaded and lazy.transactions[0].reason == 'Purchase\n"quoted"'
+        assert lazy.to_dict() == storage.load().to_dict()
+    finally:
+        shutil.rmtree(root)
+
+
+def test_snapshot_cache_hit_and_invalidation():
+    root = make_tmp_root()
+    try:
+        storage = Storage(root, logging.getLogger('t'), snapshot_cache=True)
+        storage.ensure_initial_files()
+        data = storage.load()
+        from src.models import Item
+        data.items.append(Item(id='SKU-0001', name='Milk', category='Ingredient', unit='L', stock_qty=3))
+        storage.save(data)
+        assert storage.load_snapshot() is None  # stale after save
+        first = storage.load()  # rebuilds the snapshot
+        cached = storage.load_snapshot()
+        assert cached is not None and cached.to_dict() == first.to_dict()
+        # Same size and mtime but different content must not hit
+        path = os.path.join(root, 'items.json')
+        st = os.stat(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content.replace('Milk', 'Mil2'))
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        assert storage.load_snapshot() is None
+        assert storage.load().items[0].name == 'Mil2'
+    finally:
+        shutil.rmtree(root)
+
+
+def test_snapshot_not_written_over_another_terminals_save():
+    root = make_tmp_root()
+    try:
+        bar = Storage(root, logging.getLogger('t'), snapshot_cache=True, lazy_transactions=True)
+        kitchen = Storage(root, logging.getLogger('t'))
+        bar.ensure_initial_files()
+        from src.models import Item
+        data = bar.load()
+        data.items.append(Item(id='SKU-0001', name='Milk', category='Ingredient', unit='L', stock_qty=10))
+        bar.save(data)
+        theirs = kitchen.load()
+        theirs.items[0].stock_qty = 8
+        kitchen.save(theirs)
+        # The bar exits holding stock 10 at the old revision
+        bar.write_snapshot(data)
+        assert bar.load_snapshot() is None
+        fresh = bar.load()
+        assert fresh.items[0].stock_qty == 8
+        bar.write_snapshot(fresh)
+        assert bar.load_snapshot().items[0].stock_qty == 8
+    finally:
+        shutil.rmtree(root)
+
+
+def _streamed(data, compact):
+    import io
+    from src.storage import write_app_data_json
+    buf = io.StringIO()
+    write_app_data_json(buf, data, compact=compact)
+    return buf.getvalue()
+
+
+def test_streaming_writer_matches_json_dumps():
+    from src.models import Item, Transaction, TransactionType, Recipe
+    data = AppData()
+    data.items.append(Item(id='SKU-0001', name='Süt "tam"', category='İçecek', unit='litre', unit_cost=12.5, notes='a\nb'))
+    data.recipes.append(Recipe('LATTE', 'Latte', {'SKU-0001': 200}))
+    for n in range(1, 2503):
+        data.transactions.append(Transaction(id=f'TX-{n:06d}', type=TransactionType.OUT, sku='SKU-0001', qty=n, timestamp='2025-09-01T12:00:00+00:00', reason='Satış'))
+    for d in (AppData(), data):
+        assert _streamed(d, False) == json.dumps(d.to_dict(), ensure_ascii=False, indent=2)
+        assert _streamed(d, True) == json.dumps(d.to_dict(), ensure_ascii=False, separators=(',', ':'))
+
+
+def test_save_with_each_durability_mode():
+    from src.utils import DURABILITY_MODES
+    root = make_tmp_root()
+    try:
+        storage = Storage(root, logging.getLogger('t'))
+        storage.ensure_initial_files()
+        data = storage.load()
+        for mode in DURABILITY_MODES:
+            data.settings.durability = mode
+            storage.save(data)
+            assert storage.load().settings.durability == mode
+        data.settings.durability = 'bogus'
+        try:
+            storage.save(data)
+            assert False, 'should reject unknown mode'
+        except ValueError:
+            pass
+    finally:
+        shutil.rmtree(root)
+
+
+def test_verify_detects_corruption_and_restores_backup():
+    root = make_tmp_root()
+    try:
+        storage = Storage(root, logging.getLogger('t'), verify_on_load=True)
+        storage.ensure_initial_files()
+        data = storage.load()
+        from src.models import Item
+        data.items.append(Item(id='SKU-0001', name='Milk', category='Ingredient', unit='L', stock_qty=3))
+        storage.save(data)
+        assert storage.verify() and storage.verify(full=True)
+        assert storage.verify()  # second quick check skips unchanged sections
+        path = os.path.join(root, 'items.json')
+        with open(path, 'r+b') as f:
+            content = f.read()
+            f.seek(content.index(b'Milk'))
+            f.write(b'Mxlk')
+        assert not storage.verify(full=True)
+        assert not storage.verify()
+        # The backup written by save() is intact and is restored on load
+        assert storage.load().items[0].name == 'Milk'
+        assert storage.verify(full=True)
+        # Another terminal caught between writing the sidecar and renaming
+        # the data: the pair is unverifiable, not corrupt, and nothing is restored
+        sums = path + '.sums'
+        with open(sums, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        with open(sums, 'w', encoding='utf-8') as f:
+            json.dump({**manifest, 'revision': manifest['revision'] + 1}, f)
+        with open(path, 'r+b') as f:
+            f.seek(f.read().index(b'"L"'))
+            f.write(b'"l"')
+        assert storage.verify(full=True)
+        assert storage.load().items[0].unit == 'l'
+    finally:
+        shutil.rmtree(root)
+
+
+def test_lock_timeout_closes_its_descriptor():
+    from src.utils import FileLock
+    root = make_tmp_root()
+    try:
+        path = os.path.join(root, 'items.json.lock')
+        with FileLock(path):
+            waiter = FileLock(path, timeout=0.05)
+            try:
+                waiter.acquire()
+                assert False, 'should time out'
+            except RuntimeError:
+                pass
+            assert waiter.fd is None
+    finally:
+        shutil.rmtree(root)
+
+
+def test_queued_logging_drops_on_overflow_and_writes_json_lines():
+    from src.utils import BoundedQueueHandler, setup_logging, shutdown_logging
+    handler = BoundedQueueHandler(maxsize=2)
+    log = logging.getLogger('t.queue')
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    log.addHandler(handler)
+    try:
+        for n in range(5):
+            log.info('row %d', n)
+        assert handler.queue.qsize() == 2 and handler.dropped == 3
+        log.warning('disk full')  # evicts the oldest instead of being dropped
+        queued = [handler.queue.get_nowait().msg for _ in range(2)]
+        assert queued == ['row 1', 'disk full']
+    finally:
+        log.removeHandler(handler)
+
+    root = make_tmp_root()
+    logger = setup_logging(root, json_lines=True)
+    try:
+        logger.info('Backup written: %s', 'items_1.json')
+        shutdown_logging()
+        with open(os.path.join(root, 'logs', 'app.jsonl'), encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        assert entries[-1]['msg'] == 'Backup written: items_1.json' and entries[-1]['level'] == 'INFO'
+    finally:
+        logger.handlers.clear()
+        shutil.rmtree(root)